@@ -0,0 +1,124 @@
+import os
+import re
+import subprocess
+from typing import List, Tuple
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_SILENCE_START_RE = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end: (-?\d+(?:\.\d+)?)")
+
+
+def detect_silences(media_path, noise_db=-35, min_silence_seconds=0.5) -> Tuple[float, List[Tuple[float, float]]]:
+    """Run ffmpeg's silencedetect over the audio track; returns (duration, [(start, end), ...])."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-nostdin",
+        "-i", os.fspath(media_path),
+        "-vn", "-af", f"silencedetect=noise={noise_db}dB:d={min_silence_seconds}",
+        "-f", "null", "-",
+    ]
+    duration = 0.0
+    silences = []
+    start = None
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    for line in proc.stderr:
+        match = _DURATION_RE.search(line)
+        if match and not duration:
+            hours, minutes, seconds = match.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            continue
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError("ffmpeg silence detection failed")
+    if start is not None:
+        # Trailing silence runs to the end of the file.
+        silences.append((start, duration))
+    return duration, silences
+
+
+def plan_speech_segments(duration, silences, max_segment_seconds, drop_silence_seconds=2.0, padding_seconds=0.25):
+    """Decide what audio to keep and where to cut it.
+
+    Silences longer than `drop_silence_seconds` are removed except for `padding_seconds`
+    on each side; shorter pauses are kept. Segments are cut at the middle of a pause
+    (never mid-word) as late as possible below `max_segment_seconds`, with a hard cut
+    only when a stretch of speech has no pause at all.
+
+    Returns (keep_intervals, cut_times, offset_map). `keep_intervals` are source-time
+    ranges, `cut_times` are segment boundaries on the trimmed timeline, and
+    `offset_map` holds (trimmed_start, source_start, length) entries for map_to_source_time.
+    """
+    silences = _merge_touching(silences)
+    keep = []
+    cursor = 0.0
+    for start, end in silences:
+        # Padding can eat a short silence entirely; then there is nothing to drop.
+        if end - start >= drop_silence_seconds and end - start > 2 * padding_seconds:
+            keep_end = min(start + padding_seconds, duration)
+            if keep_end > cursor:
+                keep.append((cursor, keep_end))
+            cursor = duration if end >= duration else max(cursor, end - padding_seconds)
+    if cursor < duration:
+        keep.append((cursor, duration))
+
+    offset_map = []
+    trimmed = 0.0
+    for start, end in keep:
+        offset_map.append((trimmed, start, end - start))
+        trimmed += end - start
+    total = trimmed
+
+    candidates = sorted(
+        t for t in (_to_trimmed((s + e) / 2, offset_map) for s, e in silences) if t is not None and 0 < t < total
+    )
+    candidates += [entry[0] for entry in offset_map[1:]]
+    candidates.sort()
+
+    cuts = []
+    segment_start = 0.0
+    i = 0
+    while total - segment_start > max_segment_seconds:
+        limit = segment_start + max_segment_seconds
+        best = None
+        while i < len(candidates) and candidates[i] <= limit:
+            if candidates[i] > segment_start:
+                best = candidates[i]
+            i += 1
+        cut = best if best is not None else limit
+        cuts.append(round(cut, 3))
+        segment_start = cut
+    return keep, cuts, offset_map
+
+
+def _merge_touching(silences):
+    # Silences that touch or overlap are one pause; planned separately, the padding
+    # between them would keep a sliver of silence and add a needless cut candidate.
+    merged = []
+    for start, end in sorted(silences):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _to_trimmed(source_time, offset_map):
+    for trimmed_start, source_start, length in offset_map:
+        if source_start <= source_time <= source_start + length:
+            return trimmed_start + source_time - source_start
+    return None
+
+
+def map_to_source_time(trimmed_time, offset_map) -> float:
+    """Translate a timestamp on the trimmed audio back to the original video timeline."""
+    for trimmed_start, source_start, length in reversed(offset_map):
+        if trimmed_time >= trimmed_start:
+            return source_start + min(trimmed_time - trimmed_start, length)
+    return trimmed_time
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+
+class BlobStore:
+    """Content-addressed file store for uploaded PDFs and videos.
+
+    Blobs are copied in fixed-size chunks and named by their SHA-256, so memory per
+    upload is bounded by `chunk_size`, identical files are stored once, and SQL rows
+    only keep the hash as a reference.
+    """
+
+    def __init__(self, root, chunk_size: int = 1024 * 1024):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+
+    def path(self, ref: str) -> Path:
+        return self.root / ref[:2] / ref[2:4] / ref
+
+    def exists(self, ref: str) -> bool:
+        return self.path(ref).exists()
+
+    def size(self, ref: str) -> int:
+        return self.path(ref).stat().st_size
+
+    def put_stream(self, source: BinaryIO) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.root / "tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            ref = digest.hexdigest()
+            target = self.path(ref)
+            if target.exists():
+                os.remove(tmp_name)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, target)
+            return ref, size
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def put_file(self, path) -> Tuple[str, int]:
+        with open(path, "rb") as source:
+            return self.put_stream(source)
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) of a blob, reading at most `chunk_size` at a time."""
+        with open(self.path(ref), "rb") as f:
+            f.seek(start)
+            remaining = (end - start + 1) if end is not None else None
+            while remaining is None or remaining > 0:
+                chunk = f.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, ref: str) -> None:
+        self.path(ref).unlink(missing_ok=True)
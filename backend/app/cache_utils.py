@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack_vector(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack_vector(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """LRU + TTL cache of embeddings keyed by (model name, normalized text).
+
+    The optional SQLite tier at `disk_path` survives restarts; entries found there
+    are promoted back into memory. Every `purge_interval` seconds, writes also drop
+    expired rows and, above `disk_max_rows`, the least recently used ones. The async
+    methods run the SQLite I/O on a worker thread, off the event loop.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = 3600,
+        disk_path: Optional[str] = None,
+        normalize: Callable[[str], str] = normalize_query,
+        disk_max_rows: Optional[int] = None,
+        purge_interval: float = 600,
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.normalize = normalize
+        self.disk_max_rows = disk_max_rows
+        self.purge_interval = purge_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._next_purge = 0.0
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._disk.execute("PRAGMA table_info(embeddings)")}
+            if "last_used" not in columns:
+                # Caches written before the LRU purge existed.
+                self._disk.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+                self._disk.execute("UPDATE embeddings SET last_used = created_at")
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._disk.commit()
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_name}\x00{self.normalize(text)}"
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, vector: List[float], created_at: float) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _get_memory(self, key: str, now: float) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, vector = entry
+                if not self._expired(created_at, now):
+                    self._entries.move_to_end(key)
+                    return vector
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[List[float]]:
+        with self._lock:
+            row = self._disk.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or self._expired(row[1], now):
+                return None
+            self._disk.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (now, key))
+            self._disk.commit()
+            vector = _unpack_vector(row[0])
+            self._remember(key, vector, row[1])
+            return vector
+
+    def _count(self, vector: Optional[List[float]]) -> Optional[List[float]]:
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vector
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        now = time.time()
+        vector = self._get_memory(key, now)
+        if vector is None and self._disk is not None:
+            vector = self._get_disk(key, now)
+        return self._count(vector)
+
+    async def aget(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        now = time.time()
+        vector = self._get_memory(key, now)
+        if vector is None and self._disk is not None:
+            vector = await asyncio.to_thread(self._get_disk, key, now)
+        return self._count(vector)
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return [self.get(text) for text in texts]
+
+    def set(self, text: str, vector: List[float]) -> None:
+        self.set_many([text], [vector])
+
+    async def aset(self, text: str, vector: List[float]) -> None:
+        if self._disk is None:
+            self.set(text, vector)
+        else:
+            await asyncio.to_thread(self.set, text, vector)
+
+    def set_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector, now)
+            if self._disk is not None:
+                self._disk.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, _pack_vector(vector), now, now) for key, vector in zip(keys, vectors)],
+                )
+                if now >= self._next_purge:
+                    self._purge(now)
+                self._disk.commit()
+
+    def _purge(self, now: float) -> int:
+        self._next_purge = now + self.purge_interval
+        removed = 0
+        if self.ttl_seconds is not None:
+            removed += self._disk.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+        if self.disk_max_rows:
+            removed += self._disk.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_rows,),
+            ).rowcount
+        return removed
+
+    def purge(self) -> int:
+        """Drop expired and least recently used rows from the SQLite tier now; returns the count."""
+        if self._disk is None:
+            return 0
+        with self._lock:
+            removed = self._purge(time.time())
+            self._disk.commit()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class SemanticAnswerCache:
+    """Maps past query embeddings to their answers using small cosine-similarity FAISS indexes.
+
+    An answer is whatever the caller stores with it; the query routes store the response
+    together with the sources it was generated from, so a hit can show them again.
+
+    Each `namespace` (retrieval mode plus the settings that shape the context) has its own
+    index, so an answer is only reused for a query answered the same way. `max_size` bounds
+    the entries of all namespaces together; the oldest entry is evicted first.
+
+    `version` changes on every invalidate(); answers computed against an older version are
+    dropped by store(), so a cached answer never predates the current knowledge base.
+    """
+
+    def __init__(self, threshold: float = 0.98, max_size: int = 1000):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._spaces = {}
+        self._order = deque()
+
+    @staticmethod
+    def _normalized(vector: List[float]) -> np.ndarray:
+        matrix = np.asarray([vector], dtype="float32")
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    @staticmethod
+    def _rebuild(space: dict) -> None:
+        space["index"] = faiss.IndexFlatIP(space["vectors"][0].shape[1])
+        space["index"].add(np.vstack(space["vectors"]))
+
+    def lookup(self, query_embedding: List[float], namespace: str = "") -> Tuple[Optional[Any], int]:
+        matrix = self._normalized(query_embedding)
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is not None:
+                scores, rows = space["index"].search(matrix, 1)
+                if rows[0][0] >= 0 and scores[0][0] >= self.threshold:
+                    self.hits += 1
+                    return space["answers"][rows[0][0]], self.version
+            self.misses += 1
+            return None, self.version
+
+    def store(self, query_embedding: List[float], answer: Any, version: int, namespace: str = "") -> None:
+        if self.max_size <= 0:
+            return
+        matrix = self._normalized(query_embedding)
+        with self._lock:
+            if version != self.version:
+                return
+            space = self._spaces.get(namespace)
+            if space is None:
+                space = self._spaces[namespace] = {"vectors": [matrix], "answers": [answer]}
+                self._rebuild(space)
+            else:
+                space["vectors"].append(matrix)
+                space["answers"].append(answer)
+                space["index"].add(matrix)
+            self._order.append(namespace)
+            if len(self._order) > self.max_size:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        namespace = self._order.popleft()
+        space = self._spaces[namespace]
+        del space["vectors"][0]
+        del space["answers"][0]
+        if space["answers"]:
+            self._rebuild(space)
+        else:
+            del self._spaces[namespace]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._reset()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._order),
+                "namespaces": len(self._spaces),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
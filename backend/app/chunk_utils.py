@@ -0,0 +1,161 @@
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+from app.embedding_utils import approx_token_count
+
+HEADING = re.compile(r"#{1,6}\s+(?P<title>.*\S)")
+HEADING_LINE_START = re.compile(r"\n(?=#{1,6}\s)")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+Piece = Union[str, Tuple[Optional[int], str]]
+
+
+def iter_text_file(path, block_chars=1024 * 1024, encoding="utf-8") -> Iterator[str]:
+    with open(path, encoding=encoding) as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            yield block
+
+
+def _cut_point(buffer: str, start: int, limit: int) -> int:
+    # Prefer the last sentence end before `limit`, then the last space, then a hard cut.
+    last = None
+    for match in SENTENCE_END.finditer(buffer, start, limit):
+        last = match.end()
+    if last is not None and last > start:
+        return last
+    space = buffer.rfind(" ", start, limit)
+    return space + 1 if space > start else limit
+
+
+def _split_units(buffer: str, final: bool, max_unit_chars: int) -> Tuple[List[Tuple[int, int]], int]:
+    """Split the complete paragraphs at the front of `buffer` into units of at most `max_unit_chars`.
+
+    A paragraph ends at a blank line, and a heading line always starts a new unit.
+    Text after the last blank line is held back for the next piece, unless `final`
+    is set or it is already too long to be one unit. Returns (start, end) ranges and
+    the number of characters consumed.
+    """
+    ranges, pos, brk = [], 0, None
+    while pos < len(buffer):
+        if brk is None or 0 <= brk < pos:
+            # Search once per paragraph break, not once per unit, so a transcript
+            # without blank lines is not rescanned to the end for every cut.
+            brk = buffer.find("\n\n", pos)
+        if brk != -1:
+            end = brk + 2
+            while end < len(buffer) and buffer[end] == "\n":
+                end += 1
+        elif final:
+            end = len(buffer)
+        elif len(buffer) - pos > max_unit_chars:
+            end = _cut_point(buffer, pos, pos + max_unit_chars)
+        else:
+            break
+        starts = [pos] + [m.start() + 1 for m in HEADING_LINE_START.finditer(buffer, pos, end)] + [end]
+        for start, stop in zip(starts, starts[1:]):
+            while stop - start > max_unit_chars:
+                cut = _cut_point(buffer, start, start + max_unit_chars)
+                ranges.append((start, cut))
+                start = cut
+            if stop > start:
+                ranges.append((start, stop))
+        pos = end
+    return ranges, pos
+
+
+def _iter_units(pieces: Iterable[Piece], max_unit_chars: int) -> Iterator[Tuple[str, int, Optional[int]]]:
+    buffer, base, page = "", 0, None
+    for piece in pieces:
+        piece_page, text = piece if isinstance(piece, tuple) else (page, piece)
+        if piece_page != page and buffer:
+            # Units never span pages, so page numbers stay exact.
+            ranges, consumed = _split_units(buffer, True, max_unit_chars)
+            for start, end in ranges:
+                yield buffer[start:end], base + start, page
+            buffer, base = "", base + consumed
+        page = piece_page
+        buffer += text
+        ranges, consumed = _split_units(buffer, False, max_unit_chars)
+        for start, end in ranges:
+            yield buffer[start:end], base + start, page
+        buffer, base = buffer[consumed:], base + consumed
+    ranges, _ = _split_units(buffer, True, max_unit_chars)
+    for start, end in ranges:
+        yield buffer[start:end], base + start, page
+
+
+def iter_chunks(
+    pieces: Iterable[Piece],
+    source_id: Optional[str] = None,
+    max_tokens: int = 400,
+    overlap_tokens: int = 50,
+    count_tokens: Callable[[str], int] = approx_token_count,
+    min_chars: int = 50,
+) -> Iterator[Document]:
+    """Chunk a text stream on headings and paragraph boundaries under a token limit.
+
+    `pieces` is any iterable of text pieces (e.g. file blocks from iter_text_file),
+    or (page_number, text) pairs for paged sources. Only the unfinished paragraph and
+    the current chunk are held in memory. Paragraphs longer than a chunk are cut at
+    sentence ends. Consecutive chunks of the same section share up to
+    `overlap_tokens` of trailing units; a heading always starts a new chunk.
+
+    Each chunk's metadata holds `start`/`end` character offsets into the
+    concatenated input, so `text[start:end] == chunk.page_content`. It also holds the
+    heading path (`section`), `page` (plus `page_end` when the chunk crosses a page)
+    and `source_id`.
+    """
+    # Units are capped well under a chunk; most tokenizers average over two characters per token.
+    max_unit_chars = max(64, max_tokens * 2)
+    units: List[Tuple[str, int, Optional[int], int]] = []
+    headings: List[Tuple[int, str]] = []
+    tokens_in_chunk = 0
+
+    def emit(carry: bool):
+        nonlocal units, tokens_in_chunk
+        if units:
+            raw = "".join(unit[0] for unit in units)
+            text = raw.strip()
+            if len(text) >= min_chars:
+                start = units[0][1] + (len(raw) - len(raw.lstrip()))
+                metadata = {"start": start, "end": start + len(text)}
+                if source_id is not None:
+                    metadata["source_id"] = source_id
+                # Pages of the first and last units with text: a unit that is only the blank
+                # line opening the next page is stripped from the chunk, so it sets no page.
+                pages = [unit[2] for unit in units if unit[0].strip()]
+                if pages[0] is not None:
+                    metadata["page"] = pages[0]
+                    if pages[-1] != pages[0]:
+                        metadata["page_end"] = pages[-1]
+                if headings:
+                    metadata["section"] = " > ".join(title for _, title in headings)
+                yield Document(page_content=text, metadata=metadata)
+        kept, kept_tokens = [], 0
+        if carry:
+            for unit in reversed(units[1:]):
+                if kept_tokens + unit[3] > overlap_tokens:
+                    break
+                kept.insert(0, unit)
+                kept_tokens += unit[3]
+        units, tokens_in_chunk = kept, kept_tokens
+
+    for raw, start, page in _iter_units(pieces, max_unit_chars):
+        heading = HEADING.match(raw.lstrip("\n"))
+        if heading:
+            yield from emit(carry=False)
+            level = len(raw.lstrip("\n")) - len(raw.lstrip("\n").lstrip("#"))
+            headings = [h for h in headings if h[0] < level] + [(level, heading.group("title").strip("*_ "))]
+        tokens = count_tokens(raw)
+        if units and tokens_in_chunk + tokens > max_tokens:
+            yield from emit(carry=True)
+            if tokens_in_chunk + tokens > max_tokens:
+                units, tokens_in_chunk = [], 0
+        units.append((raw, start, page, tokens))
+        tokens_in_chunk += tokens
+    yield from emit(carry=False)
@@ -1,13 +1,16 @@
-import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import urllib
+from concurrent.futures import ThreadPoolExecutor
+from app.cache_utils import EmbeddingCache, SemanticAnswerCache, content_hash
+from app.embedding_utils import BatchEmbedder, approx_token_count, embedding_dimension, token_counter_for
+from app.registry import ComponentRegistry
+from app.job_utils import IngestJobQueue
+from app.blob_utils import BlobStore
+from app.pdf_utils import pdf_process_pool
+from app.index_utils import build_index, min_training_vectors, apply_search_params, TRAINED_INDEX_TYPES
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -16,38 +19,237 @@ DATABASE = os.getenv("SQL_DATABASE", "KnowledgeBase")
 USER     = os.getenv("SQL_USER", "sa1")                      
 PASSWORD = os.getenv("SQL_PASSWORD", "123")
 DRIVER   = os.getenv("SQL_DRIVER", "ODBC Driver 18 for SQL Server")
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-mpnet-base-v2-onnx")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_MICROBATCH_SIZE = int(os.getenv("EMBED_MICROBATCH_SIZE", "32"))
+EMBED_MICROBATCH_WAIT_MS = float(os.getenv("EMBED_MICROBATCH_WAIT_MS", "2"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+EMBEDDING_CACHE_DISK_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ROWS", "100000"))
+CHUNK_EMBEDDING_CACHE_PATH = os.getenv("CHUNK_EMBEDDING_CACHE_PATH", "cache/chunk_embeddings.sqlite")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "60000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+# ada-002 puts unrelated questions about one product at cosine 0.90-0.95, so only near-paraphrases may hit.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.98"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+COMPACT_AFTER_SEGMENTS = int(os.getenv("COMPACT_AFTER_SEGMENTS", "8"))
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+PQ_M = int(os.getenv("PQ_M", "16"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+INGEST_JOBS_DIR = os.getenv("INGEST_JOBS_DIR", "ingest_jobs")
+AUDIO_BITRATE_KBPS = int(os.getenv("AUDIO_BITRATE_KBPS", "64"))
+SILENCE_TRIM = os.getenv("SILENCE_TRIM", "true").lower() in ("1", "true", "yes")
+SILENCE_NOISE_DB = float(os.getenv("SILENCE_NOISE_DB", "-35"))
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "0.5"))
+SILENCE_DROP_SECONDS = float(os.getenv("SILENCE_DROP_SECONDS", "2.0"))
+SILENCE_PADDING_SECONDS = float(os.getenv("SILENCE_PADDING_SECONDS", "0.25"))
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+TRANSCRIBE_MAX_RETRIES = int(os.getenv("TRANSCRIBE_MAX_RETRIES", "4"))
+TRANSCRIBE_REQUESTS_PER_MINUTE = int(os.getenv("TRANSCRIBE_REQUESTS_PER_MINUTE", "50"))
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blob_store")
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(1024 * 1024)))
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "5"))
+INDEX_TRAIN_MIN_VECTORS = int(os.getenv("INDEX_TRAIN_MIN_VECTORS", "0")) or min_training_vectors(FAISS_INDEX_TYPE, IVF_NLIST)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0"))
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "12"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.0"))
+CONTEXT_SCORE_MARGIN = float(os.getenv("CONTEXT_SCORE_MARGIN", "0.1"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RRF_K = int(os.getenv("RRF_K", "60"))
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_MODEL_DIR = os.getenv("RERANK_MODEL_DIR", "models/ms-marco-MiniLM-L-6-v2-onnx")
+RERANK_QUANTIZE = os.getenv("RERANK_QUANTIZE", "true").lower() in ("1", "true", "yes")
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "30"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))
+STARTUP_WARMUP = [name.strip() for name in os.getenv(
+    "STARTUP_WARMUP", "embeddings,embedding_engine,llm,vector_store" + (",reranker" if RERANK_ENABLED else "")
+).split(",") if name.strip()]
 
-# embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-embeddings = OpenAIEmbeddings(model = "text-embedding-ada-002", api_key = OPENAI_API_KEY)
-index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
-
-vector_store = FAISS(
-    embedding_function=embeddings,
-    index=index,
-    docstore=InMemoryDocstore(),
-    index_to_docstore_id={},
-)
-
-llm = ChatOpenAI(
-    model="gpt-4o",
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-    api_key=OPENAI_API_KEY
-)
-
-conn_str = (
-    f"DRIVER={{{DRIVER}}};"           
-    f"SERVER={SERVER};"
-    f"DATABASE={DATABASE};"
-    f"UID={USER};PWD={PASSWORD};"
-    "Encrypt=Yes;"                    
-    "TrustServerCertificate=Yes"      
-)
-odbc_connect = urllib.parse.quote_plus(conn_str)
-
-engine = create_engine(f"mssql+pyodbc:///?odbc_connect={odbc_connect}", fast_executemany=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-Base = declarative_base()
+if EMBEDDING_BACKEND == "onnx":
+    EMBEDDING_MODEL_ID = f"{LOCAL_EMBEDDING_MODEL}:onnx-{'int8' if ONNX_QUANTIZE else 'fp32'}"
+elif EMBEDDING_BACKEND == "huggingface":
+    EMBEDDING_MODEL_ID = LOCAL_EMBEDDING_MODEL
+else:
+    EMBEDDING_MODEL_ID = EMBEDDING_MODEL
+
+# Clients and models are built on first use (or by warmup() at startup), never at import.
+components = ComponentRegistry()
+
+def _build_embeddings():
+    if EMBEDDING_BACKEND == "onnx":
+        from app.local_embedding_utils import MicroBatchedEmbeddings, OnnxEmbeddings, export_onnx_model
+        # CPU only: the checkpoint is exported (and int8-quantized) on first start, then loaded with onnxruntime.
+        return MicroBatchedEmbeddings(
+            OnnxEmbeddings(export_onnx_model(LOCAL_EMBEDDING_MODEL, ONNX_MODEL_DIR, quantize=ONNX_QUANTIZE), threads=EMBED_THREADS),
+            max_batch_size=EMBED_MICROBATCH_SIZE,
+            max_wait_ms=EMBED_MICROBATCH_WAIT_MS,
+        )
+    if EMBEDDING_BACKEND == "huggingface":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from app.local_embedding_utils import MicroBatchedEmbeddings
+        return MicroBatchedEmbeddings(
+            HuggingFaceEmbeddings(model_name=LOCAL_EMBEDDING_MODEL, encode_kwargs={"normalize_embeddings": True}),
+            max_batch_size=EMBED_MICROBATCH_SIZE,
+            max_wait_ms=EMBED_MICROBATCH_WAIT_MS,
+        )
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model = EMBEDDING_MODEL, api_key = OPENAI_API_KEY)
+
+def _warm_embeddings(model):
+    # Local models pay for lazy kernel setup on the first forward pass; do it before the first query.
+    if EMBEDDING_BACKEND != "openai":
+        model.embed_query("hello world")
+
+def _build_embedding_engine():
+    if EMBEDDING_BACKEND == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        # Ingest-side client: batching, concurrency and retries are handled by the engine,
+        # so the SDK sends each packed batch as one request and does not retry on its own.
+        ingest_embeddings = OpenAIEmbeddings(
+            model = EMBEDDING_MODEL,
+            api_key = OPENAI_API_KEY,
+            chunk_size = EMBED_BATCH_SIZE,
+            max_retries = 0
+        )
+        return BatchEmbedder(
+            ingest_embeddings.embed_documents,
+            batch_size=EMBED_BATCH_SIZE,
+            max_batch_tokens=EMBED_BATCH_TOKENS,
+            concurrency=EMBED_CONCURRENCY,
+            max_retries=EMBED_MAX_RETRIES,
+            count_tokens=token_counter_for(EMBEDDING_MODEL),
+        )
+    # A local forward pass already uses every core, so batches run one at a time.
+    return BatchEmbedder(
+        components.get("embeddings").embed_documents,
+        batch_size=EMBED_BATCH_SIZE,
+        max_batch_tokens=EMBED_BATCH_TOKENS,
+        concurrency=1,
+        max_retries=0,
+        count_tokens=approx_token_count,
+    )
+
+def get_embedding_dim():
+    dim = EMBEDDING_DIM or embedding_dimension(LOCAL_EMBEDDING_MODEL if EMBEDDING_BACKEND != "openai" else EMBEDDING_MODEL)
+    if dim is None:
+        print(f"Unknown dimension for {EMBEDDING_MODEL_ID}; probing with one embedding call (set EMBEDDING_DIM to skip).")
+        dim = len(components.get("embeddings").embed_query("hello world"))
+    return dim
+
+def _build_vector_store():
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    # IVF indexes need training data, so they start out flat and are rebuilt once enough vectors exist.
+    index = build_index(
+        get_embedding_dim(),
+        "flat" if FAISS_INDEX_TYPE in TRAINED_INDEX_TYPES else FAISS_INDEX_TYPE,
+        nlist=IVF_NLIST,
+        hnsw_m=HNSW_M,
+        pq_m=PQ_M,
+    )
+    apply_search_params(index, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH)
+    return FAISS(
+        embedding_function=components.get("embeddings"),
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+
+def _build_reranker():
+    from app.local_embedding_utils import export_onnx_model
+    from app.rerank_utils import OnnxCrossEncoder
+    # Exported (and int8-quantized) on first start like the ONNX embedding backend.
+    model_path = export_onnx_model(RERANK_MODEL, RERANK_MODEL_DIR, quantize=RERANK_QUANTIZE, sequence_classification=True)
+    return OnnxCrossEncoder(model_path, threads=RERANK_THREADS, batch_size=RERANK_BATCH_SIZE)
+
+def _build_llm():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=0,
+        max_tokens=None,
+        timeout=None,
+        max_retries=2,
+        api_key=OPENAI_API_KEY
+    )
 
+embeddings = components.register("embeddings", _build_embeddings, warm=_warm_embeddings)
+embedding_engine = components.register("embedding_engine", _build_embedding_engine)
+vector_store = components.register("vector_store", _build_vector_store)
+llm = components.register("llm", _build_llm)
+components.register("reranker", _build_reranker, warm=lambda model: model.score("hello", ["world"]))
+components.register("prompt_token_counter", lambda: token_counter_for(LLM_MODEL))
+
+# FAISS releases the GIL while searching, so a small pool keeps searches off the event loop.
+# Threads are only started by the first search.
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="faiss-search")
+
+# Caches, the job queue and the blob store create files and folders, so they are built on
+# first use too: importing this module has no side effects beyond reading the environment.
+query_embedding_cache = components.register("query_embedding_cache", lambda: EmbeddingCache(
+    model_name=EMBEDDING_MODEL_ID,
+    max_size=EMBEDDING_CACHE_SIZE,
+    ttl_seconds=EMBEDDING_CACHE_TTL,
+    disk_path=EMBEDDING_CACHE_PATH or None,
+    disk_max_rows=EMBEDDING_CACHE_DISK_MAX_ROWS or None,
+))
+
+# Chunk text is hashed as-is (no normalization) and never expires, so re-ingesting a
+# revised document only embeds the chunks whose text changed.
+chunk_embedding_cache = components.register("chunk_embedding_cache", lambda: EmbeddingCache(
+    model_name=EMBEDDING_MODEL_ID,
+    max_size=0,
+    ttl_seconds=None,
+    disk_path=CHUNK_EMBEDDING_CACHE_PATH or None,
+    normalize=content_hash,
+))
+
+answer_cache = components.register("answer_cache", lambda: SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_size=ANSWER_CACHE_SIZE,
+))
+
+ingest_queue = components.register("ingest_queue", lambda: IngestJobQueue(INGEST_JOBS_DIR, max_workers=INGEST_WORKERS))
+blob_store = components.register("blob_store", lambda: BlobStore(BLOB_STORE_DIR, chunk_size=BLOB_CHUNK_SIZE))
+# One pool of PDF conversion processes for the server's lifetime; workers start on first use.
+pdf_pool = components.register("pdf_pool", lambda: pdf_process_pool(PDF_WORKERS))
+
+def _build_session_factory():
+    conn_str = (
+        f"DRIVER={{{DRIVER}}};"
+        f"SERVER={SERVER};"
+        f"DATABASE={DATABASE};"
+        f"UID={USER};PWD={PASSWORD};"
+        "Encrypt=Yes;"
+        "TrustServerCertificate=Yes"
+    )
+    odbc_connect = urllib.parse.quote_plus(conn_str)
+    engine = create_engine(f"mssql+pyodbc:///?odbc_connect={odbc_connect}", fast_executemany=True)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+SessionLocal = components.register("sql_sessions", _build_session_factory)
+Base = declarative_base()
@@ -0,0 +1,193 @@
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+def distance_to_similarity(distance: float) -> float:
+    # FAISS returns squared L2 distances; for unit-length embeddings ||a - b||^2 = 2 - 2cos(a, b).
+    return 1.0 - float(distance) / 2.0
+
+
+def _word_overlap(left: List[str], right: List[str], min_words: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right` (0 if under `min_words`)."""
+    if not right:
+        return 0
+    # Scanning start positions left to right finds the longest overlap first.
+    for start in range(max(0, len(left) - len(right)), len(left) - min_words + 1):
+        if left[start] == right[0] and left[start:] == right[:len(left) - start]:
+            return len(left) - start
+    return 0
+
+
+def _same_source(a: Document, b: Document) -> bool:
+    # Chunks without a source_id (e.g. indexed before sources were recorded) never merge:
+    # their offsets and pages could belong to different documents.
+    source = a.metadata.get("source_id")
+    return source is not None and source == b.metadata.get("source_id")
+
+
+def _merge_by_offsets(a: Document, b: Document) -> Optional[Document]:
+    # Chunks from iter_chunks carry exact character offsets, so overlap is a range check.
+    first, second = (a, b) if a.metadata["start"] <= b.metadata["start"] else (b, a)
+    if second.metadata["start"] > first.metadata["end"] + 2:
+        return None
+    if second.metadata["end"] <= first.metadata["end"]:
+        return first
+    gap = second.metadata["start"] - first.metadata["end"]
+    # Chunks are stripped, so a gap is whitespace: a space inside a paragraph, a blank line between them.
+    separator = "" if gap <= 0 else " " if gap == 1 else "\n\n"
+    tail = second.page_content[max(0, -gap):]
+    metadata = _merged_metadata(first, second)
+    metadata["end"] = second.metadata["end"]
+    return Document(page_content=first.page_content + separator + tail, metadata=metadata)
+
+
+def _adjacent(a: Document, b: Document) -> bool:
+    page_a, page_b = a.metadata.get("page"), b.metadata.get("page")
+    return page_a is not None and page_b is not None and abs(page_a - page_b) <= 1
+
+
+def _merge_pair(a: Document, b: Document, min_overlap: int) -> Optional[Document]:
+    if not _same_source(a, b):
+        return None
+    if all(key in d.metadata for d in (a, b) for key in ("start", "end")):
+        merged = _merge_by_offsets(a, b)
+        if merged is not None:
+            return merged
+    words_a, words_b = a.page_content.split(), b.page_content.split()
+    for first, second, words_first, words_second in ((a, b, words_a, words_b), (b, a, words_b, words_a)):
+        size = _word_overlap(words_first, words_second, min_overlap)
+        if size:
+            text = " ".join(words_first + words_second[size:])
+            return Document(page_content=text, metadata=_merged_metadata(first, second))
+    if " ".join(words_b) in " ".join(words_a):
+        return a
+    if " ".join(words_a) in " ".join(words_b):
+        return b
+    if _adjacent(a, b):
+        first, second = (a, b) if a.metadata["page"] <= b.metadata["page"] else (b, a)
+        return Document(page_content=f"{first.page_content}\n\n{second.page_content}", metadata=_merged_metadata(first, second))
+    return None
+
+
+def _merged_metadata(first: Document, second: Document) -> dict:
+    metadata = dict(first.metadata)
+    pages = sorted({
+        p for d in (first, second)
+        for p in d.metadata.get("pages", [d.metadata.get("page"), d.metadata.get("page_end")])
+        if p is not None
+    })
+    if pages:
+        metadata["page"] = pages[0]
+        metadata["pages"] = pages
+    return metadata
+
+
+def merge_chunks(candidates: List[Tuple[Document, float]], min_overlap: int = 8) -> List[Tuple[Document, float]]:
+    """Merge overlapping, contained or page-adjacent chunks of the same source; a merged block keeps the best score."""
+    blocks = list(candidates)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(blocks)):
+            for j in range(i + 1, len(blocks)):
+                combined = _merge_pair(blocks[i][0], blocks[j][0], min_overlap)
+                if combined is not None:
+                    blocks[i] = (combined, max(blocks[i][1], blocks[j][1]))
+                    del blocks[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return blocks
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def mmr_order(blocks: List[Tuple[Document, float]], lambda_mult: float = 0.7) -> List[Tuple[Document, float]]:
+    """Order blocks by maximal marginal relevance, using word-set Jaccard similarity as redundancy."""
+    words = [set(doc.page_content.lower().split()) for doc, _ in blocks]
+    remaining = list(range(len(blocks)))
+    selected: List[int] = []
+    while remaining:
+        def mmr(i):
+            redundancy = max((_jaccard(words[i], words[j]) for j in selected), default=0.0)
+            return lambda_mult * blocks[i][1] - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=mmr)
+        selected.append(best)
+        remaining.remove(best)
+    return [blocks[i] for i in selected]
+
+
+def _truncate_to_budget(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low])
+
+
+def score_cutoff(
+    results: List[Tuple[Document, float]],
+    min_score: float = 0.0,
+    score_margin: float = 0.1,
+    distances: bool = True,
+) -> List[Tuple[Document, float]]:
+    """(Document, similarity) hits, best first, at or above `min_score` and within
+    `score_margin` of the best hit. The best hit is always kept."""
+    to_score = distance_to_similarity if distances else float
+    scored = sorted(((doc, to_score(d)) for doc, d in results), key=lambda r: r[1], reverse=True)
+    if not scored:
+        return []
+    best = scored[0][1]
+    return [scored[0]] + [
+        (doc, score) for doc, score in scored[1:]
+        if score >= min_score and score >= best - score_margin
+    ]
+
+
+def assemble_context(
+    results: List[Tuple[Document, float]],
+    count_tokens: Callable[[str], int],
+    token_budget: int = 1500,
+    min_score: float = 0.0,
+    score_margin: float = 0.1,
+    lambda_mult: float = 0.7,
+    min_overlap: int = 8,
+    distances: bool = True,
+) -> List[Tuple[Document, float]]:
+    """Turn raw search hits into the blocks that go into the prompt.
+
+    1. Scores become cosine similarities (unless `distances` is False, in which case
+       they already are relevance scores in [0, 1], e.g. fused ranks). Hits below
+       `min_score`, or more than `score_margin` below the best hit, are dropped
+       (score_cutoff). The best hit is always kept.
+    2. Overlapping or adjacent chunks of the same source are merged (merge_chunks).
+    3. Blocks are ordered by MMR, so near-duplicates fall to the back.
+    4. Blocks are packed until `token_budget` is reached. The first block is
+       truncated rather than dropped if it is larger than the budget on its own.
+
+    Returns (Document, similarity) pairs in prompt order.
+    """
+    kept = score_cutoff(results, min_score, score_margin, distances=distances)
+    if not kept:
+        return []
+    blocks = mmr_order(merge_chunks(kept, min_overlap=min_overlap), lambda_mult=lambda_mult)
+
+    packed, used = [], 0
+    for doc, score in blocks:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= token_budget:
+            packed.append((doc, score))
+            used += tokens
+        elif not packed:
+            text = _truncate_to_budget(doc.page_content, token_budget, count_tokens)
+            packed.append((Document(page_content=text, metadata=doc.metadata), score))
+            used = count_tokens(text)
+    return packed
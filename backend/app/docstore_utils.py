@@ -0,0 +1,189 @@
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, List, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """Chunk text and metadata kept in SQLite and materialized only for the hits a search returns.
+
+    `row_id` is the FAISS row of the chunk. It is assigned by SqliteIndexMap when
+    LangChain's FAISS wrapper records the new rows after adding them to the index.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self._conn = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing a module that holds a docstore creates no files.
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS chunks (
+                            id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                            doc_id   TEXT    NOT NULL UNIQUE,
+                            row_id   INTEGER UNIQUE,
+                            text     TEXT    NOT NULL,
+                            metadata TEXT    NOT NULL
+                        )
+                        """
+                    )
+                    conn.commit()
+                    self._conn = conn
+        return self._conn
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+            for doc_id, doc in texts.items()
+        ]
+        with self.lock:
+            try:
+                self.conn.executemany(
+                    "INSERT INTO chunks (doc_id, text, metadata) VALUES (?, ?, ?)", rows
+                )
+                self.conn.commit()
+            except sqlite3.IntegrityError:
+                self.conn.rollback()
+                raise ValueError("Tried to add ids that already exist in the docstore")
+
+    def delete(self, ids: List) -> None:
+        with self.lock:
+            self.conn.executemany("DELETE FROM chunks WHERE doc_id = ?", [(i,) for i in ids])
+            self.conn.commit()
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT text, metadata FROM chunks WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def get_rows(self, row_ids: List[int]) -> Dict[int, Document]:
+        """Documents for the given FAISS rows, fetched in one query."""
+        if not row_ids:
+            return {}
+        placeholders = ",".join("?" * len(row_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT row_id, doc_id, text, metadata FROM chunks WHERE row_id IN ({placeholders})",
+                [int(row_id) for row_id in row_ids],
+            ).fetchall()
+        return {
+            row_id: Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            for row_id, doc_id, text, metadata in rows
+        }
+
+    def iter_texts(self, start: int, stop: int, batch_size: int = 1000):
+        """(row_id, text) for FAISS rows in [start, stop), in row order."""
+        while start < stop:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT row_id, text FROM chunks WHERE row_id >= ? AND row_id < ? ORDER BY row_id LIMIT ?",
+                    (start, stop, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            start = rows[-1][0] + 1
+
+    def existing_ids(self, ids: List[str]) -> set:
+        found = set()
+        with self.lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT doc_id FROM chunks WHERE row_id IS NOT NULL AND doc_id IN ({placeholders})", batch
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+
+    def truncate(self, ntotal: int) -> int:
+        """Drop chunks whose vectors never made it into the index (e.g. after a crash mid-upload)."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM chunks WHERE row_id IS NULL OR row_id >= ?", (ntotal,)
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def import_documents(self, docstore, index_to_docstore_id) -> None:
+        """One-off migration from a pickled InMemoryDocstore."""
+        rows = []
+        for row_id, doc_id in index_to_docstore_id.items():
+            doc = docstore.search(doc_id)
+            rows.append((doc_id, int(row_id), doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (doc_id, row_id, text, metadata) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+
+class SqliteIndexMap(MutableMapping):
+    """FAISS row id -> docstore id, read from the docstore table instead of an in-memory dict."""
+
+    def __init__(self, docstore: SqliteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, row_id):
+        with self.docstore.lock:
+            row = self.docstore.conn.execute(
+                "SELECT doc_id FROM chunks WHERE row_id = ?", (int(row_id),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(row_id)
+        return row[0]
+
+    def __setitem__(self, row_id, doc_id):
+        self.update({row_id: doc_id})
+
+    def __delitem__(self, row_id):
+        with self.docstore.lock:
+            self.docstore.conn.execute(
+                "UPDATE chunks SET row_id = NULL WHERE row_id = ?", (int(row_id),)
+            )
+            self.docstore.conn.commit()
+
+    def update(self, mapping=(), **kwargs):
+        items = dict(mapping, **kwargs).items()
+        with self.docstore.lock:
+            self.docstore.conn.executemany(
+                "UPDATE chunks SET row_id = ? WHERE doc_id = ?",
+                [(int(row_id), doc_id) for row_id, doc_id in items],
+            )
+            self.docstore.conn.commit()
+
+    def __iter__(self):
+        with self.docstore.lock:
+            rows = self.docstore.conn.execute(
+                "SELECT row_id FROM chunks WHERE row_id IS NOT NULL ORDER BY row_id"
+            ).fetchall()
+        return iter(row[0] for row in rows)
+
+    def __len__(self):
+        with self.docstore.lock:
+            return self.docstore.conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE row_id IS NOT NULL"
+            ).fetchone()[0]
@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """Transient OpenAI errors worth retrying.
+
+    openai is imported on the first failed call instead of at module import: it takes
+    about a second, and this module is on the server's startup path. An `except
+    retryable_errors():` clause is only evaluated once an exception is raised.
+    """
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+def is_rate_limit_error(error) -> bool:
+    return isinstance(error, retryable_errors()[0])
+
+# Output sizes of the models this backend is used with, so the index can be built without an embedding call.
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "sentence-transformers/all-mpnet-base-v2": 768,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+}
+
+def embedding_dimension(model_name):
+    return EMBEDDING_DIMENSIONS.get(model_name)
+
+def approx_token_count(text):
+    # Roughly four characters per token for English text.
+    return len(text) // 4 + 1
+
+def token_counter_for(model_name):
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable ({e}); estimating embedding batch tokens from text length.")
+        return approx_token_count
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+def pack_batches(texts, max_items, max_tokens, count_tokens=approx_token_count):
+    """Group text indexes into batches of at most `max_items` texts and `max_tokens` tokens.
+
+    A text that is larger than `max_tokens` on its own is sent as a batch of one.
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+class AdaptiveConcurrency:
+    """Concurrency limit that halves on rate-limit errors and grows back by one per window of successes."""
+
+    def __init__(self, max_limit, cooldown_seconds=1.0):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # Requests that were already in flight fail together; count that as one signal.
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+class BatchEmbedder:
+    """Embeds large text lists in token-packed batches over a pool of concurrent requests.
+
+    `embed_batch` takes a list of texts and returns one vector per text (e.g.
+    `OpenAIEmbeddings.embed_documents` with the SDK's own retries disabled). Rate-limit
+    errors shrink the number of requests in flight and are retried with jittered
+    exponential backoff, honouring Retry-After. `on_batch(texts, vectors)` runs as each
+    batch completes, so persisting there (see embed_documents_cached) lets an
+    interrupted ingest resume without re-embedding finished batches.
+    """
+
+    def __init__(self, embed_batch, batch_size=256, max_batch_tokens=60000, concurrency=4,
+                 max_retries=6, count_tokens=approx_token_count, max_backoff_seconds=60.0):
+        self.embed_batch = embed_batch
+        self.batch_size = max(1, batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.count_tokens = count_tokens
+        self.max_backoff_seconds = max_backoff_seconds
+
+    def _embed_with_retry(self, texts, gate, timings, stats_lock):
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            gate.acquire()
+            throttled = False
+            try:
+                return self.embed_batch(texts)
+            except retryable_errors() as e:
+                throttled = is_rate_limit_error(e)
+                with stats_lock:
+                    timings["retries"] += 1
+                    timings["throttled"] += throttled
+                if attempt == self.max_retries:
+                    raise
+                wait = retry_after_seconds(e) or delay + random.uniform(0, delay / 2)
+            finally:
+                gate.release(throttled)
+            time.sleep(wait)
+            delay = min(delay * 2, self.max_backoff_seconds)
+
+    def embed(self, texts, on_batch=None, timings=None):
+        timings = timings if timings is not None else {}
+        timings.update({"chunks": len(texts), "batches": 0, "retries": 0, "throttled": 0})
+        if not texts:
+            timings.update({"seconds": 0.0, "chunks_per_second": 0.0})
+            return []
+
+        t0 = time.perf_counter()
+        batches = pack_batches(texts, self.batch_size, self.max_batch_tokens, self.count_tokens)
+        timings["batches"] = len(batches)
+        gate = AdaptiveConcurrency(self.concurrency)
+        stats_lock = threading.Lock()
+        vectors = [None] * len(texts)
+
+        def run(batch):
+            batch_texts = [texts[i] for i in batch]
+            batch_vectors = self._embed_with_retry(batch_texts, gate, timings, stats_lock)
+            if on_batch is not None:
+                on_batch(batch_texts, batch_vectors)
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+            for future in [pool.submit(run, batch) for batch in batches]:
+                future.result()
+
+        timings["seconds"] = time.perf_counter() - t0
+        timings["chunks_per_second"] = len(texts) / timings["seconds"] if timings["seconds"] else 0.0
+        timings["final_concurrency"] = int(gate.limit)
+        return vectors
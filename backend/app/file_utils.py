@@ -1,15 +1,112 @@
-def _parse_range_header(range_header: str, file_size: int):
+from typing import Callable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+ReadRange = Callable[[int, int], Iterator[bytes]]
+
+
+def _parse_ranges(range_header: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a `bytes=` Range header (single, multi and suffix ranges).
+
+    Returns None when the header is malformed (serve the full body), an empty list
+    when no range is satisfiable (416), otherwise the inclusive (start, end) pairs.
+    """
     try:
-        units, _, rng = range_header.partition("=")
+        units, _, spec = range_header.partition("=")
         if units.strip().lower() != "bytes":
             return None
-        start_s, _, end_s = rng.partition("-")
-        if start_s == "":
-            return None
-        start = int(start_s)
-        end = int(end_s) if end_s else file_size - 1
-        if start < 0 or end < start or end >= file_size:
-            return None
-        return start, end
-    except Exception:
-        return None
\ No newline at end of file
+        ranges = []
+        for part in spec.split(","):
+            start_s, sep, end_s = part.strip().partition("-")
+            if not sep:
+                return None
+            if start_s == "":
+                length = int(end_s)
+                if length <= 0:
+                    continue
+                start, end = max(0, file_size - length), file_size - 1
+            else:
+                start = int(start_s)
+                end = min(int(end_s), file_size - 1) if end_s else file_size - 1
+            if start < 0 or start > end or start >= file_size:
+                continue
+            ranges.append((start, end))
+        return ranges
+    except ValueError:
+        return None
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def serve_blob(
+    request: Request,
+    size: int,
+    etag: str,
+    read_range: ReadRange,
+    content_type: str,
+    file_name: str,
+    disposition: str = "inline",
+) -> Response:
+    """Answer a GET for a stored file, reading only the requested byte ranges and streaming them in chunks."""
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'{disposition}; filename="{file_name}"',
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        ranges = _parse_ranges(range_header, size)
+        if ranges == []:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(read_range(start, end), status_code=206, media_type=content_type, headers=headers)
+        if ranges:
+            return _multipart_response(ranges, size, read_range, content_type, headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(read_range(0, size - 1), media_type=content_type, headers=headers)
+
+
+def _multipart_response(ranges, size, read_range: ReadRange, content_type: str, headers: dict) -> Response:
+    boundary = uuid4().hex
+    part_headers = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(h) + (end - start + 1) for h, (start, end) in zip(part_headers, ranges))
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    def body():
+        for i, (part_header, (start, end)) in enumerate(zip(part_headers, ranges)):
+            if i:
+                yield b"\r\n"
+            yield part_header
+            yield from read_range(start, end)
+        yield closing
+
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        body(),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
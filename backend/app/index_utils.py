@@ -0,0 +1,101 @@
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq")
+PQ_NBITS = 8
+
+
+def build_index(dimension: int, index_type: str = "flat", nlist: int = 1024, hnsw_m: int = 32, pq_m: int = 16):
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = max(40, 4 * hnsw_m)
+        return index
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+    if index_type == "ivf_pq":
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, pq_m, PQ_NBITS)
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+
+def get_index_type(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def min_training_vectors(index_type: str, nlist: int) -> int:
+    # FAISS warns below ~39 training points per centroid: `nlist` coarse centroids, and for
+    # IVF-PQ also 2^PQ_NBITS centroids in each sub-quantizer, trained on the same vectors.
+    if index_type == "ivf_pq":
+        return 39 * max(nlist, 2 ** PQ_NBITS)
+    return 39 * nlist if index_type in TRAINED_INDEX_TYPES else 0
+
+
+def apply_search_params(index, nprobe: int = 16, ef_search: int = 64) -> None:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def reconstruct_vectors(index, start: int = 0, count: int = None) -> np.ndarray:
+    count = index.ntotal - start if count is None else count
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        # make_direct_map() writes to the index, and the one passed in may be published or
+        # memory-mapped read-only, so the lookup table is built on a private copy.
+        index = faiss.clone_index(index)
+        faiss.try_extract_index_ivf(index).make_direct_map()
+    if count <= 0:
+        return np.zeros((0, index.d), dtype="float32")
+    return index.reconstruct_n(start, count)
+
+
+def composite_index(base, delta):
+    """Search view over `base` followed by `delta`; row i of `delta` is row base.ntotal + i.
+
+    Neither index is copied, so an upload only has to copy the small delta while the
+    base (possibly memory-mapped) is shared by every snapshot until the next compaction.
+    """
+    if base is None or not base.ntotal:
+        return delta
+    if not delta.ntotal:
+        return base
+    view = faiss.IndexShards(base.d, False, True)
+    view.add_shard(base)
+    view.add_shard(delta)
+    return view
+
+
+def build_index_from_vectors(vectors: np.ndarray, index_type: str, nlist: int = 1024, hnsw_m: int = 32, pq_m: int = 16):
+    index = build_index(vectors.shape[1], index_type, nlist=nlist, hnsw_m=hnsw_m, pq_m=pq_m)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def read_index(path, mmap: bool = False):
+    """Read an index, memory-mapped and read-only when `mmap` is set and the index type supports it.
+
+    Mapped pages come from the OS page cache, so every worker process reading the
+    same file shares one copy of the vectors.
+    """
+    if not mmap:
+        return faiss.read_index(str(path)), False
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(str(path), flags), True
+    except RuntimeError as e:
+        print(f"Index at {path} cannot be memory-mapped ({e}); loading it into memory.")
+        return faiss.read_index(str(path)), False
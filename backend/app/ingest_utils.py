@@ -0,0 +1,146 @@
+import json
+import time
+
+from sqlalchemy import text
+
+from app.config import SessionLocal, blob_store, pdf_pool, EMBED_BATCH_SIZE, PDF_WORKERS, PDF_PAGES_PER_TASK
+from app.job_utils import IngestJob
+from app.pdf_utils import iter_pdf_pages
+from app.utils import (
+    chunk_ids,
+    embed_documents_cached,
+    iter_document_chunks,
+    upload_documents_to_vector_store
+)
+from app.chunk_utils import iter_text_file
+from app.video_utils import add_source_times, get_transcription_from_video
+
+
+def _index_chunks(job: IngestJob, pieces, source_id: str, segments=None) -> None:
+    if job.stage_done("index"):
+        return
+    with job.stage("index") as info:
+        documents = list(iter_document_chunks(pieces, source_id=source_id))
+        add_source_times(documents, segments)
+        upload_documents_to_vector_store(documents, chunk_ids(documents))
+        info["chunks"] = len(documents)
+
+
+def _page_pieces(pages):
+    # Pages are joined with a blank line, as in MdText, so chunk offsets index into the stored markdown.
+    for i, (page_number, page_text) in enumerate(pages):
+        yield page_number, page_text if i == 0 else "\n\n" + page_text
+
+
+def _convert_and_embed_pages(source, info) -> str:
+    """Convert pages in a process pool and embed their chunks while later pages are still converting.
+
+    Embeddings land in the chunk-embedding cache, so the index stage that follows only
+    reads them back. Returns the pages as JSON: [[page_number, markdown], ...].
+    """
+    pages, pending = [], []
+    t0 = time.perf_counter()
+    embed_seconds = 0.0
+
+    def converted_pages():
+        for page_number, page_text in iter_pdf_pages(source, workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK, pool=pdf_pool):
+            pages.append([page_number, page_text])
+            yield page_number, page_text
+
+    for chunk in iter_document_chunks(_page_pieces(converted_pages())):
+        pending.append(chunk.page_content)
+        if len(pending) >= EMBED_BATCH_SIZE:
+            t_embed = time.perf_counter()
+            embed_documents_cached(pending)
+            embed_seconds += time.perf_counter() - t_embed
+            pending = []
+    if pending:
+        t_embed = time.perf_counter()
+        embed_documents_cached(pending)
+        embed_seconds += time.perf_counter() - t_embed
+    info["pages"] = len(pages)
+    info["embed_seconds"] = embed_seconds
+    info["wall_seconds"] = time.perf_counter() - t0
+    return json.dumps(pages)
+
+
+def ingest_document(job: IngestJob) -> dict:
+    payload = job.payload
+    source = job.dir / payload["source"]
+
+    with job.stage("convert") as info:
+        pages = json.loads(job.cached_text("pages", lambda: _convert_and_embed_pages(source, info)))
+    md_text = "\n\n".join(page_text for _, page_text in pages)
+
+    if not job.stage_done("store"):
+        with job.stage("store"):
+            content_ref, file_size = blob_store.put_file(source)
+            with SessionLocal() as db:
+                db.execute(
+                    # A resumed job may already have stored this row before it was interrupted.
+                    text("""
+                        IF NOT EXISTS (SELECT 1 FROM dbo.Documents WHERE Id = CONVERT(uniqueidentifier, :Id))
+                        INSERT INTO dbo.Documents
+                            (Id, FileName, ContentType, FileSizeBytes, ContentRef, MdText)
+                        VALUES
+                            (CONVERT(uniqueidentifier, :Id),
+                             :FileName, :ContentType, :FileSizeBytes, :ContentRef, :MdText)
+                    """),
+                    {
+                        "Id": payload["document_id"],
+                        "FileName": payload["file_name"],
+                        "ContentType": payload["content_type"],
+                        "FileSizeBytes": file_size,
+                        "ContentRef": content_ref,
+                        "MdText": md_text,
+                    }
+                )
+                db.commit()
+
+    _index_chunks(job, _page_pieces(pages), payload["document_id"])
+    return {"document_id": payload["document_id"]}
+
+
+def ingest_video(job: IngestJob) -> dict:
+    payload = job.payload
+    source = job.dir / payload["source"]
+
+    def transcribe():
+        transcription, segments = get_transcription_from_video(str(source))
+        # Segments are spooled before the transcript, so a cached transcript always has matching ones.
+        job.cached_path("segments").unlink(missing_ok=True)
+        job.cached_text("segments", lambda: json.dumps(segments))
+        return transcription
+
+    with job.stage("transcribe"):
+        transcription = job.cached_text("transcript", transcribe)
+        segments = json.loads(job.cached_text("segments", lambda: "[]"))
+
+    if not job.stage_done("store"):
+        with job.stage("store"):
+            content_ref, file_size = blob_store.put_file(source)
+            with SessionLocal() as db:
+                db.execute(
+                    # A resumed job may already have stored this row before it was interrupted.
+                    text("""
+                        IF NOT EXISTS (SELECT 1 FROM dbo.Videos WHERE Id = CONVERT(uniqueidentifier, :Id))
+                        INSERT INTO dbo.Videos
+                            (Id, FileName, ContentType, FileSizeBytes, ContentRef, Transcript)
+                        VALUES
+                            (CONVERT(uniqueidentifier, :Id),
+                             :FileName, :ContentType, :FileSizeBytes, :ContentRef, :Transcript)
+                    """),
+                    {
+                        "Id": payload["video_id"],
+                        "FileName": payload["file_name"],
+                        "ContentType": payload["content_type"],
+                        "FileSizeBytes": file_size,
+                        "ContentRef": content_ref,
+                        "Transcript": transcription,
+                    }
+                )
+                db.commit()
+
+    _index_chunks(job, iter_text_file(job.cached_path("transcript")), payload["video_id"], segments)
+    return {"video_id": payload["video_id"]}
+
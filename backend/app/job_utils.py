@@ -0,0 +1,209 @@
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class IngestJob:
+    """Handle passed to a job handler: payload, per-stage progress and a spool folder that survives restarts."""
+
+    def __init__(self, queue: "IngestJobQueue", row: dict):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = row["payload"]
+        self.stages = row["stages"]
+        self.dir = queue.job_dir(self.id)
+
+    def stage_done(self, name: str) -> bool:
+        return self.stages.get(name, {}).get("status") == SUCCEEDED
+
+    @contextmanager
+    def stage(self, name: str):
+        info = {"status": RUNNING, "started_at": time.time()}
+        self.stages[name] = info
+        self.queue._save_stages(self.id, self.stages)
+        t0 = time.perf_counter()
+        try:
+            yield info
+        except Exception:
+            info["status"] = FAILED
+            raise
+        else:
+            info["status"] = SUCCEEDED
+        finally:
+            info["seconds"] = time.perf_counter() - t0
+            self.queue._save_stages(self.id, self.stages)
+
+    def cached_path(self, name: str) -> Path:
+        return self.dir / f"{name}.txt"
+
+    def cached_text(self, name: str, produce: Callable[[], str]) -> str:
+        # Expensive stage outputs are spooled so a resumed job does not redo them.
+        path = self.cached_path(name)
+        if path.exists():
+            return path.read_text(encoding="utf-8")
+        value = produce()
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(value, encoding="utf-8")
+        tmp_path.replace(path)
+        return value
+
+
+class IngestJobQueue:
+    """Bounded worker pool for ingestion jobs, persisted in SQLite so unfinished jobs resume after a restart."""
+
+    def __init__(self, root: str, max_workers: int = 2):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.handlers: Dict[str, Callable[[IngestJob], dict]] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.max_workers = max_workers
+        self.conn = sqlite3.connect(str(self.root / "jobs.sqlite"), check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id         TEXT PRIMARY KEY,
+                kind       TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                payload    TEXT NOT NULL,
+                stages     TEXT NOT NULL DEFAULT '{}',
+                result     TEXT,
+                error      TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def register(self, kind: str, handler: Callable[[IngestJob], dict]) -> None:
+        self.handlers[kind] = handler
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def new_job_id(self) -> str:
+        job_id = str(uuid4())
+        self.job_dir(job_id).mkdir(parents=True, exist_ok=True)
+        return job_id
+
+    def submit(self, kind: str, payload: dict, job_id: Optional[str] = None) -> str:
+        job_id = job_id or self.new_job_id()
+        with self.lock:
+            self._insert(job_id, kind, payload)
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def find_or_submit(self, kind: str, payload: dict, field: str, job_id: Optional[str] = None) -> Tuple[dict, bool]:
+        """Queue a job unless one of `kind` with the same payload[field] is queued or running.
+
+        The lookup and the insert happen under one lock, so concurrent callers with the same
+        value get a single job. Returns (payload of the job handling it, whether it was queued now).
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT payload FROM jobs WHERE kind = ? AND status IN (?, ?) "
+                "AND json_extract(payload, ?) = ? LIMIT 1",
+                (kind, QUEUED, RUNNING, f"$.{field}", payload[field]),
+            ).fetchone()
+            if row:
+                return json.loads(row[0]), False
+            job_id = job_id or self.new_job_id()
+            self._insert(job_id, kind, payload)
+        self.executor.submit(self._run, job_id)
+        return payload, True
+
+    def resume(self) -> int:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        for (job_id,) in rows:
+            self.executor.submit(self._run, job_id)
+        if rows:
+            print(f"Resumed {len(rows)} unfinished ingestion jobs.")
+        return len(rows)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, kind, status, payload, stages, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "payload": json.loads(row[3]),
+            "stages": json.loads(row[4]),
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def stats(self) -> dict:
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.max_workers,
+            "queue_depth": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "succeeded": counts.get(SUCCEEDED, 0),
+            "failed": counts.get(FAILED, 0),
+        }
+
+    def shutdown(self) -> None:
+        # Running jobs stay marked as running and are picked up again by resume().
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _insert(self, job_id: str, kind: str, payload: dict) -> None:
+        # The caller holds self.lock.
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), now, now),
+        )
+        self.conn.commit()
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self.conn.commit()
+
+    def _save_stages(self, job_id: str, stages: dict) -> None:
+        self._update(job_id, stages=json.dumps(stages))
+
+    def _run(self, job_id: str) -> None:
+        row = self.get(job_id)
+        if row is None or row["status"] not in (QUEUED, RUNNING):
+            return
+        self._update(job_id, status=RUNNING)
+        job = IngestJob(self, row)
+        try:
+            result = self.handlers[row["kind"]](job)
+            self._update(job_id, status=SUCCEEDED, result=json.dumps(result or {}), error=None)
+            shutil.rmtree(job.dir, ignore_errors=True)
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=str(e))
@@ -0,0 +1,137 @@
+import heapq
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+LEXICAL_FILE = "lexical.json"
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Append-only BM25 inverted index over the chunks of the vector store.
+
+    Rows are numbered like FAISS rows, so row `i` here is row `i` of the index.
+    Postings are kept as parallel (rows, term frequencies) lists in row order.
+    Writers only append, under the vector store write lock. A BM25View fixes the
+    row count at publish time, so readers never see a half-added upload.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, rows: Iterable[Tuple[int, str]]) -> None:
+        for row, text in rows:
+            if row < len(self.doc_lengths):
+                continue
+            # Rows without text (should not happen) still take their slot so numbering stays aligned.
+            self.doc_lengths.extend([0] * (row - len(self.doc_lengths)))
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = ([], [])
+                # The row goes in last: a reader that finds the row also finds its frequency.
+                entry[1].append(tf)
+                entry[0].append(row)
+            length = sum(terms.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+
+    def view(self, n_docs: int = None) -> "BM25View":
+        n_docs = len(self) if n_docs is None else min(n_docs, len(self))
+        return BM25View(self, n_docs, sum(self.doc_lengths[:n_docs]) if n_docs < len(self) else self.total_length)
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {term: (rows, tfs) for term, (rows, tfs) in data["postings"].items()}
+        return index
+
+
+class BM25View:
+    """The first `n_docs` rows of a BM25Index, as published with one vector store snapshot."""
+
+    def __init__(self, index: BM25Index, n_docs: int, total_length: int):
+        self.index = index
+        self.n_docs = n_docs
+        self.total_length = total_length
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top `k` (row, BM25 score) pairs for `query`, best first."""
+        n = self.n_docs
+        if not n:
+            return []
+        k1, b = self.index.k1, self.index.b
+        lengths = self.index.doc_lengths
+        avgdl = self.total_length / n or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            entry = self.index.postings.get(term)
+            if entry is None:
+                continue
+            rows, tfs = entry
+            df = bisect_left(rows, n)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i in range(df):
+                tf = tfs[i]
+                row = rows[i]
+                scores[row] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[row] / avgdl))
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def save(self, path: Path) -> None:
+        n = self.n_docs
+        postings = {}
+        for term, (rows, tfs) in list(self.index.postings.items()):
+            df = bisect_left(rows, n)
+            if df:
+                postings[term] = [rows[:df], tfs[:df]]
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.index.k1,
+                "b": self.index.b,
+                "doc_lengths": self.index.doc_lengths[:n],
+                "postings": postings,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked key lists with RRF, sum(1 / (k + rank)).
+
+    Scores are scaled so a key ranked first in every list scores 1.0.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    best = len(rankings) / (k + 1) if rankings else 1.0
+    return sorted(((key, score / best) for key, score in scores.items()), key=itemgetter(1), reverse=True)
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def export_onnx_model(model_name, output_dir, quantize=True, sequence_classification=False):
+    """Export a sentence-transformers checkpoint to ONNX (and a dynamic int8 copy) once.
+
+    Returns the path of the model file to load. The tokenizer is saved next to it,
+    so later starts only need onnxruntime and the tokenizer files. With
+    `sequence_classification` the classification head is kept and the graph
+    outputs `logits` for (query, passage) pairs, as cross-encoders need.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = output_dir / "model.onnx"
+    int8_path = output_dir / "model.int8.onnx"
+
+    if not fp32_path.exists():
+        import torch
+        from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+        t0 = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if sequence_classification:
+            model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+            sample = tokenizer(["hello"], ["world"], return_tensors="pt")
+            # BERT-style cross-encoders also need token_type_ids to tell the query from the passage.
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            output_axes = {"logits": {0: "batch"}}
+        else:
+            model = AutoModel.from_pretrained(model_name).eval()
+            sample = tokenizer(["hello world"], return_tensors="pt")
+            input_names = ["input_ids", "attention_mask"]
+            output_axes = {"last_hidden_state": {0: "batch", 1: "sequence"}}
+        tmp_path = fp32_path.with_suffix(".onnx.tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=list(output_axes),
+                dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, **output_axes},
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(output_dir)
+        os.replace(tmp_path, fp32_path)
+        print(f"Exported {model_name} to {fp32_path} in {time.perf_counter() - t0:.1f}s")
+
+    if not quantize:
+        return fp32_path
+    if not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = int8_path.with_suffix(".onnx.tmp")
+        # Dynamic quantization: int8 weights, activations quantized per batch at run time.
+        quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+        print(f"Quantized {fp32_path.name} to {int8_path}")
+    return int8_path
+
+
+def cpu_session(model_path, threads=0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    # One forward pass at a time (see MicroBatchedEmbeddings), so no inter-op parallelism.
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled, L2-normalized sentence embeddings from an exported ONNX model on CPU.
+
+    Matches sentence-transformers/all-mpnet-base-v2 (mean pooling + Normalize, 384
+    tokens max). `threads` sets onnxruntime's intra-op pool; 0 lets it use all
+    physical cores.
+    """
+
+    def __init__(self, model_path, threads=0, batch_size=32, max_length=384):
+        from transformers import AutoTokenizer
+
+        self.session = cpu_session(model_path, threads)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(Path(model_path).parent)
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._lock = threading.Lock()
+
+    def _embed_batch(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        with self._lock:
+            hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts):
+        # Sorting by length keeps padding, and so wasted compute, low within each batch.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0]
+
+
+class MicroBatcher:
+    """Merges single-text requests from concurrent callers into one embed_batch call.
+
+    The worker thread takes whatever is queued, waits up to `max_wait_ms` for more
+    (never past `max_batch_size`), then runs one forward pass for the whole batch.
+    """
+
+    def __init__(self, embed_batch, max_batch_size=32, max_wait_ms=2.0):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embed-microbatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, text) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                vectors = self.embed_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class MicroBatchedEmbeddings(Embeddings):
+    """Wraps a local embedding model so concurrent query embeddings share forward passes."""
+
+    def __init__(self, inner: Embeddings, max_batch_size=32, max_wait_ms=2.0):
+        self.inner = inner
+        self.batcher = MicroBatcher(inner.embed_documents, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.batcher.submit(text).result()
+
+    async def aembed_query(self, text):
+        return await asyncio.wrap_future(self.batcher.submit(text))
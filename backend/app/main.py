@@ -1,13 +1,31 @@
 from fastapi import FastAPI
 from app.routes import router as api_router
-from app.utils import load_vector_store
+import asyncio
+import time
+from app.config import components, ingest_queue, pdf_pool, STARTUP_WARMUP
+from app.ingest_utils import ingest_document, ingest_video
+from app.utils import load_vector_store, watch_vector_store_snapshots
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    components.warmup(STARTUP_WARMUP)
+    t0 = time.perf_counter()
     load_vector_store()
+    components.record("load_vector_store", time.perf_counter() - t0)
+    watcher = asyncio.create_task(watch_vector_store_snapshots())
+    ingest_queue.register("document", ingest_document)
+    ingest_queue.register("video", ingest_video)
+    t0 = time.perf_counter()
+    ingest_queue.resume()
+    components.record("resume_ingest_jobs", time.perf_counter() - t0)
+    components.report()
     yield
+    watcher.cancel()
+    ingest_queue.shutdown()
+    if components.is_loaded("pdf_pool"):
+        pdf_pool.shutdown(cancel_futures=True)
 
 app = FastAPI(lifespan=lifespan)
 
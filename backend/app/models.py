@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, DateTime, Integer, LargeBinary, NVARCHAR
+from sqlalchemy import BigInteger, Column, DateTime, LargeBinary, NVARCHAR
 from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
 from sqlalchemy.sql import func
 from app.config import Base
@@ -9,8 +9,9 @@ class Document(Base):
     Id            = Column(UNIQUEIDENTIFIER, primary_key=True)
     FileName      = Column(NVARCHAR(255),   nullable=False)
     ContentType   = Column(NVARCHAR(100),   nullable=False)
-    FileSizeBytes = Column(Integer,         nullable=False)
-    Content       = Column(LargeBinary,     nullable=False)
+    FileSizeBytes = Column(BigInteger,      nullable=False)
+    Content       = Column(LargeBinary,     nullable=True)
+    ContentRef    = Column(NVARCHAR(64),    nullable=True)
     MdText        = Column(NVARCHAR(None))  
     UploadedAt    = Column(DateTime(timezone=False), server_default=func.sysutcdatetime())
 
@@ -19,7 +20,8 @@ class Video(Base):
     Id            = Column(UNIQUEIDENTIFIER, primary_key=True)
     FileName      = Column(NVARCHAR(255),   nullable=False)
     ContentType   = Column(NVARCHAR(100),   nullable=False)
-    FileSizeBytes = Column(Integer,         nullable=False)
-    Content       = Column(LargeBinary,     nullable=False)
+    FileSizeBytes = Column(BigInteger,      nullable=False)
+    Content       = Column(LargeBinary,     nullable=True)
+    ContentRef    = Column(NVARCHAR(64),    nullable=True)
     Transcript    = Column(NVARCHAR(None))  
     UploadedAt    = Column(DateTime(timezone=False), server_default=func.sysutcdatetime())
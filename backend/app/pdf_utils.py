@@ -1,5 +1,59 @@
-import pymupdf4llm
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
 
-def convert_pdf_to_markdown(pdf_path):
-    md_text = pymupdf4llm.to_markdown(pdf_path)
-    return md_text
\ No newline at end of file
+
+def pdf_page_count(pdf_path) -> int:
+    import pymupdf
+    with pymupdf.open(os.fspath(pdf_path)) as doc:
+        return doc.page_count
+
+
+def convert_page_range(pdf_path, pages: List[int]) -> List[Tuple[int, str]]:
+    # Runs in a worker process; returns (1-based page number, markdown) for each page.
+    import pymupdf4llm
+    chunks = pymupdf4llm.to_markdown(os.fspath(pdf_path), pages=pages, page_chunks=True)
+    return [(page + 1, chunk["text"]) for page, chunk in zip(pages, chunks)]
+
+
+def pdf_process_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned, not forked: the server process already runs threads (FAISS search pool,
+    # OpenMP, SQLite, the embed micro-batcher), and a forked child can inherit one of
+    # their locks in the held state and hang forever.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def iter_pdf_pages(pdf_path, workers=4, pages_per_task=8, pool=None) -> Iterator[Tuple[int, str]]:
+    """Convert a PDF to markdown page by page, `pages_per_task` pages per worker process.
+
+    All ranges are submitted up front and pages are yielded in order as soon as their
+    range is done, so callers can chunk and embed early pages while later ones are
+    still converting. Pass a long-lived `pool` (pdf_process_pool) to reuse its workers;
+    otherwise one is started for this PDF.
+    """
+    count = pdf_page_count(pdf_path)
+    ranges = [list(range(start, min(start + pages_per_task, count))) for start in range(0, count, pages_per_task)]
+    if workers <= 1 or len(ranges) <= 1:
+        for pages in ranges:
+            yield from convert_page_range(pdf_path, pages)
+        return
+    if pool is None:
+        with pdf_process_pool(min(workers, len(ranges))) as own_pool:
+            yield from _convert_in_pool(own_pool, pdf_path, ranges)
+    else:
+        yield from _convert_in_pool(pool, pdf_path, ranges)
+
+
+def _convert_in_pool(pool, pdf_path, ranges) -> Iterator[Tuple[int, str]]:
+    futures = [pool.submit(convert_page_range, os.fspath(pdf_path), pages) for pages in ranges]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def convert_pdf_to_markdown(pdf_path, workers=4, pages_per_task=8):
+    return "\n\n".join(text for _, text in iter_pdf_pages(pdf_path, workers, pages_per_task))
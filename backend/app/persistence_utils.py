@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.lexical_utils import LEXICAL_FILE
+
+try:
+    import fcntl
+except ImportError:  # Windows runs a single worker process, where the thread lock is enough.
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_LOCK_FILE = "manifest.lock"
+WRITER_LOCK_FILE = "writer.lock"
+SEGMENTS_DIR = "segments"
+
+_thread_lock = threading.RLock()
+_lock_depth = 0
+_lock_file = None
+
+
+def _open_lock_file(vector_dir: Path, name: str):
+    vector_dir.mkdir(parents=True, exist_ok=True)
+    return open(vector_dir / name, "a+b")
+
+
+@contextmanager
+def manifest_lock(vector_dir: Path):
+    """Serialize manifest updates across threads and worker processes.
+
+    Reentrant within a thread, so a caller can hold it around append_segment().
+    """
+    global _lock_depth, _lock_file
+    with _thread_lock:
+        if _lock_depth == 0:
+            _lock_file = _open_lock_file(vector_dir, MANIFEST_LOCK_FILE)
+            if fcntl is not None:
+                fcntl.flock(_lock_file, fcntl.LOCK_EX)
+        _lock_depth += 1
+        try:
+            yield
+        finally:
+            _lock_depth -= 1
+            if _lock_depth == 0:
+                # Closing the file releases the flock.
+                _lock_file.close()
+                _lock_file = None
+
+
+@contextmanager
+def writer_lock(vector_dir: Path):
+    """Yield True in the one process allowed to compact or rebuild right now, False elsewhere.
+
+    Never waits: a worker that finds the lock taken skips the work instead.
+    """
+    lock_file = _open_lock_file(vector_dir, WRITER_LOCK_FILE)
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+    finally:
+        lock_file.close()
+
+
+def read_manifest(vector_dir: Path) -> dict:
+    path = vector_dir / MANIFEST_FILE
+    if not path.exists():
+        return {"version": 0, "next_segment": 1, "base": None, "segments": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(vector_dir: Path, manifest: dict) -> None:
+    vector_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = vector_dir / f"{MANIFEST_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, vector_dir / MANIFEST_FILE)
+
+
+def append_segment(vector_dir: Path, vectors, ids) -> dict:
+    """Persist the vectors of one upload as a delta segment and record it in the manifest.
+
+    Chunk text lives in the SQLite docstore, so a segment only carries vectors and ids.
+    """
+    with manifest_lock(vector_dir):
+        manifest = read_manifest(vector_dir)
+        name = f"segment_{manifest['next_segment']:06d}"
+        segments_dir = vector_dir / SEGMENTS_DIR
+        segments_dir.mkdir(parents=True, exist_ok=True)
+
+        np.save(segments_dir / f"{name}.npy", np.asarray(vectors, dtype="float32"))
+        with open(segments_dir / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+
+        manifest["next_segment"] += 1
+        manifest["version"] += 1
+        manifest["segments"].append(name)
+        write_manifest(vector_dir, manifest)
+    return manifest
+
+
+def iter_segments(vector_dir: Path, segment_names):
+    segments_dir = vector_dir / SEGMENTS_DIR
+    for name in segment_names:
+        vectors = np.load(segments_dir / f"{name}.npy")
+        with open(segments_dir / f"{name}.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        yield vectors, ids
+
+
+def base_snapshot_dir(vector_dir: Path, manifest: dict):
+    if manifest.get("base"):
+        return vector_dir / manifest["base"]
+    if (vector_dir / "index.faiss").exists():
+        return vector_dir
+    return None
+
+
+def write_base_snapshot(index, vector_dir: Path, compacted_segments, lexical=None) -> dict:
+    """Write `index` (and its BM25 view, if given) as a new base and drop the segments it already contains.
+
+    The base lives in its own folder and is published by the atomic manifest write,
+    so a crash part-way through leaves the previous base and segments intact.
+    """
+    name = f"base_{read_manifest(vector_dir)['version'] + 1:06d}"
+    (vector_dir / name).mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(vector_dir / name / "index.faiss"))
+    if lexical is not None:
+        lexical.save(vector_dir / name / LEXICAL_FILE)
+
+    with manifest_lock(vector_dir):
+        manifest = read_manifest(vector_dir)
+        previous_base = manifest.get("base")
+        manifest["base"] = name
+        manifest["segments"] = [s for s in manifest["segments"] if s not in compacted_segments]
+        manifest["version"] += 1
+        write_manifest(vector_dir, manifest)
+
+    if previous_base:
+        shutil.rmtree(vector_dir / previous_base, ignore_errors=True)
+    segments_dir = vector_dir / SEGMENTS_DIR
+    for segment in compacted_segments:
+        for suffix in (".npy", ".json"):
+            (segments_dir / f"{segment}{suffix}").unlink(missing_ok=True)
+    return manifest
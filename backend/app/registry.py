@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class LazyComponent:
+    """Stand-in that builds the registered component on first attribute access."""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._registry.get(self._name)(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if self._registry.is_loaded(self._name) else "not loaded"
+        return f"<lazy {self._name} ({state})>"
+
+
+class ComponentRegistry:
+    """Named factories that run once, on first use or during warmup, and record how long they took.
+
+    Factories may depend on other components; initialization is serialized, so a
+    component is never built twice.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], object]] = {}
+        self._warmers: Dict[str, Callable[[object], None]] = {}
+        self._instances: Dict[str, object] = {}
+        self._timings: Dict[str, float] = {}
+        self._building: List[float] = []
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], object], warm: Optional[Callable[[object], None]] = None) -> LazyComponent:
+        self._factories[name] = factory
+        if warm is not None:
+            self._warmers[name] = warm
+        return LazyComponent(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                t0 = time.perf_counter()
+                self._building.append(0.0)
+                try:
+                    self._instances[name] = self._factories[name]()
+                finally:
+                    nested = self._building.pop()
+                elapsed = time.perf_counter() - t0
+                # Report self time: dependencies built inside the factory get their own line.
+                self._timings[name] = elapsed - nested
+                if self._building:
+                    self._building[-1] += elapsed
+            return self._instances[name]
+
+    def override(self, name: str, instance: object) -> None:
+        """Use `instance` for `name` instead of building it (tests and benchmarks swap in stubs this way)."""
+        with self._lock:
+            self._instances[name] = instance
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        for name in names if names is not None else list(self._factories):
+            if name not in self._factories:
+                print(f"Skipping warmup of unknown component: {name}")
+                continue
+            component = self.get(name)
+            warm = self._warmers.get(name)
+            if warm is not None:
+                t0 = time.perf_counter()
+                warm(component)
+                self.record(f"{name} (warm)", time.perf_counter() - t0)
+        return self.timings()
+
+    def record(self, name: str, seconds: float) -> None:
+        # Startup steps that are not components (e.g. loading the vector store) go in the same report.
+        self._timings[name] = seconds
+
+    def timings(self) -> Dict[str, float]:
+        return dict(self._timings)
+
+    def report(self, title="Startup") -> None:
+        timings = self.timings()
+        print(f"\n=== {title} ===")
+        for name, seconds in timings.items():
+            print(f"{name:<28}{seconds:8.3f}s")
+        print(f"{'total':<28}{sum(timings.values()):8.3f}s")
@@ -0,0 +1,65 @@
+import math
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.local_embedding_utils import cpu_session
+
+
+class OnnxCrossEncoder:
+    """Scores (query, passage) pairs with an exported cross-encoder on CPU.
+
+    Built for cross-encoder/ms-marco-MiniLM-L-6-v2 style models exported with
+    export_onnx_model(..., sequence_classification=True). Returns raw logits,
+    higher is more relevant.
+    """
+
+    def __init__(self, model_path, threads=0, batch_size=16, max_length=512):
+        from transformers import AutoTokenizer
+
+        self.session = cpu_session(model_path, threads)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(Path(model_path).parent)
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._lock = threading.Lock()
+
+    def _score_batch(self, query, passages):
+        encoded = self.tokenizer(
+            [query] * len(passages), passages,
+            padding=True, truncation="only_second", max_length=self.max_length, return_tensors="np",
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        with self._lock:
+            logits = self.session.run(None, feeds)[0]
+        return logits[:, 0].tolist()
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        # Same length-sorted batching as OnnxEmbeddings: short passages are not padded to the longest one.
+        order = sorted(range(len(passages)), key=lambda i: len(passages[i]))
+        scores = [0.0] * len(passages)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, score in zip(batch, self._score_batch(query, [passages[i] for i in batch])):
+                scores[i] = score
+        return scores
+
+
+def rerank(
+    query: str,
+    results: List[Tuple[Document, float]],
+    scorer,
+    top_n: int = 3,
+) -> List[Tuple[Document, float]]:
+    """Re-score retrieved (Document, score) hits with a cross-encoder and keep the best `top_n`.
+
+    Returned scores are sigmoid(logit), so they are relevance scores in [0, 1].
+    """
+    if not results:
+        return []
+    scores = scorer.score(query, [doc.page_content for doc, _ in results])
+    ranked = sorted(zip(results, scores), key=lambda r: r[1], reverse=True)[:top_n]
+    return [(doc, 1.0 / (1.0 + math.exp(-score))) for (doc, _), score in ranked]
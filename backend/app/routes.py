@@ -6,147 +6,177 @@ from fastapi import (
     UploadFile,
     File
 )
-import tempfile
 import shutil
+import hashlib
 from uuid import uuid4
 from pathlib import Path
 from sqlalchemy import text
-from app.config import SessionLocal
+from app.config import SessionLocal, query_embedding_cache, answer_cache, ingest_queue, blob_store, RETRIEVAL_MODE
 from app.schemas import DocumentMeta, DocumentListResponse,QueryRequest
 from fastapi import Query
 from uuid import UUID
-from io import BytesIO
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi import Request, Response
-from pathlib import Path
-import tempfile, os
 import time
-from app.pdf_utils import convert_pdf_to_markdown
 from app.utils import (
-    create_chunks_from_text,
-    create_documents_from_chunks,
-    upload_documents_to_vector_store,
-    get_similarity_context,
-    get_llm_response
+    aget_query_embedding,
+    aget_context_results,
+    answer_cache_namespace,
+    build_context,
+    build_sources,
+    aget_llm_response,
+    astream_llm_response
 )
-from app.video_utils import get_transcription_from_video
-from app.file_utils import _parse_range_header
+from app.file_utils import serve_blob
+from app.sse_utils import format_sse_event
 
 router = APIRouter()
 
-@router.post("/upload-documents")
-async def upload_documents(file: UploadFile = File(...)):
-    if file.content_type not in ("application/pdf", "application/x-pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
-    
-    temp_path = None
+async def _spool_upload(file: UploadFile, destination: Path) -> str:
+    digest = hashlib.sha256()
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_path = Path(tmp.name)
-            shutil.copyfileobj(file.file, tmp)
+        with open(destination, "wb") as out:
+            while True:
+                chunk = await file.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+            # fsync blocks until the disk acknowledges the write; keep it off the event loop.
+            await run_in_threadpool(_flush_to_disk, out)
     finally:
         await file.close()
+    return digest.hexdigest()
+
+
+def _flush_to_disk(out) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+
 
+def _find_existing_upload(table: str, content_hash: str):
+    # The blob store names files by SHA-256, so ContentRef doubles as the content hash.
+    with SessionLocal() as db:
+        existing = db.execute(
+            text(f"SELECT TOP 1 Id FROM dbo.{table} WHERE ContentRef = :ref"),
+            {"ref": content_hash}
+        ).scalar()
+    return str(existing) if existing else None
+
+
+def _queue_unless_uploaded(table: str, kind: str, id_field: str, payload: dict, job_id: str):
+    """ID of a stored or in-flight upload with the same content, or None once this one is queued."""
+    existing_id = _find_existing_upload(table, payload["content_hash"])
+    if existing_id:
+        return existing_id
+    # A job stores its row before it is marked succeeded, so the content is always in one
+    # of the two places; find_or_submit makes the in-flight check and the insert atomic.
+    job, queued = ingest_queue.find_or_submit(kind, payload, "content_hash", job_id=job_id)
+    return None if queued else job[id_field]
+
+
+@router.post("/upload-documents", status_code=202)
+async def upload_documents(response: Response, file: UploadFile = File(...)):
+    if file.content_type not in ("application/pdf", "application/x-pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
+
+    job_id = ingest_queue.new_job_id()
     try:
-        md_text = convert_pdf_to_markdown(temp_path)
-        pdf_bytes = temp_path.read_bytes()
-        file_size = temp_path.stat().st_size
-        doc_id = str(uuid4()) 
-        with SessionLocal() as db:
-            db.execute(
-                text("""
-                    INSERT INTO dbo.Documents
-                        (Id, FileName, ContentType, FileSizeBytes, Content, MdText)
-                    VALUES
-                        (CONVERT(uniqueidentifier, :Id),
-                         :FileName, :ContentType, :FileSizeBytes, :Content, :MdText)
-                """),
-                {
-                    "Id": doc_id,
-                    "FileName": file.filename or "document.pdf",
-                    "ContentType": file.content_type,
-                    "FileSizeBytes": file_size,
-                    "Content": pdf_bytes,
-                    "MdText": md_text,
-                }
-            )
-            db.commit()
-        chunks = create_chunks_from_text(md_text)
-        documents, uuids = create_documents_from_chunks(chunks)
-        upload_documents_to_vector_store(documents, uuids)
-
-        return {
-            "message": "Document uploaded to vector store.",
-            "document_id": doc_id
-        }
+        content_hash = await _spool_upload(file, ingest_queue.job_dir(job_id) / "source.pdf")
+        doc_id = str(uuid4())
+        existing_id = await run_in_threadpool(
+            _queue_unless_uploaded,
+            "Documents",
+            "document",
+            "document_id",
+            {
+                "document_id": doc_id,
+                "file_name": file.filename or "document.pdf",
+                "content_type": file.content_type,
+                "source": "source.pdf",
+                "content_hash": content_hash,
+            },
+            job_id,
+        )
+        if existing_id:
+            # Nothing was queued, so this is not the route's 202 Accepted.
+            shutil.rmtree(ingest_queue.job_dir(job_id), ignore_errors=True)
+            response.status_code = 200
+            return {
+                "message": "Document was already uploaded.",
+                "document_id": existing_id,
+                "duplicate": True
+            }
     except Exception as e:
-        print(f"Error uploading document: {e}")
+        print(f"Error queueing document upload: {e}")
+        shutil.rmtree(ingest_queue.job_dir(job_id), ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
 
-    finally:
-        if temp_path:
-            temp_path.unlink(missing_ok=True)
+    return {
+        "message": "Document queued for ingestion.",
+        "document_id": doc_id,
+        "job_id": job_id
+    }
 
 
-@router.post("/upload-videos")
-async def upload_videos(file: UploadFile = File(...)):
+@router.post("/upload-videos", status_code=202)
+async def upload_videos(response: Response, file: UploadFile = File(...)):
     allowed = {"video/mp4", "video/x-m4v", "video/mpeg", "video/quicktime"}
     if file.content_type not in allowed:
         raise HTTPException(400, detail=f"Unsupported content type: {file.content_type}")
 
     suffix = Path(file.filename or "").suffix.lower() or ".mp4"
-    fd, tmp_name = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)
-    temp_path = Path(tmp_name)
-
+    source = f"source{suffix}"
+    job_id = ingest_queue.new_job_id()
     try:
-        with open(temp_path, "wb") as out:
-            while True:
-                chunk = await file.read(1024 * 1024) 
-                if not chunk:
-                    break
-                out.write(chunk)
-            out.flush()
-            os.fsync(out.fileno())
-
-        video_bytes = temp_path.read_bytes()
-        file_size = temp_path.stat().st_size
-        video_id = str(uuid4()) 
-        transcription = get_transcription_from_video(str(temp_path))
-        with SessionLocal() as db:
-            db.execute(
-                text("""
-                    INSERT INTO dbo.Videos
-                        (Id, FileName, ContentType, FileSizeBytes, Content, Transcript)
-                    VALUES
-                        (CONVERT(uniqueidentifier, :Id),
-                         :FileName, :ContentType, :FileSizeBytes, :Content, :Transcript)
-                """),
-                {
-                    "Id": video_id,
-                    "FileName": file.filename or "video.mp4",
-                    "ContentType": file.content_type,
-                    "FileSizeBytes": file_size,
-                    "Content": video_bytes,
-                    "Transcript": transcription,
-                }
-            )
-            db.commit()
-
-        chunks = create_chunks_from_text(transcription)
-        documents, uuids = create_documents_from_chunks(chunks)
-        upload_documents_to_vector_store(documents, uuids)
-
-        return {
-            "message": "Video uploaded to vector store.",
-            "video_id": video_id
-        }
-
+        content_hash = await _spool_upload(file, ingest_queue.job_dir(job_id) / source)
+        video_id = str(uuid4())
+        existing_id = await run_in_threadpool(
+            _queue_unless_uploaded,
+            "Videos",
+            "video",
+            "video_id",
+            {
+                "video_id": video_id,
+                "file_name": file.filename or "video.mp4",
+                "content_type": file.content_type,
+                "source": source,
+                "content_hash": content_hash,
+            },
+            job_id,
+        )
+        if existing_id:
+            # Nothing was queued, so this is not the route's 202 Accepted.
+            shutil.rmtree(ingest_queue.job_dir(job_id), ignore_errors=True)
+            response.status_code = 200
+            return {
+                "message": "Video was already uploaded.",
+                "video_id": existing_id,
+                "duplicate": True
+            }
     except Exception as e:
+        shutil.rmtree(ingest_queue.job_dir(job_id), ignore_errors=True)
         raise HTTPException(500, detail=f"Upload failed: {e}")
-    finally:
-        if temp_path:
-            temp_path.unlink(missing_ok=True)
+
+    return {
+        "message": "Video queued for ingestion.",
+        "video_id": video_id,
+        "job_id": job_id
+    }
+
+
+@router.get("/jobs")
+def list_jobs():
+    return ingest_queue.stats()
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: UUID):
+    job = ingest_queue.get(str(job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 # API to query documents and get responses from llm.
@@ -155,12 +185,71 @@ async def query_documents(payload: QueryRequest):
     if not payload.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
     try:
-        context = get_similarity_context(payload.query)
-        response = get_llm_response(payload.query, context)
-        return {"response": response}
+        # The answer cache is keyed by the query embedding, so lexical-only queries skip it.
+        # Retrieval reuses the embedding instead of computing it a second time.
+        query_embedding = None
+        namespace = answer_cache_namespace(payload.mode)
+        if (payload.mode or RETRIEVAL_MODE) != "lexical":
+            query_embedding = await aget_query_embedding(payload.query)
+            cached, cache_version = answer_cache.lookup(query_embedding, namespace)
+            if cached is not None:
+                return {"response": cached["response"], "cached": True}
+        timings = {}
+        results = await aget_context_results(payload.query, mode=payload.mode, timings=timings, query_embedding=query_embedding)
+        t0 = time.perf_counter()
+        response = await aget_llm_response(payload.query, build_context(results))
+        timings["generate_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        if query_embedding is not None:
+            # The sources are cached with the answer for /query/stream hits.
+            answer_cache.store(query_embedding, {"response": response, "sources": build_sources(results)}, cache_version, namespace)
+        return {"response": response, "cached": False, "timings": timings}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+# Same as /query, but sends the retrieved sources first and then the llm tokens as SSE events.
+@router.post("/query/stream")
+async def query_documents_stream(payload: QueryRequest):
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    async def event_stream():
+        try:
+            query_embedding = None
+            namespace = answer_cache_namespace(payload.mode)
+            if (payload.mode or RETRIEVAL_MODE) != "lexical":
+                query_embedding = await aget_query_embedding(payload.query)
+                cached, cache_version = answer_cache.lookup(query_embedding, namespace)
+                if cached is not None:
+                    yield format_sse_event("sources", cached["sources"])
+                    yield format_sse_event("token", cached["response"])
+                    yield format_sse_event("done", {"cached": True})
+                    return
+            timings = {}
+            results = await aget_context_results(payload.query, mode=payload.mode, timings=timings, query_embedding=query_embedding)
+            sources = build_sources(results)
+            yield format_sse_event("sources", sources)
+            context = build_context(results)
+            tokens = []
+            t0 = time.perf_counter()
+            async for token in astream_llm_response(payload.query, context):
+                if not tokens:
+                    timings["first_token_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                tokens.append(token)
+                yield format_sse_event("token", token)
+            timings["generate_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            if query_embedding is not None:
+                answer_cache.store(query_embedding, {"response": "".join(tokens), "sources": sources}, cache_version, namespace)
+            yield format_sse_event("done", {"cached": False, "timings": timings})
+        except Exception as e:
+            print(f"Error streaming query response: {e}")
+            yield format_sse_event("error", {"detail": str(e)})
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
 @router.get("/documents", response_model=DocumentListResponse)
 def list_documents(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=200)):
     offset = (page - 1) * page_size
@@ -198,73 +287,81 @@ def list_documents(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1,
     return DocumentListResponse(items=items, total=total, page=page, page_size=page_size)
 
 
-@router.get("/documents/{doc_id}/download")
-def download_document(doc_id: UUID):
+def _get_stored_file(table: str, file_id: UUID):
     with SessionLocal() as db:
-        row = db.execute(
-            text("""
-                SELECT FileName, ContentType, Content
-                FROM dbo.Documents
+        return db.execute(
+            text(f"""
+                SELECT FileName, ContentType, ContentRef, DATALENGTH(Content) AS LegacySize
+                FROM dbo.{table}
                 WHERE Id = CONVERT(uniqueidentifier, :id)
             """),
-            {"id": str(doc_id)}
+            {"id": str(file_id)}
         ).first()
 
+
+def _legacy_content_reader(table: str, file_id: UUID):
+    # Rows from before the blob store keep the file in VARBINARY(MAX); read it in slices with SUBSTRING.
+    def read_range(start: int, end: int):
+        with SessionLocal() as db:
+            pos = start
+            while pos <= end:
+                length = min(blob_store.chunk_size, end - pos + 1)
+                chunk = db.execute(
+                    text(f"""
+                        SELECT SUBSTRING(Content, :start, :length)
+                        FROM dbo.{table}
+                        WHERE Id = CONVERT(uniqueidentifier, :id)
+                    """),
+                    {"start": pos + 1, "length": length, "id": str(file_id)}
+                ).scalar_one()
+                if not chunk:
+                    break
+                pos += len(chunk)
+                yield chunk
+    return read_range
+
+
+def _serve_stored_file(request: Request, table: str, file_id: UUID, default_type: str, default_name: str, disposition: str):
+    row = _get_stored_file(table, file_id)
     if not row:
-        raise HTTPException(status_code=404, detail="Document not found")
+        raise HTTPException(status_code=404, detail=f"{table[:-1]} not found")
 
-    file_like = BytesIO(row.Content)
+    if row.ContentRef:
+        size = blob_store.size(row.ContentRef)
+        etag = f'"{row.ContentRef}"'
+        read_range = lambda start, end: blob_store.iter_range(row.ContentRef, start, end)
+    else:
+        size = row.LegacySize or 0
+        etag = f'"{file_id}-{size}"'
+        read_range = _legacy_content_reader(table, file_id)
 
-    headers = {
-        "Content-Disposition": f'attachment; filename="{row.FileName}"'
-    }
-    return StreamingResponse(
-        file_like,
-        media_type=row.ContentType or "application/pdf",
-        headers=headers
+    return serve_blob(
+        request,
+        size=size,
+        etag=etag,
+        read_range=read_range,
+        content_type=row.ContentType or default_type,
+        file_name=row.FileName or default_name,
+        disposition=disposition,
     )
 
-@router.get("/documents/{doc_id}/view")
-def view_document(doc_id: UUID, request: Request):
-    with SessionLocal() as db:
-        row = db.execute(
-            text("""
-                SELECT FileName, ContentType, Content
-                FROM dbo.Documents
-                WHERE Id = CONVERT(uniqueidentifier, :id)
-            """),
-            {"id": str(doc_id)}
-        ).first()
 
-    if not row:
-        raise HTTPException(status_code=404, detail="Document not found")
-
-    content_type = row.ContentType or "application/pdf"
-    file_name = row.FileName or "document.pdf"
-    blob: bytes = row.Content
-    total = len(blob)
-
-    range_header = request.headers.get("range")
-    if range_header:
-        rng = _parse_range_header(range_header, total)
-        if rng:
-            start, end = rng
-            chunk = blob[start:end + 1]
-            headers = {
-                "Content-Range": f"bytes {start}-{end}/{total}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(len(chunk)),
-                "Content-Disposition": f'inline; filename="{file_name}"',
-            }
-            return Response(content=chunk, status_code=206, media_type=content_type, headers=headers)
+@router.get("/documents/{doc_id}/download")
+def download_document(doc_id: UUID, request: Request):
+    return _serve_stored_file(request, "Documents", doc_id, "application/pdf", "document.pdf", "attachment")
 
-    headers = {
-        "Accept-Ranges": "bytes",
-        "Content-Length": str(total),
-        "Content-Disposition": f'inline; filename="{file_name}"',
-    }
-    return Response(content=blob, media_type=content_type, headers=headers)
+@router.get("/documents/{doc_id}/view")
+def view_document(doc_id: UUID, request: Request):
+    return _serve_stored_file(request, "Documents", doc_id, "application/pdf", "document.pdf", "inline")
 
+@router.get("/videos/{video_id}/stream")
+def stream_video(video_id: UUID, request: Request):
+    return _serve_stored_file(request, "Videos", video_id, "video/mp4", "video.mp4", "inline")
 
 
-    
+@router.get("/cache-stats")
+def cache_stats():
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+    }
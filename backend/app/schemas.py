@@ -1,10 +1,12 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 from uuid import UUID
 
 class QueryRequest(BaseModel):
     query: str
+    # Overrides RETRIEVAL_MODE; "lexical" answers without calling the embedding model.
+    mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
     
 class DocumentMeta(BaseModel):
     id: UUID
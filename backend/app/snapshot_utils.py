@@ -0,0 +1,66 @@
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from app.lexical_utils import BM25View
+
+
+@dataclass(frozen=True)
+class VectorStoreSnapshot:
+    """One published state of the store. `db` searches `base` followed by `delta`.
+
+    `base` is the last compacted index (read from `index_path`, memory-mapped if `mapped`);
+    `delta` is a flat index of the vectors uploaded since, one row per segment row.
+    """
+    version: int
+    db: Optional[FAISS]
+    manifest_version: Optional[int] = None
+    mapped: bool = False
+    index_path: Optional[Path] = None
+    lexical: Optional[BM25View] = None
+    base: Optional[faiss.Index] = None
+    delta: Optional[faiss.Index] = None
+
+
+class VectorStoreHolder:
+    """Versioned, copy-on-write holder for the live vector store.
+
+    Readers call current() once per request and use that snapshot throughout; publishing
+    is a single reference assignment, so no lock is needed on the read path. Writers
+    serialize on `write_lock`, build the next delta from a copy of the current one and
+    publish() it; published indexes are never mutated. A superseded snapshot is freed by reference
+    counting as soon as the last request still holding it finishes.
+    """
+
+    def __init__(self):
+        self.write_lock = threading.Lock()
+        self._version = 0
+        self._current = VectorStoreSnapshot(version=0, db=None)
+        self._live = weakref.WeakValueDictionary()
+
+    def current(self) -> VectorStoreSnapshot:
+        return self._current
+
+    def publish(self, db, manifest_version=None, mapped=False, index_path=None, lexical=None, base=None, delta=None) -> VectorStoreSnapshot:
+        self._version += 1
+        snapshot = VectorStoreSnapshot(
+            version=self._version,
+            db=db,
+            manifest_version=manifest_version,
+            mapped=mapped,
+            index_path=index_path,
+            lexical=lexical,
+            base=base,
+            delta=delta,
+        )
+        self._live[snapshot.version] = snapshot
+        self._current = snapshot
+        return snapshot
+
+    def live_versions(self):
+        return sorted(self._live.keys())
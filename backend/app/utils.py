@@ -1,59 +1,504 @@
-from uuid import uuid4
+import asyncio
+import pickle
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from langchain_core.documents import Document
-from typing import Optional, List
+from typing import List
 from langchain_community.vectorstores import FAISS
+import faiss
+import numpy as np
 
 
 from app.config import (
     vector_store,
     llm,
-    embeddings
+    embeddings,
+    search_executor,
+    query_embedding_cache,
+    answer_cache,
+    chunk_embedding_cache,
+    embedding_engine,
+    components,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CONTEXT_FETCH_K,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MIN_SCORE,
+    CONTEXT_SCORE_MARGIN,
+    CONTEXT_MMR_LAMBDA,
+    RETRIEVAL_MODE,
+    RRF_K,
+    RERANK_ENABLED,
+    RERANK_FETCH_K,
+    RERANK_MODEL,
+    RERANK_TOP_N,
+    COMPACT_AFTER_SEGMENTS,
+    FAISS_INDEX_TYPE,
+    IVF_NLIST,
+    IVF_NPROBE,
+    HNSW_M,
+    HNSW_EF_SEARCH,
+    PQ_M,
+    INDEX_TRAIN_MIN_VECTORS,
+    VECTOR_STORE_DIR,
+    VECTOR_STORE_MMAP,
+    SNAPSHOT_POLL_SECONDS
+)
+from app.index_utils import (
+    apply_search_params,
+    build_index_from_vectors,
+    composite_index,
+    get_index_type,
+    read_index,
+    reconstruct_vectors
+)
+from app.cache_utils import content_hash
+from app.chunk_utils import iter_chunks
+from app.context_utils import assemble_context, score_cutoff
+from app.docstore_utils import SqliteDocstore, SqliteIndexMap
+from app.lexical_utils import LEXICAL_FILE, BM25Index, reciprocal_rank_fusion
+from app.rerank_utils import rerank
+from app.snapshot_utils import VectorStoreHolder
+from app.persistence_utils import (
+    append_segment,
+    base_snapshot_dir,
+    iter_segments,
+    manifest_lock,
+    read_manifest,
+    write_base_snapshot,
+    writer_lock
 )
 
-VECTOR_DIR = Path("vector_store")
+VECTOR_DIR = Path(VECTOR_STORE_DIR)
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
 
-vector_db: Optional[FAISS] = None
+docstore = SqliteDocstore(VECTOR_DIR / "docstore.sqlite")
+index_to_docstore_id = SqliteIndexMap(docstore)
+lexical_index = BM25Index()
 
-def create_chunks_from_text(text, chunk_size=500, overlap=50):
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        if len(chunk.strip()) > 50:
-            chunks.append(chunk)
-    return chunks
+vector_holder = VectorStoreHolder()
+compaction_running = False
+rebuild_running = False
+# A failed rebuild is retried after REBUILD_RETRY_SECONDS, doubling per failure up to REBUILD_RETRY_MAX_SECONDS.
+REBUILD_RETRY_SECONDS = 60.0
+REBUILD_RETRY_MAX_SECONDS = 3600.0
+rebuild_failures = 0
+rebuild_retry_at = 0.0
 
-def create_documents_from_chunks(chunks):
-    documents = []
-    for chunk in chunks:
-        document = Document(
-            page_content=chunk,
-        )
-        documents.append(document)
-    uuids = [str(uuid4()) for _ in range(len(documents))]
-    return documents, uuids
+def iter_document_chunks(pieces, source_id=None):
+    return iter_chunks(pieces, source_id=source_id, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
 
-def upload_documents_to_vector_store(documents, uuids):
-    global vector_db
-    if (VECTOR_DIR / "index.faiss").exists() and (VECTOR_DIR / "index.pkl").exists():
-        vector_db.add_documents(documents=documents, ids=uuids)
-        vector_db.save_local("vector_store")
-        load_vector_store()
+def create_chunks_from_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    return [document.page_content for document in iter_chunks([text], max_tokens=max_tokens, overlap_tokens=overlap_tokens)]
+
+def chunk_ids(documents):
+    # Ids derive from the source and the chunk text, so re-uploaded content maps onto chunks already
+    # in the index, while the same passage in two documents keeps a chunk (and citation) for each.
+    return [
+        content_hash(f"{document.metadata.get('source_id')}\x00{document.page_content}")
+        for document in documents
+    ]
+
+def _new_vector_db(index):
+    return FAISS(
+        embedding_function=vector_store.embedding_function,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+def _lexical_view(ntotal):
+    # Rows are added in FAISS order, so catching up means indexing the docstore rows it has not seen yet.
+    if len(lexical_index) < ntotal:
+        lexical_index.add(docstore.iter_texts(len(lexical_index), ntotal))
+    return lexical_index.view(ntotal)
+
+def _load_lexical_index(base_dir, ntotal):
+    global lexical_index
+    if len(lexical_index) > ntotal:
+        lexical_index = BM25Index()
+    path = base_dir / LEXICAL_FILE if base_dir is not None else None
+    if not len(lexical_index) and path is not None and path.exists():
+        loaded = BM25Index.load(path)
+        if len(loaded) <= ntotal:
+            lexical_index = loaded
+    return _lexical_view(ntotal)
+
+def _ntotal(index):
+    return index.ntotal if index is not None else 0
+
+def _writable_delta(snapshot):
+    # Copy-on-write of the delta only: readers never see a half-applied upload, and the base,
+    # however large, is shared by every snapshot and never written to.
+    if snapshot.delta is None:
+        return faiss.IndexFlatL2(vector_store.index.d)
+    return faiss.clone_index(snapshot.delta)
+
+def _publish(base, delta, manifest_version, lexical, mapped=False, index_path=None):
+    return vector_holder.publish(
+        _new_vector_db(composite_index(base, delta)),
+        manifest_version=manifest_version,
+        mapped=mapped,
+        index_path=index_path,
+        lexical=lexical,
+        base=base,
+        delta=delta,
+    )
+
+def _private_base(snapshot):
+    """A writable in-memory copy of the snapshot's base, or an empty index of the configured type."""
+    if snapshot.index_path is not None:
+        index, _ = read_index(snapshot.index_path)
+    elif snapshot.base is not None:
+        index = faiss.clone_index(snapshot.base)
     else:
-        vector_store.add_documents(documents=documents, ids=uuids)
-        vector_store.save_local("vector_store")
-        load_vector_store()
+        index = faiss.clone_index(vector_store.index)
+    apply_search_params(index, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH)
+    return index
+
+def _sync_with_disk():
+    """Reload if another worker changed the manifest since this one last loaded it.
+
+    Callers hold vector_holder.write_lock and manifest_lock, so nothing changes meanwhile.
+    """
+    if read_manifest(VECTOR_DIR)["version"] != vector_holder.current().manifest_version:
+        _load_snapshot()
+    return vector_holder.current()
+
+def _replace_base(build_base) -> bool:
+    """Write build_base(snapshot) as the new base and drop the segments it absorbed.
+
+    `build_base` must return an index holding every row of the snapshot. Rows uploaded
+    while it runs stay in the delta of the published result. Only the worker holding the
+    writer lock does this; the others return False and pick the new base up on reload.
+    """
+    with writer_lock(VECTOR_DIR) as acquired:
+        if not acquired:
+            return False
+        with vector_holder.write_lock, manifest_lock(VECTOR_DIR):
+            snapshot = _sync_with_disk()
+            if snapshot.db is None:
+                return False
+            segments = list(read_manifest(VECTOR_DIR)["segments"])
+        base = build_base(snapshot)
+        manifest = write_base_snapshot(base, VECTOR_DIR, segments, lexical=snapshot.lexical)
+        index_path = base_snapshot_dir(VECTOR_DIR, manifest) / "index.faiss"
+        mapped = False
+        if VECTOR_STORE_MMAP:
+            base, mapped = read_index(index_path, mmap=True)
+            apply_search_params(base, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH)
+        with vector_holder.write_lock, manifest_lock(VECTOR_DIR):
+            latest = vector_holder.current()
+            if latest.manifest_version != manifest["version"] - 1:
+                # Another worker uploaded before the base was written: load its segments from disk too.
+                _load_snapshot()
+                return True
+            delta = faiss.IndexFlatL2(base.d)
+            delta.add(reconstruct_vectors(latest.delta, start=snapshot.delta.ntotal))
+            _publish(base, delta, manifest["version"], latest.lexical, mapped=mapped, index_path=index_path)
+    return True
+
+def _compacted_base(snapshot):
+    base = _private_base(snapshot)
+    base.add(reconstruct_vectors(snapshot.delta))
+    return base
+
+def compact_vector_store(force=False) -> None:
+    global compaction_running
+    try:
+        snapshot = vector_holder.current()
+        if snapshot.delta is None or not (snapshot.delta.ntotal or force):
+            return
+        t0 = time.perf_counter()
+        if _replace_base(_compacted_base):
+            print(f"Compacted {snapshot.delta.ntotal} delta vectors into a new base in {time.perf_counter() - t0:.2f}s")
+        else:
+            print("Skipped compaction: another worker holds the vector store writer lock.")
+    except Exception as e:
+        print(f"Error compacting vector store: {e}")
+    finally:
+        compaction_running = False
+
+def _schedule_compaction(manifest) -> None:
+    global compaction_running
+    if compaction_running or rebuild_running or len(manifest["segments"]) < COMPACT_AFTER_SEGMENTS:
+        return
+    compaction_running = True
+    threading.Thread(target=compact_vector_store, name="vector-store-compaction", daemon=True).start()
+
+def _rebuild_failed(reason) -> None:
+    global rebuild_failures, rebuild_retry_at
+    rebuild_failures += 1
+    delay = min(REBUILD_RETRY_SECONDS * 2 ** (rebuild_failures - 1), REBUILD_RETRY_MAX_SECONDS)
+    rebuild_retry_at = time.monotonic() + delay
+    print(f"Error rebuilding vector index: {reason}; retrying in {delay:.0f}s")
+
+def _retrained_base(snapshot):
+    vectors = reconstruct_vectors(snapshot.base) if snapshot.base is not None else None
+    delta_vectors = reconstruct_vectors(snapshot.delta)
+    vectors = delta_vectors if vectors is None else np.vstack([vectors, delta_vectors])
+    base = build_index_from_vectors(vectors, FAISS_INDEX_TYPE, nlist=IVF_NLIST, hnsw_m=HNSW_M, pq_m=PQ_M)
+    apply_search_params(base, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH)
+    return base
+
+def rebuild_vector_index() -> None:
+    """Retrain the index as FAISS_INDEX_TYPE while the current snapshot keeps serving queries.
+
+    The retrained index becomes the new base, so the rebuild also compacts the segments.
+    """
+    global rebuild_running, rebuild_failures
+    try:
+        t0 = time.perf_counter()
+        if _replace_base(_retrained_base):
+            rebuild_failures = 0
+            print(f"Rebuilt {FAISS_INDEX_TYPE} index over {vector_holder.current().db.index.ntotal} vectors "
+                  f"in {time.perf_counter() - t0:.2f}s")
+        else:
+            _rebuild_failed("another worker holds the vector store writer lock")
+    except Exception as e:
+        _rebuild_failed(e)
+    finally:
+        rebuild_running = False
+
+def _current_index_type(snapshot):
+    return get_index_type(snapshot.base if snapshot.base is not None else vector_store.index)
+
+def _schedule_index_rebuild() -> bool:
+    global rebuild_running
+    snapshot = vector_holder.current()
+    if rebuild_running or compaction_running or snapshot.db is None or time.monotonic() < rebuild_retry_at:
+        return False
+    if _current_index_type(snapshot) == FAISS_INDEX_TYPE or snapshot.db.index.ntotal < INDEX_TRAIN_MIN_VECTORS:
+        return False
+    rebuild_running = True
+    threading.Thread(target=rebuild_vector_index, name="vector-index-rebuild", daemon=True).start()
+    return True
+
+def embed_documents_cached(texts):
+    vectors = chunk_embedding_cache.get_many(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        # Each finished batch is cached right away, so a failed ingest resumes where it stopped.
+        timings = {}
+        new_vectors = embedding_engine.embed([texts[i] for i in missing], on_batch=chunk_embedding_cache.set_many, timings=timings)
+        for i, vector in zip(missing, new_vectors):
+            vectors[i] = vector
+        print(f"Embedded {len(missing)} chunks in {timings['batches']} batches, {timings['seconds']:.2f}s "
+              f"({timings['chunks_per_second']:.1f} chunks/s, {timings['throttled']} rate-limited retries).")
+    print(f"{len(texts) - len(missing)} of {len(texts)} chunks served from cache.")
+    return vectors
+
+def _new_chunks(documents, uuids):
+    existing = docstore.existing_ids(list(uuids))
+    unique = {}
+    for document, doc_id in zip(documents, uuids):
+        if doc_id not in existing and doc_id not in unique:
+            unique[doc_id] = document
+    return unique
+
+def upload_documents_to_vector_store(documents, uuids):
+    chunks = _new_chunks(documents, uuids)
+    if not chunks:
+        print("All chunks are already in the vector store.")
+        return
+    vectors = dict(zip(chunks, embed_documents_cached([d.page_content for d in chunks.values()])))
+    # The manifest lock makes uploads from every worker process take turns; each one
+    # first catches up with segments other workers appended, so row numbers never collide.
+    with vector_holder.write_lock, manifest_lock(VECTOR_DIR):
+        snapshot = _sync_with_disk()
+        # Re-check under the lock in case a concurrent upload added the same chunks meanwhile.
+        chunks = _new_chunks(list(chunks.values()), list(chunks))
+        if not chunks:
+            return
+        uuids = list(chunks)
+        texts = [document.page_content for document in chunks.values()]
+        metadatas = [document.metadata for document in chunks.values()]
+        chunk_vectors = [vectors[doc_id] for doc_id in uuids]
+        delta = _writable_delta(snapshot)
+        dropped = docstore.truncate(_ntotal(snapshot.base) + delta.ntotal)
+        if dropped:
+            print(f"Removed {dropped} docstore rows without vectors from an interrupted upload.")
+        # Docstore rows are numbered across base and delta, so the delta's rows continue the base's.
+        _new_vector_db(delta).add_embeddings(zip(texts, chunk_vectors), metadatas=metadatas, ids=uuids)
+        manifest = append_segment(VECTOR_DIR, chunk_vectors, uuids)
+        _publish(
+            snapshot.base,
+            delta,
+            manifest["version"],
+            _lexical_view(_ntotal(snapshot.base) + delta.ntotal),
+            mapped=snapshot.mapped,
+            index_path=snapshot.index_path,
+        )
+    answer_cache.invalidate()
+    _schedule_index_rebuild()
+    _schedule_compaction(manifest)
     print("Documents uploaded to vector store successfully.")
 
-def get_similarity_context(query, k=6,):
-    query_embedding = embeddings.embed_query(query)
-    results = vector_db.similarity_search_with_score_by_vector(query_embedding, k=k)
+def get_query_embedding(query):
+    query_embedding = query_embedding_cache.get(query)
+    if query_embedding is None:
+        query_embedding = embeddings.embed_query(query)
+        query_embedding_cache.set(query, query_embedding)
+    return query_embedding
+
+async def aget_query_embedding(query):
+    query_embedding = await query_embedding_cache.aget(query)
+    if query_embedding is None:
+        query_embedding = await embeddings.aembed_query(query)
+        await query_embedding_cache.aset(query, query_embedding)
+    return query_embedding
+
+def _current_snapshot():
+    snapshot = vector_holder.current()
+    if snapshot.db is None:
+        raise RuntimeError("VectorStore is empty; start by uploading a PDF.")
+    return snapshot
+
+def _current_vector_db():
+    return _current_snapshot().db
+
+def _retrieval_mode(mode):
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+    return mode
+
+def _lexical_results(snapshot, query, k):
+    hits = snapshot.lexical.search(query, k) if snapshot.lexical is not None else []
+    documents = docstore.get_rows([row for row, _ in hits])
+    return [(documents[row], score) for row, score in hits if row in documents]
+
+def fuse_results(result_lists, k=CONTEXT_FETCH_K):
+    """Reciprocal-rank fusion of ranked (Document, score) lists; fused scores are in [0, 1]."""
+    documents = {}
+    for results in result_lists:
+        for doc, _ in results:
+            documents.setdefault(doc.id, doc)
+    fused = reciprocal_rank_fusion([[doc.id for doc, _ in results] for results in result_lists], k=RRF_K)
+    return [(documents[doc_id], score) for doc_id, score in fused[:k]]
+
+async def aget_similarity_results(query, k=CONTEXT_FETCH_K, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = await aget_query_embedding(query)
+    search = partial(_current_vector_db().similarity_search_with_score_by_vector, query_embedding, k=k)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, search)
+
+def _dense_candidates(results):
+    # Fused scores come from ranks, not similarities, so in hybrid mode the similarity cutoff
+    # is applied to the vector hits before fusion; otherwise an off-topic chunk would ride
+    # into the prompt on its rank alone.
+    return score_cutoff(results, CONTEXT_MIN_SCORE, CONTEXT_SCORE_MARGIN)
+
+def select_context_results(results, distances=True):
+    # Score cutoff, overlap merging, MMR and the token budget; see assemble_context.
+    # Fused and re-ranked results were already cut off before fusion (_dense_candidates).
+    return assemble_context(
+        results,
+        components.get("prompt_token_counter"),
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        min_score=CONTEXT_MIN_SCORE if distances else 0.0,
+        score_margin=CONTEXT_SCORE_MARGIN if distances else 1.0,
+        lambda_mult=CONTEXT_MMR_LAMBDA,
+        distances=distances,
+    )
+
+def rerank_results(query, results):
+    return rerank(query, results, components.get("reranker"), top_n=RERANK_TOP_N)
+
+def _retrieve(query, k, mode):
+    """Ranked (Document, score) hits, and whether the scores are FAISS distances."""
+    snapshot = _current_snapshot()
+    if mode == "vector":
+        return snapshot.db.similarity_search_with_score_by_vector(get_query_embedding(query), k=k), True
+    result_lists = [_lexical_results(snapshot, query, k)]
+    if mode == "hybrid":
+        dense = snapshot.db.similarity_search_with_score_by_vector(get_query_embedding(query), k=k)
+        result_lists.insert(0, _dense_candidates(dense))
+    return fuse_results(result_lists, k), False
+
+async def _aretrieve(query, k, mode, query_embedding=None):
+    snapshot = _current_snapshot()
+    loop = asyncio.get_running_loop()
+    if mode == "vector":
+        return await aget_similarity_results(query, k=k, query_embedding=query_embedding), True
+    # BM25 runs on the search pool while the query embedding is in flight; lexical mode never embeds.
+    lexical = loop.run_in_executor(search_executor, _lexical_results, snapshot, query, k)
+    result_lists = []
+    if mode == "hybrid":
+        if query_embedding is None:
+            query_embedding = await aget_query_embedding(query)
+        search = partial(snapshot.db.similarity_search_with_score_by_vector, query_embedding, k=k)
+        result_lists.append(_dense_candidates(await loop.run_in_executor(search_executor, search)))
+    result_lists.append(await lexical)
+    return fuse_results(result_lists, k), False
+
+def _record(timings, stage, t0):
+    if timings is not None:
+        timings[f"{stage}_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return time.perf_counter()
+
+def get_context_results(query, k=CONTEXT_FETCH_K, mode=None, timings=None):
+    """Retrieve, optionally re-rank, then assemble the prompt context; stage times go into `timings`."""
+    mode = _retrieval_mode(mode)
+    t0 = time.perf_counter()
+    # The cross-encoder picks from a wider candidate set than plain retrieval would send on.
+    results, distances = _retrieve(query, RERANK_FETCH_K if RERANK_ENABLED else k, mode)
+    t0 = _record(timings, "retrieve", t0)
+    if RERANK_ENABLED:
+        results, distances = rerank_results(query, results), False
+        t0 = _record(timings, "rerank", t0)
+    results = select_context_results(results, distances=distances)
+    _record(timings, "assemble", t0)
+    return results
+
+async def aget_context_results(query, k=CONTEXT_FETCH_K, mode=None, timings=None, query_embedding=None):
+    """Async get_context_results; pass `query_embedding` if the caller already has it."""
+    mode = _retrieval_mode(mode)
+    t0 = time.perf_counter()
+    results, distances = await _aretrieve(query, RERANK_FETCH_K if RERANK_ENABLED else k, mode, query_embedding)
+    t0 = _record(timings, "retrieve", t0)
+    if RERANK_ENABLED:
+        # The cross-encoder releases the GIL inside onnxruntime, so it runs on the search pool.
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(search_executor, rerank_results, query, results)
+        distances = False
+        t0 = _record(timings, "rerank", t0)
+    results = select_context_results(results, distances=distances)
+    _record(timings, "assemble", t0)
+    return results
+
+def answer_cache_namespace(mode=None):
+    # Answers depend on how the context was built, so they are only shared between queries
+    # retrieved with the same mode, re-ranking and context settings.
+    rerank = f"{RERANK_MODEL}:{RERANK_FETCH_K}:{RERANK_TOP_N}" if RERANK_ENABLED else "off"
+    return (f"{_retrieval_mode(mode)}|rerank={rerank}|fetch_k={CONTEXT_FETCH_K}|budget={CONTEXT_TOKEN_BUDGET}"
+            f"|min_score={CONTEXT_MIN_SCORE}|margin={CONTEXT_SCORE_MARGIN}|mmr={CONTEXT_MMR_LAMBDA}")
+
+def build_context(results):
     retrieved_docs = [doc.page_content for doc, _ in results]
-    context = "\n\n".join(retrieved_docs)
-    return context
+    return "\n\n".join(retrieved_docs)
 
-def get_llm_response(query, context):
+def build_sources(results):
+    return [
+        {
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "score": float(score),
+        }
+        for doc, score in results
+    ]
+
+def get_similarity_context(query, k=CONTEXT_FETCH_K, mode=None, timings=None):
+    results = get_context_results(query, k=k, mode=mode, timings=timings)
+    return build_context(results)
+
+async def aget_similarity_context(query, k=CONTEXT_FETCH_K, mode=None, timings=None, query_embedding=None):
+    results = await aget_context_results(query, k=k, mode=mode, timings=timings, query_embedding=query_embedding)
+    return build_context(results)
+
+def build_llm_messages(query, context):
     messages = [
         {
             "role": "system",
@@ -80,19 +525,81 @@ Retrieved Context (Top Relevant Chunks):
 {context}"""
         }
     ]
+    return messages
+
+def get_llm_response(query, context):
+    messages = build_llm_messages(query, context)
     response = llm.invoke(messages)
     return response.content
 
+async def aget_llm_response(query, context):
+    messages = build_llm_messages(query, context)
+    response = await llm.ainvoke(messages)
+    return response.content
+
+async def astream_llm_response(query, context):
+    messages = build_llm_messages(query, context)
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            yield chunk.content
+
+def _migrate_pickled_docstore(base_dir: Path) -> None:
+    pickle_path = base_dir / "index.pkl"
+    if not pickle_path.exists() or not docstore.is_empty():
+        return
+    with open(pickle_path, "rb") as f:
+        old_docstore, old_index_to_docstore_id = pickle.load(f)
+    docstore.import_documents(old_docstore, old_index_to_docstore_id)
+    print(f"Migrated {len(old_index_to_docstore_id)} chunks from {pickle_path} to {docstore.path}")
+
+def _load_snapshot():
+    """Publish the store as it is on disk; the caller holds vector_holder.write_lock."""
+    manifest = read_manifest(VECTOR_DIR)
+    base_dir = base_snapshot_dir(VECTOR_DIR, manifest)
+    base, mapped, index_path = None, False, None
+    if base_dir is not None:
+        _migrate_pickled_docstore(base_dir)
+        index_path = base_dir / "index.faiss"
+        latest = vector_holder.current()
+        if latest.base is not None and latest.index_path == index_path:
+            # Only segments changed (another worker uploaded): keep the base already loaded.
+            base, mapped = latest.base, latest.mapped
+        else:
+            # Only the base is mapped, so every worker shares one copy of it through the page
+            # cache; the segments are small and go into each worker's private delta.
+            base, mapped = read_index(index_path, mmap=VECTOR_STORE_MMAP)
+            apply_search_params(base, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH)
+    db, lexical = None, None
+    if base is not None or manifest["segments"]:
+        delta = faiss.IndexFlatL2(base.d if base is not None else vector_store.index.d)
+        for vectors, _ in iter_segments(VECTOR_DIR, manifest["segments"]):
+            delta.add(vectors)
+        lexical = _load_lexical_index(base_dir, _ntotal(base) + delta.ntotal)
+        db = _publish(base, delta, manifest["version"], lexical, mapped=mapped, index_path=index_path).db
+    else:
+        vector_holder.publish(None, manifest_version=manifest["version"])
+    return manifest, db, mapped
+
 def load_vector_store() -> None:
-    global vector_db
-    if (VECTOR_DIR / "index.faiss").exists() and (VECTOR_DIR / "index.pkl").exists():
-        vector_db = FAISS.load_local(
-            folder_path=str(VECTOR_DIR),
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
-        )
-        print(f"VectorStore Loaded from {VECTOR_DIR}")
+    with vector_holder.write_lock:
+        manifest, db, mapped = _load_snapshot()
+    if db is not None:
+        mode = "memory-mapped" if mapped else "in memory"
+        print(f"VectorStore Loaded from {VECTOR_DIR} ({mode}, {len(manifest['segments'])} delta segments, "
+              f"{len(lexical_index)} chunks in the BM25 index)")
+        _schedule_index_rebuild()
     else:
-        vector_db = None
         print("VectorStore Not found; start by uploading a PDF.")
 
+async def watch_vector_store_snapshots() -> None:
+    """Hot-swap to the latest published snapshot when another worker uploads or compacts."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(SNAPSHOT_POLL_SECONDS)
+        try:
+            manifest = await loop.run_in_executor(None, read_manifest, VECTOR_DIR)
+            if manifest["version"] != vector_holder.current().manifest_version:
+                await loop.run_in_executor(None, load_vector_store)
+                answer_cache.invalidate()
+        except Exception as e:
+            print(f"Error reloading vector store snapshot: {e}")
@@ -1,92 +1,225 @@
-from openai import OpenAI
-from moviepy.editor import VideoFileClip
-from pydub import AudioSegment
 import os
+import subprocess
 import tempfile
 import shutil
 import time 
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from app.audio_utils import detect_silences, map_to_source_time, plan_speech_segments
+from app.embedding_utils import retryable_errors
+from app.config import (
+    AUDIO_BITRATE_KBPS,
+    SILENCE_TRIM,
+    SILENCE_NOISE_DB,
+    SILENCE_MIN_SECONDS,
+    SILENCE_DROP_SECONDS,
+    SILENCE_PADDING_SECONDS,
+    TRANSCRIBE_CONCURRENCY,
+    TRANSCRIBE_MAX_RETRIES,
+    TRANSCRIBE_REQUESTS_PER_MINUTE
+)
 
-def extract_audio(video_path, audio_path):
-    try:
-        clip = VideoFileClip(video_path)
-        audio = clip.audio
-        if audio:
-            audio.write_audiofile(audio_path, codec='libmp3lame')
-            print(f"Audio extracted to {audio_path}")
-        else:
-            print("No audio track found in the video.")
-        clip.reader.close()
-        clip.audio.reader.close_proc()
-    except Exception as e:
-        print(f"Error extracting audio: {e}")
-        raise
+class RateLimiter:
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
 
 def get_file_size(file_path):
     return os.path.getsize(file_path)
 
-def split_audio(audio_path, chunk_dir, chunk_size=20 * 1024 * 1024):
+def segment_seconds_for(chunk_size, bitrate_kbps=AUDIO_BITRATE_KBPS):
+    # Constant-bitrate output, so duration maps directly to bytes; keep 5% headroom for container overhead.
+    return int(chunk_size * 8 / (bitrate_kbps * 1000) * 0.95)
+
+def plan_silence_trim(media_path, timings, max_segment_seconds):
+    """Returns (keep, cuts, offset_map) from plan_speech_segments, or None when there is no audio to keep."""
     t0 = time.perf_counter()
+    duration, silences = detect_silences(media_path, noise_db=SILENCE_NOISE_DB, min_silence_seconds=SILENCE_MIN_SECONDS)
+    keep, cuts, offset_map = plan_speech_segments(
+        duration,
+        silences,
+        max_segment_seconds,
+        drop_silence_seconds=SILENCE_DROP_SECONDS,
+        padding_seconds=SILENCE_PADDING_SECONDS,
+    )
+    timings["silence_detect_seconds"] = time.perf_counter() - t0
+    timings["source_audio_seconds"] = duration
+    timings["speech_audio_seconds"] = sum(end - start for start, end in keep)
+    if not keep:
+        # Zero-length or unreadable duration: an empty aselect expression would make ffmpeg fail.
+        print("Silence detection found no audio to keep; transcribing without trimming.")
+        return None
+    return keep, cuts, offset_map
+
+def stream_audio_segments(media_path, chunk_dir, timings, chunk_size=20 * 1024 * 1024, bitrate_kbps=AUDIO_BITRATE_KBPS, poll_seconds=0.2, speech_plan=None):
+    """Demux, downmix and segment the audio track in a single ffmpeg pass.
+
+    With a `speech_plan` from plan_silence_trim, long silences are cut out with aselect
+    and segments are split at pauses (see plan_speech_segments).
+
+    Yields each segment path as soon as ffmpeg has finished writing it (i.e. once the
+    next segment has been opened or ffmpeg has exited), so transcription can start
+    while the rest of the file is still being processed. Audio is never decoded into
+    Python memory.
+    """
     os.makedirs(chunk_dir, exist_ok=True)
-    chunks = []
-
-    audio = AudioSegment.from_file(audio_path)
-    total_size = get_file_size(audio_path)
-    total_duration_ms = len(audio)  
-    chunk_duration_ms = int(chunk_size / total_size * total_duration_ms)
-    if chunk_duration_ms >= total_duration_ms:
-        chunk_duration_ms = total_duration_ms 
-
-    for i in range(0, total_duration_ms, chunk_duration_ms):
-        chunk = audio[i:i + chunk_duration_ms]
-        idx = i // chunk_duration_ms
-        chunk_path = os.path.join(chunk_dir, f"chunk_{idx:03d}.mp3")
-        chunk.export(chunk_path, format="mp3")
-        chunks.append(chunk_path)
-
-    t1 = time.perf_counter()
-    return chunks, (t1 - t0)
-
-def transcribe_audio_chunk(audio_path, client: OpenAI):
+    pattern = os.path.join(chunk_dir, "chunk_%03d.mp3")
+    max_segment_seconds = segment_seconds_for(chunk_size, bitrate_kbps)
+    filter_args = []
+    segment_args = ["-segment_time", str(max_segment_seconds)]
+    if speech_plan is not None:
+        keep, cuts, _ = speech_plan
+        selection = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in keep)
+        # A filter script avoids command-line length limits on long recordings.
+        filter_path = os.path.join(chunk_dir, "speech.filter")
+        with open(filter_path, "w", encoding="utf-8") as f:
+            f.write(f"aselect='{selection}',asetpts=N/SR/TB")
+        filter_args = ["-filter_script:a", filter_path]
+        segment_args = ["-segment_times", ",".join(str(cut) for cut in cuts)] if cuts else ["-segment_time", str(max_segment_seconds)]
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+        "-i", os.fspath(media_path),
+        "-vn", *filter_args, "-ac", "1", "-ar", "16000",
+        "-c:a", "libmp3lame", "-b:a", f"{bitrate_kbps}k",
+        "-f", "segment", *segment_args,
+        "-reset_timestamps", "1",
+        pattern,
+    ]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    next_index = 0
+    try:
+        while True:
+            finished = proc.poll() is not None
+            while os.path.exists(pattern % (next_index + 1)) or (finished and os.path.exists(pattern % next_index)):
+                yield pattern % next_index
+                next_index += 1
+            if finished:
+                break
+            time.sleep(poll_seconds)
+        if proc.returncode != 0:
+            error = proc.stderr.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg failed to extract audio: {error}")
+        if next_index == 0:
+            raise RuntimeError("No audio track found in the video.")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stderr.close()
+        timings["split_seconds"] = time.perf_counter() - t0
+        timings["chunks_count"] = next_index
+
+def transcribe_audio_chunk(audio_path, client: "OpenAI"):
+    """Returns (text, duration, [(start, end, text), ...]) with segment times relative to the chunk."""
     with open(audio_path, "rb") as audio_file:
         response = client.audio.transcriptions.create(
             file=audio_file,
-            model="whisper-1"
+            model="whisper-1",
+            response_format="verbose_json"
         )
-    return response.text
+    segments = [(segment.start, segment.end, segment.text) for segment in response.segments or []]
+    return response.text, float(response.duration or 0.0), segments
+
+def transcribe_audio_chunk_with_retry(audio_path, client: "OpenAI", limiter: RateLimiter, max_retries=TRANSCRIBE_MAX_RETRIES):
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        limiter.wait()
+        try:
+            return transcribe_audio_chunk(audio_path, client), attempt
+        except retryable_errors() as e:
+            if attempt == max_retries:
+                raise
+            print(f"Retrying {os.path.basename(audio_path)} in {delay:.1f}s after: {e}")
+            time.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, 30.0)
+
+def transcribe_chunks(chunks, client: "OpenAI", timings, concurrency=TRANSCRIBE_CONCURRENCY, requests_per_minute=TRANSCRIBE_REQUESTS_PER_MINUTE):
+    """Transcribe `chunks` (any iterable of paths, e.g. a live segment stream) and join the text in chunk order.
+
+    Returns (transcript, segments). Each segment is a dict with `start`/`end` seconds on
+    the audio timeline the chunks were cut from, and the `char_start`/`char_end` of its
+    text in the transcript.
+    """
+    limiter = RateLimiter(requests_per_minute)
+
+    def run(i, chunk):
+        t0 = time.perf_counter()
+        result, retries = transcribe_audio_chunk_with_retry(chunk, client, limiter)
+        print(f"Transcribed chunk {i+1}: {os.path.basename(chunk)}")
+        return result, retries, time.perf_counter() - t0
 
-def transcribe_audio(audio_path):
+    t_wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="whisper") as pool:
+        futures = [pool.submit(run, i, chunk) for i, chunk in enumerate(chunks)]
+        transcript, segments = "", []
+        chunk_start = 0.0
+        timings["per_chunk_seconds"] = []
+        for future in futures:
+            (text, duration, chunk_segments), retries, dt = future.result()
+            # Chunks are consecutive, so each one starts where the previous one ended.
+            for start, end, segment_text in chunk_segments or [(0.0, duration, text)]:
+                segment_text = segment_text.strip()
+                if not segment_text:
+                    continue
+                if transcript:
+                    transcript += " "
+                segments.append({
+                    "start": round(chunk_start + start, 3),
+                    "end": round(chunk_start + end, 3),
+                    "char_start": len(transcript),
+                    "char_end": len(transcript) + len(segment_text),
+                })
+                transcript += segment_text
+            chunk_start += duration
+            timings["per_chunk_seconds"].append(dt)
+            timings["chunk_retries"] += retries
+
+    timings["transcription_wall_seconds"] = time.perf_counter() - t_wall_start
+    timings["transcription_summed_chunk_seconds"] = sum(timings["per_chunk_seconds"])
+    return transcript, segments
+
+def transcribe_audio(media_path):
     timings = {
         "split_seconds": 0.0,
         "chunks_count": 0,
         "per_chunk_seconds": [],
+        "chunk_retries": 0,
+        "transcription_wall_seconds": 0.0,
+        "transcription_summed_chunk_seconds": 0.0,
         "transcription_total_seconds": 0.0
     }
 
     chunk_dir = tempfile.mkdtemp(prefix="chunks_")
-    chunks = []
     try:
-        chunks, split_secs = split_audio(audio_path, chunk_dir)
-        timings["split_seconds"] = split_secs
-        timings["chunks_count"] = len(chunks)
-
-        client = OpenAI()
-        t_trans_total_start = time.perf_counter()
-
-        transcript_parts = []
-        for i, chunk in enumerate(chunks):
-            t0 = time.perf_counter()
-            print(f"Transcribing chunk {i+1}/{len(chunks)}: {os.path.basename(chunk)}")
-            text = transcribe_audio_chunk(chunk, client)
-            t1 = time.perf_counter()
-            dt = t1 - t0
-            timings["per_chunk_seconds"].append(dt)
-            transcript_parts.append(text)
+        # Retries are handled per chunk with backoff, so the SDK's own retries are disabled.
+        from openai import OpenAI
+        client = OpenAI(max_retries=0)
+        chunk_size = 20 * 1024 * 1024
+        speech_plan = plan_silence_trim(media_path, timings, segment_seconds_for(chunk_size)) if SILENCE_TRIM else None
+        audio_chunks = stream_audio_segments(media_path, chunk_dir, timings, chunk_size=chunk_size, speech_plan=speech_plan)
+        transcription, segments = transcribe_chunks(audio_chunks, client, timings)
+        timings["transcription_total_seconds"] = timings["transcription_wall_seconds"]
+        if speech_plan is not None:
+            # Whisper timed the trimmed audio; move every segment back onto the video timeline.
+            offset_map = speech_plan[2]
+            for segment in segments:
+                segment["start"] = round(map_to_source_time(segment["start"], offset_map), 3)
+                segment["end"] = round(map_to_source_time(segment["end"], offset_map), 3)
 
-        t_trans_total_end = time.perf_counter()
-        timings["transcription_total_seconds"] = t_trans_total_end - t_trans_total_start
-
-        return " ".join(transcript_parts).strip(), timings
+        return transcription, segments, timings
 
     finally:
         try:
@@ -101,44 +234,40 @@ def format_seconds(sec: float) -> str:
     m, s = divmod(sec, 60)
     return f"{int(m)}m {s:.1f}s"
 
+def add_source_times(documents, segments):
+    """Set `start_seconds`/`end_seconds` on transcript chunks from their `start`/`end` character offsets."""
+    if not segments:
+        return
+    char_starts = [segment["char_start"] for segment in segments]
+    for document in documents:
+        first = max(bisect_right(char_starts, document.metadata["start"]) - 1, 0)
+        last = max(bisect_left(char_starts, document.metadata["end"]) - 1, first)
+        document.metadata["start_seconds"] = segments[first]["start"]
+        document.metadata["end_seconds"] = segments[last]["end"]
+
 def get_transcription_from_video(video_path: str | Path):
+    """Returns (transcript, segments); segment times are seconds into the video."""
     video_path = os.fspath(video_path)
     t_total_start = time.perf_counter()
 
-    with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio_file:
-        audio_path = temp_audio_file.name
+    transcription, segments, timings = transcribe_audio(video_path)
 
-    extract_secs = 0.0
-    try:
-        t0 = time.perf_counter()
-        extract_audio(video_path, audio_path)
-        t1 = time.perf_counter()
-        extract_secs = t1 - t0
+    t_total_end = time.perf_counter()
+    end_to_end = t_total_end - t_total_start
 
-        file_size_mb = get_file_size(audio_path) / (1024 * 1024)
-        print(f"Temporary audio size: {file_size_mb:.2f} MB")
+    print("\n=== Timing Summary ===")
+    if "silence_detect_seconds" in timings:
+        print(f"Silence detection:        {format_seconds(timings['silence_detect_seconds'])} "
+              f"(kept {format_seconds(timings['speech_audio_seconds'])} of {format_seconds(timings['source_audio_seconds'])})")
+    print(f"Extract + segment audio:  {format_seconds(timings['split_seconds'])} "
+          f"(chunks: {timings['chunks_count']})")
+    if timings["per_chunk_seconds"]:
+        print("Per-chunk transcription:")
+        for i, secs in enumerate(timings["per_chunk_seconds"], start=1):
+            print(f"  - Chunk {i:02d}:        {format_seconds(secs)}")
+    print(f"Transcription wall-clock: {format_seconds(timings['transcription_wall_seconds'])}")
+    print(f"Transcription chunk sum:  {format_seconds(timings['transcription_summed_chunk_seconds'])} "
+          f"(retries: {timings['chunk_retries']})")
+    print(f"End-to-end total:         {format_seconds(end_to_end)}")
 
-        transcription, timings = transcribe_audio(audio_path)
-
-        t_total_end = time.perf_counter()
-        end_to_end = t_total_end - t_total_start
-
-        print("\n=== Timing Summary ===")
-        print(f"Extract audio:            {format_seconds(extract_secs)}")
-        print(f"Split audio:              {format_seconds(timings['split_seconds'])} "
-              f"(chunks: {timings['chunks_count']})")
-        if timings["per_chunk_seconds"]:
-            print("Per-chunk transcription:")
-            for i, secs in enumerate(timings["per_chunk_seconds"], start=1):
-                print(f"  - Chunk {i:02d}:        {format_seconds(secs)}")
-        print(f"Transcription total:      {format_seconds(timings['transcription_total_seconds'])}")
-        print(f"End-to-end total:         {format_seconds(end_to_end)}")
-
-        return transcription
-
-    finally:
-        try:
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-        except Exception as e:
-            print(f"Could not delete temp audio file: {e}")
\ No newline at end of file
+    return transcription, segments
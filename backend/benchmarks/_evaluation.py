@@ -0,0 +1,54 @@
+# Shared by the retrieval benches: the sample QA dataset, its KI chunks and the ranking metrics.
+import csv
+from pathlib import Path
+
+import numpy as np
+
+DATASET = Path(__file__).resolve().parents[2] / "dataset" / "rag_sample_qas_from_kis.csv"
+
+
+def load_rows(path=DATASET):
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def ki_source_id(row_id):
+    return f"ki-{row_id}"
+
+
+def ki_documents(rows, chunk_tokens, overlap_tokens):
+    """Chunks of every KI text; a chunk's source_id names the row its question came from."""
+    from app.chunk_utils import iter_chunks
+    documents = []
+    for row_id, row in enumerate(rows):
+        documents += iter_chunks([row["ki_text"]], source_id=ki_source_id(row_id), max_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    return documents
+
+
+def source_ranking(documents):
+    # Rank of the first chunk of each source, so several chunks of one KI count once.
+    ranking = []
+    for document in documents:
+        source = document.metadata["source_id"]
+        if source not in ranking:
+            ranking.append(source)
+    return ranking
+
+
+def score_rankings(rankings, targets, ks):
+    """recall@k for each k in `ks`, and MRR, of the `targets` in the source `rankings`."""
+    metrics = {f"recall@{k}": 0.0 for k in ks}
+    mrr = 0.0
+    for ranked, target in zip(rankings, targets):
+        rank = ranked.index(target) + 1 if target in ranked else None
+        for k in ks:
+            metrics[f"recall@{k}"] += rank is not None and rank <= k
+        mrr += 1 / rank if rank else 0.0
+    n = len(targets)
+    metrics = {name: round(value / n, 4) for name, value in metrics.items()}
+    metrics["mrr"] = round(mrr / n, 4)
+    return metrics
+
+
+def latency_ms(samples, percentiles=(50, 95, 99), prefix=""):
+    return {f"{prefix}p{p}_ms": round(float(np.percentile(samples, p)) * 1000, 3) for p in percentiles}
@@ -0,0 +1,114 @@
+# Stub clients with artificial latency so benchmarks run without network access.
+import asyncio
+import os
+import re
+import sys
+import time
+import zlib
+
+from app.embedding_utils import BatchEmbedder, approx_token_count
+
+# Read by app.config at import: no OpenAI key, no disk caches, no answer cache, no rate limit.
+STUB_SETTINGS = {
+    "OPENAI_API_KEY": "stub",
+    "EMBEDDING_CACHE_SIZE": "0",
+    "EMBEDDING_CACHE_PATH": "",
+    "CHUNK_EMBEDDING_CACHE_PATH": "",
+    "ANSWER_CACHE_SIZE": "0",
+    "SILENCE_TRIM": "false",
+    "TRANSCRIBE_REQUESTS_PER_MINUTE": "0",
+    "STARTUP_WARMUP": "",
+}
+
+
+class StubMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubEmbeddings:
+    def __init__(self, latency=0.05, dim=8):
+        self.latency = latency
+        self.dim = dim
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return [0.0] * self.dim
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency)
+        return [0.0] * self.dim
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [[0.0] * self.dim for _ in texts]
+
+
+class HashingEmbeddings:
+    """Deterministic bag-of-words embeddings (hashed unigrams and bigrams, L2-normalized).
+
+    Similar texts get similar vectors, so retrieval quality can be compared offline.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _embed(self, text):
+        import numpy as np
+        words = re.findall(r"\w+", text.lower())
+        vector = np.zeros(self.dim, dtype="float32")
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(token.encode())
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    async def aembed_query(self, text):
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+class StubChatModel:
+    def __init__(self, latency=0.5, answer="<p>stub answer</p>"):
+        self.latency = latency
+        self.answer = answer
+
+    def invoke(self, messages):
+        time.sleep(self.latency)
+        return StubMessage(self.answer)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency)
+        return StubMessage(self.answer)
+
+
+class StubVectorStore:
+    def __init__(self, latency=0.005):
+        self.latency = latency
+
+    def similarity_search_with_score_by_vector(self, embedding, k=6):
+        time.sleep(self.latency)
+        return []
+
+
+def install_stubs(embeddings, llm, **settings):
+    """Configure the real app.config through the environment and swap stub clients into its registry.
+
+    Settings are read when app.config is first imported, so call this before importing
+    any other app module. Extra keyword arguments are setting overrides, e.g. SEARCH_WORKERS=8.
+    """
+    if "app.config" in sys.modules:
+        raise RuntimeError("install_stubs() must run before app.config is imported")
+    os.environ.update({name: str(value) for name, value in {**STUB_SETTINGS, **settings}.items()})
+    from app import config
+    config.components.override("embeddings", embeddings)
+    config.components.override("llm", llm)
+    config.components.override("vector_store", StubVectorStore())
+    config.components.override("embedding_engine", BatchEmbedder(embeddings.embed_documents, batch_size=config.EMBED_BATCH_SIZE))
+    config.components.override("prompt_token_counter", approx_token_count)
+    return config
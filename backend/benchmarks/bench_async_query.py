@@ -0,0 +1,50 @@
+# Compares concurrent query throughput of the blocking and async pipelines on one event loop.
+# Run from the backend folder: python -m benchmarks.bench_async_query
+import argparse
+import asyncio
+import time
+
+from benchmarks._stubs import (
+    StubChatModel,
+    StubEmbeddings,
+    StubVectorStore,
+    install_stubs,
+)
+
+
+async def run_blocking(utils, query):
+    context = utils.get_similarity_context(query)
+    return utils.get_llm_response(query, context)
+
+
+async def run_async(utils, query):
+    context = await utils.aget_similarity_context(query)
+    return await utils.aget_llm_response(query, context)
+
+
+async def measure(pipeline, utils, concurrency):
+    t0 = time.perf_counter()
+    await asyncio.gather(*(pipeline(utils, f"question {i}") for i in range(concurrency)))
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    install_stubs(StubEmbeddings(args.embed_latency), StubChatModel(args.llm_latency))
+    from app import utils
+    utils.vector_holder.publish(StubVectorStore())
+
+    print(f"{'in-flight':>10} {'blocking q/s':>14} {'async q/s':>12}")
+    for n in args.concurrency:
+        blocking = asyncio.run(measure(run_blocking, utils, n))
+        non_blocking = asyncio.run(measure(run_async, utils, n))
+        print(f"{n:>10} {n / blocking:>14.2f} {n / non_blocking:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Streaming chunker throughput and memory on a large synthetic transcript.
+# Run from the backend folder: python -m benchmarks.bench_chunker --mb 300
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.chunk_utils import iter_chunks, iter_text_file
+
+WORDS = "the board meeting agenda item resolution minutes approve vote member paper action review".split()
+
+
+def write_transcript(path, size_mb, seed=0):
+    # Whisper-style output: one long run of sentences with no paragraph breaks.
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            block = " ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                for _ in range(2000)
+            ) + " "
+            f.write(block)
+            written += len(block)
+
+
+def legacy_word_windows(text, chunk_size=500, overlap=50):
+    words = text.split()
+    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size - overlap)]
+
+
+def measure(run):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    chunks = run()
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=300)
+    parser.add_argument("--legacy-mb", type=int, default=50, help="size for the old split/join chunker (it holds every word in memory)")
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    parser.add_argument("--trace-memory", action="store_true", help="trace peak allocations (slows both runs down)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transcript.txt"
+        write_transcript(path, args.mb)
+        size_mb = path.stat().st_size / 1024 / 1024
+
+        def streaming():
+            return sum(1 for _ in iter_chunks(iter_text_file(path), max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens))
+
+        if args.trace_memory:
+            chunks, seconds, peak = measure(streaming)
+        else:
+            t0 = time.perf_counter()
+            chunks, peak = streaming(), None
+            seconds = time.perf_counter() - t0
+        print(json.dumps({
+            "chunker": "streaming",
+            "input_mb": round(size_mb, 1),
+            "chunks": chunks,
+            "seconds": round(seconds, 2),
+            "mb_per_second": round(size_mb / seconds, 1),
+            "peak_mb": round(peak / 1024 / 1024, 1) if peak is not None else None,
+        }))
+
+        if args.legacy_mb:
+            with open(path, encoding="utf-8") as f:
+                text = f.read(args.legacy_mb * 1024 * 1024)
+            if args.trace_memory:
+                chunks, seconds, peak = measure(lambda: len(legacy_word_windows(text)))
+            else:
+                t0 = time.perf_counter()
+                chunks, peak = len(legacy_word_windows(text)), None
+                seconds = time.perf_counter() - t0
+            print(json.dumps({
+                "chunker": "legacy_word_windows",
+                "input_mb": round(len(text) / 1024 / 1024, 1),
+                "chunks": chunks,
+                "seconds": round(seconds, 2),
+                "mb_per_second": round(len(text) / 1024 / 1024 / seconds, 1),
+                "peak_mb": round(peak / 1024 / 1024, 1) if peak is not None else None,
+            }))
+
+
+if __name__ == "__main__":
+    main()
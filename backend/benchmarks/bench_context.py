@@ -0,0 +1,88 @@
+# Prompt size and recall: fixed top-k context vs the token-budgeted context assembler.
+# Run from the backend folder: python -m benchmarks.bench_context --chunk-tokens 200 --overlap-tokens 40 --budget 800
+import argparse
+import json
+import os
+import re
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks._evaluation import ki_documents, ki_source_id, load_rows
+from benchmarks._stubs import HashingEmbeddings, StubChatModel, install_stubs
+
+
+def coverage(context, answer):
+    # Share of the ground-truth answer's distinct words that appear in the context.
+    answer_words = set(re.findall(r"\w+", answer.lower()))
+    context_words = set(re.findall(r"\w+", context.lower()))
+    return len(answer_words & context_words) / len(answer_words) if answer_words else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--baseline-k", type=int, default=6)
+    parser.add_argument("--fetch-k", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=800)
+    parser.add_argument("--score-margin", type=float, default=0.1)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--live", action="store_true", help="also time the configured LLM on both contexts (needs OPENAI_API_KEY)")
+    args = parser.parse_args()
+
+    embedder = HashingEmbeddings()
+    install_stubs(embedder, StubChatModel())
+    from app.context_utils import assemble_context
+    from app.embedding_utils import token_counter_for
+    from app.utils import build_context, build_llm_messages
+
+    count_tokens = token_counter_for("gpt-4o")
+    rows = load_rows()
+    documents = ki_documents(rows, args.chunk_tokens, args.overlap_tokens)
+
+    index = faiss.IndexFlatL2(embedder.dim)
+    index.add(np.array(embedder.embed_documents([d.page_content for d in documents]), dtype="float32"))
+
+    llm = None
+    if args.live:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+
+    totals = {"baseline": [], "assembled": []}
+    for row_id, row in enumerate(rows):
+        query = row["sample_question"]
+        distances, ids = index.search(np.array([embedder.embed_query(query)], dtype="float32"), args.fetch_k)
+        hits = [(documents[i], float(d)) for d, i in zip(distances[0], ids[0]) if i >= 0]
+        variants = {
+            "baseline": hits[:args.baseline_k],
+            "assembled": assemble_context(
+                hits, count_tokens, token_budget=args.budget,
+                score_margin=args.score_margin, lambda_mult=args.mmr_lambda,
+            ),
+        }
+        for name, results in variants.items():
+            context = build_context(results)
+            messages = build_llm_messages(query, context)
+            measurement = {
+                "prompt_tokens": sum(count_tokens(m["content"]) for m in messages),
+                "source_hit": any(doc.metadata["source_id"] == ki_source_id(row_id) for doc, _ in results),
+                "answer_coverage": coverage(context, row["sample_ground_truth"]),
+                "blocks": len(results),
+            }
+            if llm is not None:
+                t0 = time.perf_counter()
+                llm.invoke(messages)
+                measurement["llm_seconds"] = time.perf_counter() - t0
+            totals[name].append(measurement)
+
+    for name, measurements in totals.items():
+        summary = {"context": name}
+        for key in measurements[0]:
+            summary[f"mean_{key}"] = round(float(np.mean([m[key] for m in measurements])), 3)
+        print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Batched embedding throughput (chunks/s) against a local fake /v1/embeddings server.
+# Run from the backend folder: python -m benchmarks.bench_embedding --chunks 5000 --capacity 8
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from app.embedding_utils import BatchEmbedder
+
+
+def make_handler(latency, per_item_latency, capacity, dim):
+    in_flight = [0]
+    lock = threading.Lock()
+
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            with lock:
+                overloaded = in_flight[0] >= capacity
+                if not overloaded:
+                    in_flight[0] += 1
+            if overloaded:
+                payload = b'{"error": {"message": "rate limited", "type": "rate_limit"}}'
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Retry-After", "0.2")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            try:
+                inputs = body["input"]
+                time.sleep(latency + per_item_latency * len(inputs))
+                data = [
+                    {"object": "embedding", "index": i, "embedding": [float(len(text) % 7)] * dim}
+                    for i, text in enumerate(inputs)
+                ]
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+            payload = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeEmbeddingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=500, help="words per chunk")
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed seconds per request")
+    parser.add_argument("--per-item-latency", type=float, default=0.002)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests before the server answers 429")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 128, 512])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch-tokens", type=int, default=300000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, args.per_item_latency, args.capacity, dim=8))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(api_key="fake", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+    def embed_batch(texts):
+        response = client.embeddings.create(input=texts, model="fake")
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    texts = [" ".join(f"chunk{i}word{j}" for j in range(args.words)) for i in range(args.chunks)]
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            engine = BatchEmbedder(
+                embed_batch,
+                batch_size=batch_size,
+                max_batch_tokens=args.batch_tokens,
+                concurrency=concurrency,
+                max_retries=20,
+                max_backoff_seconds=2.0,
+            )
+            completed = []
+            timings = {}
+            vectors = engine.embed(texts, on_batch=lambda batch, _: completed.append(len(batch)), timings=timings)
+            print(json.dumps({
+                "batch_size": batch_size,
+                "concurrency": concurrency,
+                "batches": timings["batches"],
+                "seconds": round(timings["seconds"], 2),
+                "chunks_per_second": round(timings["chunks_per_second"], 1),
+                "rate_limited": timings["throttled"],
+                "final_concurrency": timings["final_concurrency"],
+                "complete": len(vectors) == len(texts) and sum(completed) == len(texts),
+            }))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
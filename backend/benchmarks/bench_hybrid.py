@@ -0,0 +1,74 @@
+# Recall, MRR and latency of vector, lexical (BM25) and hybrid (RRF) retrieval on the sample QA CSV.
+# Run from the backend folder: python -m benchmarks.bench_hybrid --embed-latency 0.3
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks._evaluation import ki_documents, ki_source_id, latency_ms, load_rows, score_rankings, source_ranking
+from benchmarks._stubs import HashingEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=12)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--embed-latency", type=float, default=0.3, help="simulated remote query embedding call, in seconds")
+    args = parser.parse_args()
+
+    from app.lexical_utils import BM25Index, reciprocal_rank_fusion
+
+    rows = load_rows()
+    documents = ki_documents(rows, args.chunk_tokens, args.overlap_tokens)
+    targets = [ki_source_id(row_id) for row_id in range(len(rows))]
+    texts = [d.page_content for d in documents]
+
+    embedder = HashingEmbeddings()
+    index = faiss.IndexFlatL2(embedder.dim)
+    index.add(np.array(embedder.embed_documents(texts), dtype="float32"))
+    t0 = time.perf_counter()
+    bm25 = BM25Index()
+    bm25.add(enumerate(texts))
+    lexical = bm25.view()
+    bm25_build_ms = (time.perf_counter() - t0) * 1000
+
+    def vector_rows(query):
+        time.sleep(args.embed_latency)
+        _, ids = index.search(np.array([embedder.embed_query(query)], dtype="float32"), args.fetch_k)
+        return [int(i) for i in ids[0] if i >= 0]
+
+    def lexical_rows(query):
+        return [row for row, _ in lexical.search(query, args.fetch_k)]
+
+    modes = {
+        "vector": vector_rows,
+        "lexical": lexical_rows,
+        "hybrid": lambda q: [row for row, _ in reciprocal_rank_fusion([vector_rows(q), lexical_rows(q)], k=args.rrf_k)],
+    }
+    # Full questions, and the KI titles as stand-ins for exact label / menu-name queries.
+    query_sets = {"questions": "sample_question", "titles": "ki_topic"}
+
+    for set_name, column in query_sets.items():
+        for mode, retrieve in modes.items():
+            latencies, rankings = [], []
+            for row in rows:
+                t0 = time.perf_counter()
+                ranked = retrieve(row[column])
+                latencies.append(time.perf_counter() - t0)
+                rankings.append(source_ranking(documents[i] for i in ranked))
+            print(json.dumps({
+                "queries": set_name,
+                "mode": mode,
+                **score_rankings(rankings, targets, [args.k]),
+                **latency_ms(latencies, percentiles=(50, 95)),
+            }))
+    print(json.dumps({"chunks": len(documents), "bm25_terms": len(bm25.postings), "bm25_build_ms": round(bm25_build_ms, 2)}))
+
+
+if __name__ == "__main__":
+    main()
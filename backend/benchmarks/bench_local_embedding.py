@@ -0,0 +1,120 @@
+# Query embedding latency/throughput and retrieval recall: fp32 HuggingFace vs ONNX fp32 vs ONNX int8 on CPU.
+# Run from the backend folder: python -m benchmarks.bench_local_embedding --threads 1 4 --output local_embedding.json
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks._evaluation import latency_ms, load_rows
+from benchmarks._stubs import StubChatModel, StubEmbeddings, install_stubs
+
+
+def load_dataset(create_chunks_from_text):
+    rows = load_rows()
+    chunks, sources = [], []
+    for row_id, row in enumerate(rows):
+        for chunk in create_chunks_from_text(row["ki_text"], max_tokens=160, overlap_tokens=25):
+            chunks.append(chunk)
+            sources.append(row_id)
+    questions = [row["sample_question"] for row in rows]
+    return chunks, np.array(sources), questions
+
+
+def make_backend(name, model_name, model_dir, threads):
+    if name == "hf-fp32":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        torch.set_num_threads(threads or os.cpu_count())
+        return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"normalize_embeddings": True})
+    from app.local_embedding_utils import OnnxEmbeddings, export_onnx_model
+    path = export_onnx_model(model_name, model_dir, quantize=name == "onnx-int8")
+    return OnnxEmbeddings(path, threads=threads)
+
+
+def measure_latency(embeddings, questions, runs):
+    embeddings.embed_query(questions[0])
+    samples = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        embeddings.embed_query(questions[i % len(questions)])
+        samples.append(time.perf_counter() - t0)
+    return latency_ms(samples, percentiles=(50, 95))
+
+
+def measure_concurrent(embed_query, questions, requests, clients):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(embed_query, (questions[i % len(questions)] for i in range(requests))))
+    return round(requests / (time.perf_counter() - t0), 1)
+
+
+def retrieval(doc_vectors, query_vectors, sources, k):
+    scores = query_vectors @ doc_vectors.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    hits = [row_id in sources[top[row_id]] for row_id in range(len(query_vectors))]
+    return top, sum(hits) / len(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="sentence-transformers/all-mpnet-base-v2")
+    parser.add_argument("--model-dir", default="models/all-mpnet-base-v2-onnx")
+    parser.add_argument("--backends", nargs="+", default=["hf-fp32", "onnx-fp32", "onnx-int8"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 0], help="0 = all cores")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--microbatch-size", type=int, default=32)
+    parser.add_argument("--microbatch-wait-ms", type=float, default=2.0)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    install_stubs(StubEmbeddings(), StubChatModel())
+    from app.local_embedding_utils import MicroBatchedEmbeddings
+    from app.utils import create_chunks_from_text
+
+    chunks, sources, questions = load_dataset(create_chunks_from_text)
+    rows = []
+    reference = None
+    for name in args.backends:
+        for threads in args.threads:
+            embeddings = make_backend(name, args.model, args.model_dir, threads)
+            t0 = time.perf_counter()
+            doc_vectors = np.array(embeddings.embed_documents(chunks), dtype="float32")
+            doc_seconds = time.perf_counter() - t0
+            query_vectors = np.array([embeddings.embed_query(q) for q in questions], dtype="float32")
+            top, recall = retrieval(doc_vectors, query_vectors, sources, args.k)
+
+            batched = MicroBatchedEmbeddings(embeddings, max_batch_size=args.microbatch_size, max_wait_ms=args.microbatch_wait_ms)
+            row = {
+                "backend": name,
+                "threads": threads,
+                "query_latency": measure_latency(embeddings, questions, args.runs),
+                "concurrent_qps": measure_concurrent(embeddings.embed_query, questions, args.requests, args.clients),
+                "concurrent_qps_microbatched": measure_concurrent(batched.embed_query, questions, args.requests, args.clients),
+                "microbatch": batched.batcher.stats(),
+                "documents_per_second": round(len(chunks) / doc_seconds, 1),
+                f"recall@{args.k}": round(recall, 3),
+            }
+            if reference is None:
+                reference = (name, doc_vectors, top)
+            else:
+                # Agreement with the first backend (fp32 HuggingFace by default).
+                row[f"top{args.k}_overlap_vs_{reference[0]}"] = round(
+                    float(np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top, reference[2])])), 3
+                )
+                row[f"mean_cosine_vs_{reference[0]}"] = round(float(np.mean(np.sum(doc_vectors * reference[1], axis=1))), 4)
+            print(json.dumps(row))
+            rows.append(row)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(chunks), "questions": len(questions), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
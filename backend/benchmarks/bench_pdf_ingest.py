@@ -0,0 +1,61 @@
+# Sequential (convert, then chunk + embed) vs pipelined page-parallel PDF ingestion.
+# Run from the backend folder: python -m benchmarks.bench_pdf_ingest --workers 1 2 4 8 --embed-latency 0.5
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks._stubs import StubChatModel, StubEmbeddings, install_stubs
+
+DEFAULT_PDF = Path(__file__).resolve().parents[2] / "dataset" / "BoardPAC_User Manual_Actionee_V4.2.10000.pdf"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--embed-latency", type=float, default=0.5, help="seconds per stub embedding batch")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    install_stubs(StubEmbeddings(latency=args.embed_latency), StubChatModel(), EMBED_BATCH_SIZE=args.batch_size)
+    from app import ingest_utils
+    from app.pdf_utils import iter_pdf_pages
+    from app.utils import embed_documents_cached, iter_document_chunks
+
+    t0 = time.perf_counter()
+    pages = list(iter_pdf_pages(args.pdf, workers=1, pages_per_task=args.pages_per_task))
+    convert_seconds = time.perf_counter() - t0
+    chunks = [chunk.page_content for chunk in iter_document_chunks(ingest_utils._page_pieces(pages))]
+    t0 = time.perf_counter()
+    embed_documents_cached(chunks)
+    embed_seconds = time.perf_counter() - t0
+    print(json.dumps({
+        "mode": "sequential",
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "convert_seconds": round(convert_seconds, 2),
+        "embed_seconds": round(embed_seconds, 2),
+        "total_seconds": round(convert_seconds + embed_seconds, 2),
+    }))
+
+    ingest_utils.EMBED_BATCH_SIZE = args.batch_size
+    ingest_utils.PDF_PAGES_PER_TASK = args.pages_per_task
+    for workers in args.workers:
+        ingest_utils.PDF_WORKERS = workers
+        info = {}
+        result = json.loads(ingest_utils._convert_and_embed_pages(args.pdf, info))
+        print(json.dumps({
+            "mode": "pipelined",
+            "workers": workers,
+            "pages": len(result),
+            "in_order": [page for page, _ in result] == [page for page, _ in pages],
+            "embed_seconds": round(info["embed_seconds"], 2),
+            "total_seconds": round(info["wall_seconds"], 2),
+            "max_stage_seconds": round(max(convert_seconds / workers, embed_seconds), 2),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Recall, prompt size and per-stage latency with and without cross-encoder re-ranking (fp32 vs int8 ONNX).
+# Run from the backend folder: python -m benchmarks.bench_rerank --fetch-k 30 --top-n 3 --threads 4
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks._evaluation import ki_documents, ki_source_id, latency_ms, load_rows, score_rankings, source_ranking
+from benchmarks._stubs import HashingEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--model-dir", default="models/ms-marco-MiniLM-L-6-v2-onnx")
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--baseline-k", type=int, default=6, help="raw hits sent to the LLM without re-ranking")
+    parser.add_argument("--fetch-k", type=int, default=30)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--threads", type=int, default=0, help="0 = all cores")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    from app.embedding_utils import token_counter_for
+    from app.local_embedding_utils import export_onnx_model
+    from app.rerank_utils import OnnxCrossEncoder, rerank
+
+    count_tokens = token_counter_for("gpt-4o")
+    rows = load_rows()
+    documents = ki_documents(rows, args.chunk_tokens, args.overlap_tokens)
+    targets = [ki_source_id(row_id) for row_id in range(len(rows))]
+
+    embedder = HashingEmbeddings()
+    index = faiss.IndexFlatL2(embedder.dim)
+    index.add(np.array(embedder.embed_documents([d.page_content for d in documents]), dtype="float32"))
+
+    candidates, retrieve_seconds = [], []
+    for row in rows:
+        t0 = time.perf_counter()
+        distances, ids = index.search(np.array([embedder.embed_query(row["sample_question"])], dtype="float32"), args.fetch_k)
+        retrieve_seconds.append(time.perf_counter() - t0)
+        candidates.append([(documents[i], float(d)) for d, i in zip(distances[0], ids[0]) if i >= 0])
+
+    def evaluate(name, ranked_lists, stage_seconds, extra=None):
+        rankings = [source_ranking(doc for doc, _ in ranked) for ranked in ranked_lists]
+        prompt_tokens = [count_tokens("\n\n".join(doc.page_content for doc, _ in ranked)) for ranked in ranked_lists]
+        chunks_sent = len(ranked_lists[0]) if ranked_lists else 0
+        metrics = score_rankings(rankings, targets, [1, max(chunks_sent, 1)])
+        row = {
+            "pipeline": name,
+            "chunks_sent": chunks_sent,
+            "recall@1": metrics["recall@1"],
+            "recall@sent": metrics[f"recall@{max(chunks_sent, 1)}"],
+            "mrr": metrics["mrr"],
+            "mean_context_tokens": round(float(np.mean(prompt_tokens)), 1),
+            **latency_ms(retrieve_seconds, percentiles=(50,), prefix="retrieve_"),
+        }
+        for stage, seconds in stage_seconds.items():
+            row.update(latency_ms(seconds, percentiles=(50, 95), prefix=f"{stage}_"))
+        row.update(extra or {})
+        print(json.dumps(row))
+        return row
+
+    results = [evaluate(f"faiss_top{args.baseline_k}", [c[:args.baseline_k] for c in candidates], {})]
+    for quantize in (False, True):
+        model_path = export_onnx_model(args.model, args.model_dir, quantize=quantize, sequence_classification=True)
+        for batch_size in args.batch_sizes:
+            scorer = OnnxCrossEncoder(model_path, threads=args.threads, batch_size=batch_size)
+            scorer.score("warm up", ["the first forward pass sets up kernels"])
+            reranked, rerank_seconds = [], []
+            for row, hits in zip(rows, candidates):
+                t0 = time.perf_counter()
+                reranked.append(rerank(row["sample_question"], hits, scorer, top_n=args.top_n))
+                rerank_seconds.append(time.perf_counter() - t0)
+            name = f"rerank_{'int8' if quantize else 'fp32'}_top{args.top_n}_of_{args.fetch_k}_batch{batch_size}"
+            pairs_per_second = round(sum(len(c) for c in candidates) / sum(rerank_seconds), 1)
+            results.append(evaluate(name, reranked, {"rerank": rerank_seconds}, {"pairs_per_second": pairs_per_second}))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(documents), "questions": len(rows), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# Offline retrieval quality and latency suite over the sample QA KIs plus the BoardPAC manual.
+# Run from the backend folder:
+#   python -m benchmarks.bench_retrieval --chunk-tokens 200 400 --index-types flat hnsw ivf_flat ivf_pq
+#   python -m benchmarks.bench_retrieval --compare benchmark_results/retrieval_previous.json
+import argparse
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from benchmarks._evaluation import ki_documents, ki_source_id, latency_ms, load_rows, score_rankings, source_ranking
+from benchmarks._stubs import HashingEmbeddings, StubChatModel, install_stubs
+
+ROOT = Path(__file__).resolve().parents[2]
+MANUAL_PDF = ROOT / "dataset" / "BoardPAC_User Manual_Actionee_V4.2.10000.pdf"
+RESULTS_DIR = Path("benchmark_results")
+# Result rows are matched on these fields when comparing two runs.
+KEY_FIELDS = ("embedder", "chunk_tokens", "index_type", "mode", "queries")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_manual_pages(cache_path, workers):
+    # The committed .md export of the manual is empty, so the PDF is converted once and cached.
+    if cache_path.exists():
+        with open(cache_path, encoding="utf-8") as f:
+            return [tuple(page) for page in json.load(f)]
+    from app.pdf_utils import iter_pdf_pages
+    t0 = time.perf_counter()
+    pages = list(iter_pdf_pages(MANUAL_PDF, workers=workers))
+    print(f"Converted {len(pages)} manual pages in {time.perf_counter() - t0:.1f}s")
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    return pages
+
+
+def make_embedder(name, args):
+    # hashing-<dim>: deterministic hashed bag-of-words; onnx: the local int8 model (no network once exported).
+    if name.startswith("hashing"):
+        _, _, dim = name.partition("-")
+        return HashingEmbeddings(dim=int(dim or 512))
+    if name == "onnx":
+        from app.local_embedding_utils import OnnxEmbeddings, export_onnx_model
+        return OnnxEmbeddings(export_onnx_model(args.onnx_model, args.onnx_model_dir, quantize=True), threads=args.threads)
+    raise ValueError(f"Unknown embedder '{name}', expected hashing-<dim> or onnx")
+
+
+def build_corpus(rows, manual_pages, chunk_tokens, overlap_tokens):
+    from app.chunk_utils import iter_chunks
+    from app.ingest_utils import _page_pieces
+    documents = ki_documents(rows, chunk_tokens, overlap_tokens)
+    # Manual chunks have no questions of their own; they are the distractors a real index holds.
+    documents += iter_chunks(_page_pieces(manual_pages), source_id="manual", max_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    return documents
+
+
+def index_params(dim, args):
+    # PQ sub-vectors must divide dim.
+    pq_m = next(m for m in (args.pq_m, 16, 8, 4, 2, 1) if dim % m == 0)
+    return {"nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": pq_m}
+
+
+def pad_with_distractors(vectors, total, noise, seed=0):
+    """Append perturbed copies of random corpus vectors until there are `total` rows.
+
+    The KIs and the manual are too few chunks to train --nlist IVF lists, let alone the 256
+    centroids of each PQ sub-quantizer. Padding the corpus (for every index type, so they
+    stay comparable) lets each one run at its configured size. The copies follow the
+    corpus distribution, so training is realistic, but belong to no question's source.
+    """
+    if total <= len(vectors):
+        return vectors
+    rng = np.random.default_rng(seed)
+    copies = vectors[rng.integers(len(vectors), size=total - len(vectors))]
+    copies = copies + rng.normal(scale=noise / np.sqrt(vectors.shape[1]), size=copies.shape).astype("float32")
+    copies /= np.linalg.norm(copies, axis=1, keepdims=True)
+    return np.vstack([vectors, copies])
+
+
+def measure(retrieve, queries, targets, documents, ks, repeats):
+    rankings, samples = [], []
+    for repeat in range(repeats):
+        for query in queries:
+            t0 = time.perf_counter()
+            rows = retrieve(query)
+            samples.append(time.perf_counter() - t0)
+            if repeat == 0:
+                rankings.append(source_ranking(documents[row] for row in rows))
+    return {**score_rankings(rankings, targets, ks), **latency_ms(samples)}
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    before = {tuple(r[key] for key in KEY_FIELDS): r for r in previous["results"]}
+    print(f"\nChanges since {previous.get('commit')} ({previous_path}):")
+    for row in current["results"]:
+        old = before.get(tuple(row[key] for key in KEY_FIELDS))
+        if old is None:
+            continue
+        deltas = {
+            name: round(row[name] - old[name], 4)
+            for name in row
+            if (name.startswith("recall@") or name in ("mrr", "p95_ms")) and name in old
+        }
+        label = " ".join(str(row[key]) for key in KEY_FIELDS)
+        print(f"{label:<48} " + " ".join(f"{name} {delta:+}" for name, delta in deltas.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embedders", nargs="+", default=["hashing-256", "hashing-768"], help="hashing-<dim> and/or onnx")
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw", "ivf_flat", "ivf_pq"])
+    parser.add_argument("--modes", nargs="+", default=["vector", "lexical", "hybrid"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--nlist", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--distractor-noise", type=float, default=1.0,
+                        help="norm of the noise added to the synthetic distractors that pad the corpus for IVF training")
+    parser.add_argument("--repeats", type=int, default=20, help="passes over the queries for the latency percentiles")
+    parser.add_argument("--no-manual", action="store_true", help="index the KIs only")
+    parser.add_argument("--pdf-workers", type=int, default=4)
+    parser.add_argument("--onnx-model", default="sentence-transformers/all-mpnet-base-v2")
+    parser.add_argument("--onnx-model-dir", default="models/all-mpnet-base-v2-onnx")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "retrieval.json"))
+    parser.add_argument("--compare", default="", help="earlier --output file to diff against")
+    args = parser.parse_args()
+
+    install_stubs(HashingEmbeddings(), StubChatModel())
+    from app.index_utils import apply_search_params, build_index_from_vectors, min_training_vectors
+    from app.lexical_utils import BM25Index, reciprocal_rank_fusion
+
+    rows = load_rows()
+    manual_pages = [] if args.no_manual else load_manual_pages(RESULTS_DIR / "boardpac_manual_pages.json", args.pdf_workers)
+    query_sets = {"questions": [r["sample_question"] for r in rows], "titles": [r["ki_topic"] for r in rows]}
+    targets = [ki_source_id(row_id) for row_id in range(len(rows))]
+    fetch_k = max(args.fetch_k, max(args.k))
+
+    results, corpora = [], {}
+    for chunk_tokens in args.chunk_tokens:
+        documents = build_corpus(rows, manual_pages, chunk_tokens, args.overlap_tokens)
+        texts = [d.page_content for d in documents]
+        corpora[chunk_tokens] = len(documents)
+        t0 = time.perf_counter()
+        bm25 = BM25Index()
+        bm25.add(enumerate(texts))
+        lexical = bm25.view()
+        bm25_seconds = time.perf_counter() - t0
+
+        def lexical_rows(query):
+            return [row for row, _ in lexical.search(query, fetch_k)]
+
+        if "lexical" in args.modes:
+            for set_name, queries in query_sets.items():
+                row = {"embedder": None, "chunk_tokens": chunk_tokens, "index_type": "bm25", "mode": "lexical", "queries": set_name,
+                       "chunks": len(documents), "embed_seconds": 0.0, "build_seconds": round(bm25_seconds, 3)}
+                row.update(measure(lexical_rows, queries, targets, documents, args.k, args.repeats))
+                print(json.dumps(row))
+                results.append(row)
+
+        for embedder_name in args.embedders:
+            embedder = make_embedder(embedder_name, args)
+            t0 = time.perf_counter()
+            vectors = np.array(embedder.embed_documents(texts), dtype="float32")
+            embed_seconds = time.perf_counter() - t0
+            needed = max(min_training_vectors(index_type, args.nlist) for index_type in args.index_types)
+            vectors = pad_with_distractors(vectors, needed, args.distractor_noise)
+            distractors = len(vectors) - len(documents)
+
+            for index_type in args.index_types:
+                params = index_params(vectors.shape[1], args)
+                t0 = time.perf_counter()
+                index = build_index_from_vectors(vectors, index_type, **params)
+                build_seconds = time.perf_counter() - t0
+                apply_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+
+                def vector_rows(query):
+                    _, ids = index.search(np.array([embedder.embed_query(query)], dtype="float32"), fetch_k)
+                    # Distractor rows come after the documents and answer no question.
+                    return [int(i) for i in ids[0] if 0 <= i < len(documents)]
+
+                def hybrid_rows(query):
+                    fused = reciprocal_rank_fusion([vector_rows(query), lexical_rows(query)], k=args.rrf_k)
+                    return [row for row, _ in fused[:fetch_k]]
+
+                retrievers = {"vector": vector_rows, "hybrid": hybrid_rows}
+                for mode in (m for m in args.modes if m in retrievers):
+                    for set_name, queries in query_sets.items():
+                        row = {"embedder": embedder_name, "chunk_tokens": chunk_tokens, "index_type": index_type, "mode": mode,
+                               "queries": set_name, "chunks": len(documents), "distractors": distractors, **params,
+                               "embed_seconds": round(embed_seconds, 3), "build_seconds": round(build_seconds, 3)}
+                        row.update(measure(retrievers[mode], queries, targets, documents, args.k, args.repeats))
+                        print(json.dumps(row))
+                        results.append(row)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "faiss": getattr(faiss, "__version__", None),
+        "settings": vars(args),
+        "corpus": {"kis": len(rows), "manual_pages": len(manual_pages), "chunks_by_chunk_tokens": corpora},
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
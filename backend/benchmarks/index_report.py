@@ -0,0 +1,79 @@
+# Recall@k versus query latency for each FAISS index type on synthetic clustered vectors.
+# Run from the backend folder: python -m benchmarks.index_report --n 200000 --dim 1536
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.index_utils import apply_search_params, build_index_from_vectors
+
+
+def make_vectors(n, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.n, args.dim, clusters=args.nlist, seed=0)
+    queries = make_vectors(args.queries, args.dim, clusters=args.nlist, seed=1)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    settings = [("flat", {})]
+    settings += [("hnsw", {"ef_search": ef}) for ef in args.ef_search]
+    settings += [("ivf_flat", {"nprobe": p}) for p in args.nprobe]
+    settings += [("ivf_pq", {"nprobe": p}) for p in args.nprobe]
+
+    built = {}
+    rows = []
+    for index_type, params in settings:
+        if index_type not in built:
+            t0 = time.perf_counter()
+            built[index_type] = build_index_from_vectors(
+                vectors, index_type, nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=args.pq_m
+            )
+            build_seconds = time.perf_counter() - t0
+        index = built[index_type]
+        apply_search_params(index, **params)
+        t0 = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        per_query_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        rows.append({
+            "index_type": index_type,
+            **params,
+            f"recall@{args.k}": round(recall_at_k(found, truth, args.k), 4),
+            "ms_per_query": round(per_query_ms, 3),
+            "build_seconds": round(build_seconds, 2),
+        })
+        print(json.dumps(rows[-1]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"n": args.n, "dim": args.dim, "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
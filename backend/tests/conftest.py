@@ -0,0 +1,49 @@
+# The tests run against the real app.config, configured through the environment
+# before any app module is imported: no OpenAI key, no SQL server, no disk caches.
+import os
+import tempfile
+
+WORK_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "OPENAI_API_KEY": "test",
+    "EMBEDDING_DIM": "512",
+    "EMBEDDING_CACHE_SIZE": "0",
+    "EMBEDDING_CACHE_PATH": "",
+    "CHUNK_EMBEDDING_CACHE_PATH": "",
+    "ANSWER_CACHE_SIZE": "0",
+    "STARTUP_WARMUP": "",
+    "VECTOR_STORE_DIR": os.path.join(WORK_DIR, "vector_store"),
+    "INGEST_JOBS_DIR": os.path.join(WORK_DIR, "ingest_jobs"),
+    "BLOB_STORE_DIR": os.path.join(WORK_DIR, "blob_store"),
+})
+
+import pytest
+
+from app.config import components
+from app.embedding_utils import BatchEmbedder
+from benchmarks._stubs import HashingEmbeddings
+
+EMBEDDINGS = HashingEmbeddings(dim=512)
+components.override("embeddings", EMBEDDINGS)
+components.override("embedding_engine", BatchEmbedder(EMBEDDINGS.embed_documents))
+
+KNOWLEDGE_BASE = {
+    "meetings": "To join a meeting, open the Meetings tab and tap the meeting title. "
+                "The agenda and the board papers of the meeting open in the viewer.",
+    "annotations": "Annotations are private notes on a board paper. Select text in the viewer "
+                   "and choose Highlight or Note to annotate the paper.",
+    "password": "To reset your password, tap Forgot Password on the login screen and follow "
+                "the link sent to your registered email address.",
+}
+
+
+@pytest.fixture(scope="session")
+def knowledge_base():
+    """Indexes KNOWLEDGE_BASE once per session; chunk source_ids are the dict keys."""
+    from app.utils import chunk_ids, iter_document_chunks, upload_documents_to_vector_store
+
+    documents = []
+    for source_id, text in KNOWLEDGE_BASE.items():
+        documents += iter_document_chunks([text], source_id=source_id)
+    upload_documents_to_vector_store(documents, chunk_ids(documents))
+    return documents
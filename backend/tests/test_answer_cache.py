@@ -0,0 +1,24 @@
+from app.cache_utils import SemanticAnswerCache
+
+
+def test_answers_are_only_shared_within_a_namespace():
+    cache = SemanticAnswerCache(threshold=0.98, max_size=10)
+    _, version = cache.lookup([1.0, 0.0], "hybrid")
+    cache.store([1.0, 0.0], "hybrid answer", version, "hybrid")
+
+    assert cache.lookup([1.0, 0.01], "hybrid")[0] == "hybrid answer"
+    assert cache.lookup([1.0, 0.0], "vector")[0] is None
+    # cos = 0.96: close enough for the old 0.95 threshold, not for a paraphrase hit.
+    assert cache.lookup([1.0, 0.29], "hybrid")[0] is None
+
+
+def test_oldest_entry_is_evicted_across_namespaces():
+    cache = SemanticAnswerCache(max_size=2)
+    cache.store([1.0, 0.0], "first", 0, "vector")
+    cache.store([0.0, 1.0], "second", 0, "hybrid")
+    cache.store([1.0, 1.0], "third", 0, "hybrid")
+
+    assert cache.lookup([1.0, 0.0], "vector")[0] is None
+    assert cache.lookup([0.0, 1.0], "hybrid")[0] == "second"
+    assert cache.lookup([1.0, 1.0], "hybrid")[0] == "third"
+    assert cache.stats()["size"] == 2
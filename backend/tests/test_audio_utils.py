@@ -0,0 +1,81 @@
+import pytest
+
+from app.audio_utils import map_to_source_time, plan_speech_segments
+
+
+@pytest.mark.parametrize("duration, silences, expected_keep", [
+    # No silence, or only pauses shorter than drop_silence_seconds: everything is kept.
+    (10.0, [], [(0.0, 10.0)]),
+    (10.0, [(4.0, 5.5)], [(0.0, 10.0)]),
+    # A long silence is dropped except for the padding on both sides.
+    (20.0, [(3.0, 8.0)], [(0.0, 3.25), (7.75, 20.0)]),
+    # Adjacent silences are one pause: no sliver of silence is kept between them.
+    (12.0, [(2.0, 5.0), (5.0, 9.0)], [(0.0, 2.25), (8.75, 12.0)]),
+    (12.0, [(2.0, 5.0), (4.5, 9.0)], [(0.0, 2.25), (8.75, 12.0)]),
+    # Speech between two long silences keeps its padding on both sides.
+    (12.0, [(2.0, 5.0), (5.3, 9.0)], [(0.0, 2.25), (4.75, 5.55), (8.75, 12.0)]),
+    # Silence at the very start or end: the padding is cut off at the edge of the file.
+    (12.0, [(0.0, 3.0), (9.0, 12.0)], [(0.0, 0.25), (2.75, 9.25)]),
+])
+def test_keep_intervals(duration, silences, expected_keep):
+    keep, _, offset_map = plan_speech_segments(duration, silences, max_segment_seconds=600)
+
+    assert keep == pytest.approx(expected_keep)
+    # The offset map lays the kept intervals end to end on the trimmed timeline.
+    trimmed = 0.0
+    for (trimmed_start, source_start, length), (start, end) in zip(offset_map, keep):
+        assert (trimmed_start, source_start, length) == pytest.approx((trimmed, start, end - start))
+        trimmed += length
+
+
+@pytest.mark.parametrize("padding, expected_keep", [
+    # Padding wider than the segment edge it meets: intervals still never overlap.
+    (1.0, [(0.0, 3.0), (4.0, 6.5), (8.0, 12.0)]),
+    # Padding that covers a whole silence leaves nothing to drop there.
+    (1.6, [(0.0, 7.1), (7.4, 12.0)]),
+])
+def test_padding_that_reaches_past_a_segment_edge(padding, expected_keep):
+    keep, _, _ = plan_speech_segments(12.0, [(2.0, 5.0), (5.5, 9.0)], 600, drop_silence_seconds=2.0, padding_seconds=padding)
+
+    assert keep == pytest.approx(expected_keep)
+    assert all(a[1] <= b[0] for a, b in zip(keep, keep[1:]))
+
+
+@pytest.mark.parametrize("duration, silences, max_segment, expected_cuts", [
+    # No pause at all: hard cuts at the limit.
+    (30.0, [], 10.0, [10.0, 20.0]),
+    # The latest pause midpoint below the limit wins over earlier ones; past the last
+    # pause the cut is hard again.
+    (30.0, [(3.0, 3.5), (8.0, 9.0), (14.0, 15.0)], 10.0, [8.5, 14.5, 24.5]),
+    # A dropped silence's boundary on the trimmed timeline is a cut candidate.
+    (20.0, [(6.0, 11.0)], 10.0, [6.25]),
+])
+def test_cuts_fall_in_pauses(duration, silences, max_segment, expected_cuts):
+    _, cuts, _ = plan_speech_segments(duration, silences, max_segment)
+
+    assert cuts == pytest.approx(expected_cuts)
+
+
+# Silence (3, 8) dropped from 20s of audio: trimmed [0, 3.25) is source [0, 3.25),
+# trimmed [3.25, 15.5] is source [7.75, 20].
+OFFSET_MAP = plan_speech_segments(20.0, [(3.0, 8.0)], 600)[2]
+
+
+@pytest.mark.parametrize("trimmed_time, source_time", [
+    (0.0, 0.0),
+    (2.0, 2.0),
+    (3.0, 3.0),
+    # Exactly on the cut: the start of the next kept interval, not the end of the dropped silence.
+    (3.25, 7.75),
+    (4.25, 8.75),
+    (15.5, 20.0),
+    # Past the end of the trimmed audio: clamped to the end of the last interval.
+    (16.0, 20.0),
+])
+def test_map_to_source_time(trimmed_time, source_time):
+    assert map_to_source_time(trimmed_time, OFFSET_MAP) == pytest.approx(source_time)
+
+
+def test_map_to_source_time_without_trimming_is_identity():
+    assert map_to_source_time(5.0, []) == 5.0
+    assert map_to_source_time(5.0, plan_speech_segments(10.0, [], 600)[2]) == 5.0
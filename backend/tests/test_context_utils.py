@@ -0,0 +1,72 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.chunk_utils import iter_chunks
+from app.context_utils import merge_chunks
+
+
+def chunk(text, start, source_id):
+    metadata = {"start": start, "end": start + len(text)}
+    if source_id is not None:
+        metadata["source_id"] = source_id
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_overlapping_chunks_of_one_source_merge():
+    blocks = merge_chunks([(chunk("Open the agenda.", 0, "a"), 0.9), (chunk("agenda. Then vote.", 9, "a"), 0.8)])
+    assert [doc.page_content for doc, _ in blocks] == ["Open the agenda. Then vote."]
+
+
+def test_chunks_without_a_source_id_never_merge():
+    # Same offsets, but nothing says the two chunks come from the same document.
+    blocks = merge_chunks([(chunk("Open the agenda.", 0, None), 0.9), (chunk("agenda. Then vote.", 9, None), 0.8)])
+    assert len(blocks) == 2
+
+
+def paged_input(pages, piece_chars):
+    """(page, text) pieces joined like ingest_utils._page_pieces, cut into `piece_chars` slices
+    that break mid-word; returns the pieces, the full text and each page's start offset."""
+    pieces, text, page_starts = [], "", []
+    for page_number, page_text in pages:
+        page_text = page_text if not text else "\n\n" + page_text
+        page_starts.append((len(text), page_number))
+        for i in range(0, len(page_text), piece_chars):
+            pieces.append((page_number, page_text[i:i + piece_chars]))
+        text += page_text
+    return pieces, text, page_starts
+
+
+def page_at(page_starts, offset):
+    return [page for start, page in page_starts if start <= offset][-1]
+
+
+def sentences(topic, n):
+    return " ".join(f"The {topic} item {i} is reviewed by the board before the meeting closes." for i in range(n))
+
+
+@pytest.mark.parametrize("piece_chars", [17, 64, 10 ** 6])
+def test_chunk_offsets_index_the_input_across_pieces_and_pages(piece_chars):
+    pages = [
+        (1, f"# Meetings\n\n{sentences('agenda', 6)}\n\n{sentences('minutes', 5)}"),
+        (2, sentences("voting", 9)),  # a paragraph that continues the section on the next page
+        (3, f"## Annotations\n\n{sentences('note', 4)}\n\n\n{sentences('highlight', 7)}"),
+    ]
+    pieces, text, page_starts = paged_input(pages, piece_chars)
+
+    chunks = list(iter_chunks(pieces, source_id="manual", max_tokens=60, overlap_tokens=20))
+
+    assert len(chunks) > 5
+    for chunk in chunks:
+        start, end = chunk.metadata["start"], chunk.metadata["end"]
+        assert text[start:end] == chunk.page_content
+        assert chunk.metadata["page"] == page_at(page_starts, start)
+        assert chunk.metadata.get("page_end", chunk.metadata["page"]) == page_at(page_starts, end - 1)
+    # Overlap: some consecutive chunks share text, and their offsets say so.
+    overlapping = [(a, b) for a, b in zip(chunks, chunks[1:]) if b.metadata["start"] < a.metadata["end"]]
+    assert overlapping
+    for a, b in overlapping:
+        shared = text[b.metadata["start"]:a.metadata["end"]]
+        assert a.page_content.endswith(shared) and b.page_content.startswith(shared)
+    # The same chunks come out however the input was cut into pieces.
+    whole, _, _ = paged_input(pages, 10 ** 6)
+    assert [c.metadata for c in chunks] == [c.metadata for c in iter_chunks(whole, source_id="manual", max_tokens=60, overlap_tokens=20)]
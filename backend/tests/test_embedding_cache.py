@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+
+from app.cache_utils import EmbeddingCache
+
+
+def disk_keys(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0].split("\x00")[1] for row in conn.execute("SELECT key FROM embeddings")}
+
+
+def test_purge_drops_expired_then_least_recently_used_rows(tmp_path, monkeypatch):
+    path = tmp_path / "embeddings.sqlite"
+    clock = [1000.0]
+    monkeypatch.setattr("app.cache_utils.time.time", lambda: clock[0])
+    cache = EmbeddingCache("model", max_size=0, ttl_seconds=100, disk_path=str(path), disk_max_rows=2)
+    cache.set("old", [0.0])
+    clock[0] = 1050.0
+    cache.set_many(["a", "b"], [[1.0], [2.0]])
+    clock[0] = 1055.0
+    cache.set("c", [3.0])
+    clock[0] = 1060.0
+    assert cache.get("a") == [1.0]  # "a" is now the most recently used row
+
+    clock[0] = 1120.0
+    assert cache.purge() == 2
+    assert disk_keys(path) == {"a", "c"}
+
+
+def test_writes_purge_periodically(tmp_path, monkeypatch):
+    path = tmp_path / "embeddings.sqlite"
+    clock = [1000.0]
+    monkeypatch.setattr("app.cache_utils.time.time", lambda: clock[0])
+    cache = EmbeddingCache("model", max_size=0, ttl_seconds=None, disk_path=str(path), disk_max_rows=1, purge_interval=60)
+    cache.set("a", [1.0])
+    clock[0] = 1010.0
+    cache.set("b", [2.0])
+    assert disk_keys(path) == {"a", "b"}
+
+    clock[0] = 1061.0
+    cache.set("c", [3.0])
+    assert disk_keys(path) == {"c"}
+
+
+def test_async_lookups_read_the_disk_tier_and_old_files_are_migrated(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)")
+    writer = EmbeddingCache("model", max_size=0, ttl_seconds=None, disk_path=str(path))
+    asyncio.run(writer.aset("How do I vote?", [0.5, 0.25]))
+
+    reader = EmbeddingCache("model", max_size=4, ttl_seconds=None, disk_path=str(path))
+    assert asyncio.run(reader.aget("how do i vote")) == [0.5, 0.25]
+    assert asyncio.run(reader.aget("unknown")) is None
+    assert (reader.hits, reader.misses) == (1, 1)
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import re
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from app import routes
+from app.blob_utils import BlobStore
+from app.main import app
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes, every offset distinguishable
+SIZE = len(CONTENT)
+
+
+async def get(path, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path, headers=headers or {})
+
+
+@pytest.fixture
+def stored_file(tmp_path, monkeypatch):
+    """A document whose row points into a tmp BlobStore with a small chunk size, so reads span chunks."""
+    store = BlobStore(tmp_path / "blobs", chunk_size=100)
+    ref, _ = store.put_stream(io.BytesIO(CONTENT))
+    row = SimpleNamespace(FileName="minutes.pdf", ContentType="application/pdf", ContentRef=ref, LegacySize=None)
+    monkeypatch.setattr(routes, "blob_store", store)
+    monkeypatch.setattr(routes, "_get_stored_file", lambda table, file_id: row)
+    return SimpleNamespace(path=f"/api/documents/{uuid4()}/view", etag=f'"{ref}"')
+
+
+def multipart_parts(response):
+    boundary = re.search(r"boundary=(\w+)", response.headers["content-type"]).group(1)
+    parts = []
+    for block in response.content.split(f"--{boundary}".encode())[1:-1]:
+        head, _, body = block.strip(b"\r\n").partition(b"\r\n\r\n")
+        content_range = re.search(rb"Content-Range: bytes (\d+)-(\d+)/(\d+)", head)
+        parts.append((tuple(int(g) for g in content_range.groups()), body))
+    return parts
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=10-249", 10, 249),    # single range across blob chunks
+    ("bytes=-100", SIZE - 100, SIZE - 1),  # suffix range
+    ("bytes=-5000", 0, SIZE - 1),  # suffix longer than the file
+    ("bytes=1000-", 1000, SIZE - 1),  # open-ended range
+    ("bytes=900-5000", 900, SIZE - 1),  # end clamped to the file
+])
+def test_single_range_is_served_as_206(stored_file, range_header, start, end):
+    response = asyncio.run(get(stored_file.path, {"Range": range_header}))
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{SIZE}"
+    assert response.headers["content-length"] == str(end - start + 1)
+    assert response.content == CONTENT[start:end + 1]
+
+
+def test_multiple_and_overlapping_ranges_are_served_as_multipart(stored_file):
+    response = asyncio.run(get(stored_file.path, {"Range": "bytes=0-9, 5-14, -3"}))
+
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges; boundary=")
+    assert response.headers["content-length"] == str(len(response.content))
+    assert multipart_parts(response) == [
+        ((0, 9, SIZE), CONTENT[0:10]),
+        ((5, 14, SIZE), CONTENT[5:15]),
+        ((SIZE - 3, SIZE - 1, SIZE), CONTENT[-3:]),
+    ]
+
+
+@pytest.mark.parametrize("range_header", ["bytes=5000-6000", "bytes=-0", f"bytes={SIZE}-"])
+def test_unsatisfiable_range_is_416(stored_file, range_header):
+    response = asyncio.run(get(stored_file.path, {"Range": range_header}))
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{SIZE}"
+
+
+@pytest.mark.parametrize("headers", [
+    {"Range": "bytes=0-9", "If-Range": '"an-older-version"'},  # stale If-Range
+    {"Range": "lines=0-9"},  # unknown unit
+    {"Range": "bytes=abc"},  # malformed
+    {},
+])
+def test_full_body_when_the_range_does_not_apply(stored_file, headers):
+    response = asyncio.run(get(stored_file.path, headers))
+
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(SIZE)
+    assert response.content == CONTENT
+
+
+def test_matching_if_range_and_if_none_match(stored_file):
+    ranged = asyncio.run(get(stored_file.path, {"Range": "bytes=0-9", "If-Range": stored_file.etag}))
+    assert (ranged.status_code, ranged.content) == (206, CONTENT[:10])
+
+    cached = asyncio.run(get(stored_file.path, {"If-None-Match": stored_file.etag}))
+    assert cached.status_code == 304
+
+
+class SubstringSession:
+    """Answers the legacy SUBSTRING(Content, start, length) query over CONTENT (1-based, like T-SQL)."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params):
+        assert "SUBSTRING(Content, :start, :length)" in str(statement)
+        self.calls.append((params["start"], params["length"]))
+        start = params["start"] - 1
+        return SimpleNamespace(scalar_one=lambda: CONTENT[start:start + params["length"]])
+
+
+def test_legacy_rows_are_read_in_substring_slices(tmp_path, monkeypatch):
+    calls = []
+    row = SimpleNamespace(FileName="old.pdf", ContentType=None, ContentRef=None, LegacySize=SIZE)
+    monkeypatch.setattr(routes, "blob_store", BlobStore(tmp_path / "blobs", chunk_size=100))
+    monkeypatch.setattr(routes, "_get_stored_file", lambda table, file_id: row)
+    monkeypatch.setattr(routes, "SessionLocal", lambda: SubstringSession(calls))
+    file_id = uuid4()
+
+    response = asyncio.run(get(f"/api/documents/{file_id}/download", {"Range": "bytes=50-299"}))
+
+    assert response.status_code == 206
+    assert response.headers["etag"] == f'"{file_id}-{SIZE}"'
+    assert response.headers["content-disposition"] == 'attachment; filename="old.pdf"'
+    assert response.content == CONTENT[50:300]
+    assert calls == [(51, 100), (151, 100), (251, 50)]
+
+    full = asyncio.run(get(f"/api/documents/{file_id}/download"))
+    assert full.content == CONTENT
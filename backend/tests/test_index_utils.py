@@ -0,0 +1,48 @@
+import time
+
+import faiss
+import numpy as np
+
+from app import utils
+from app.index_utils import build_index_from_vectors, min_training_vectors, reconstruct_vectors
+
+
+def random_vectors(n, d=16, seed=0):
+    return np.random.default_rng(seed).random((n, d), dtype="float32")
+
+
+def test_reconstruct_leaves_the_ivf_index_untouched():
+    vectors = random_vectors(400)
+    index = build_index_from_vectors(vectors, "ivf_flat", nlist=4)
+
+    np.testing.assert_allclose(reconstruct_vectors(index, start=100, count=50), vectors[100:150])
+    assert faiss.extract_index_ivf(index).direct_map.type == faiss.DirectMap.NoMap
+
+
+def test_ivf_pq_minimum_covers_the_sub_quantizer_centroids():
+    # One coarse list still needs 2^8 centroids trained in every PQ sub-quantizer.
+    n = min_training_vectors("ivf_pq", nlist=1)
+    assert n >= 256
+    index = build_index_from_vectors(random_vectors(n), "ivf_pq", nlist=1, pq_m=4)
+    assert index.ntotal == n
+    assert min_training_vectors("ivf_flat", nlist=1) == 39
+    assert min_training_vectors("flat", nlist=1024) == 0
+
+
+def test_failed_rebuild_backs_off(knowledge_base, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("training failed")
+
+    monkeypatch.setattr(utils, "FAISS_INDEX_TYPE", "ivf_flat")
+    monkeypatch.setattr(utils, "INDEX_TRAIN_MIN_VECTORS", 0)
+    monkeypatch.setattr(utils, "build_index_from_vectors", fail)
+    monkeypatch.setattr(utils, "rebuild_failures", 0)
+    monkeypatch.setattr(utils, "rebuild_retry_at", 0.0)
+
+    utils.rebuild_running = True
+    utils.rebuild_vector_index()
+
+    assert not utils.rebuild_running
+    assert utils.rebuild_failures == 1
+    assert utils.rebuild_retry_at >= time.monotonic() + utils.REBUILD_RETRY_SECONDS - 1
+    assert utils._schedule_index_rebuild() is False
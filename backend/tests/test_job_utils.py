@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.job_utils import RUNNING, SUCCEEDED, IngestJobQueue
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: not an Exception, so the job is not marked failed."""
+
+
+def run_to_completion(queue):
+    queue.executor.shutdown(wait=True)
+
+
+def test_interrupted_job_resumes_after_its_completed_stage(tmp_path):
+    calls = []
+
+    def handler(crash):
+        def run(job):
+            with job.stage("convert"):
+                text = job.cached_text("convert", lambda: calls.append("convert") or "converted text")
+            with job.stage("store"):
+                calls.append("store")
+                if crash:
+                    raise Crash()
+            return {"text": text}
+        return run
+
+    first = IngestJobQueue(str(tmp_path))
+    first.register("document", handler(crash=True))
+    job_id = first.submit("document", {"document_id": "doc-1"})
+    run_to_completion(first)
+
+    row = first.get(job_id)
+    assert row["status"] == RUNNING
+    assert row["stages"]["convert"]["status"] == SUCCEEDED
+    assert row["stages"]["store"]["status"] == RUNNING
+
+    restarted = IngestJobQueue(str(tmp_path))
+    restarted.register("document", handler(crash=False))
+    assert restarted.resume() == 1
+    run_to_completion(restarted)
+
+    row = restarted.get(job_id)
+    assert row["status"] == SUCCEEDED
+    assert row["result"] == {"text": "converted text"}
+    # The conversion ran once; the resumed job read its spooled output.
+    assert calls == ["convert", "store", "store"]
+
+
+def test_find_or_submit_queues_one_job_per_value_under_concurrency(tmp_path):
+    release = threading.Event()
+    queue = IngestJobQueue(str(tmp_path), max_workers=1)
+    queue.register("document", lambda job: release.wait(5) and {})
+    barrier = threading.Barrier(8)
+
+    def upload(i):
+        barrier.wait()
+        return queue.find_or_submit("document", {"document_id": f"doc-{i}", "content_hash": "abc"}, "content_hash")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(upload, range(8)))
+    assert sum(queued for _, queued in results) == 1
+    assert len({payload["document_id"] for payload, _ in results}) == 1
+
+    release.set()
+    # A single worker runs in submission order, so this no-op finishes after the job.
+    queue.executor.submit(lambda: None).result(5)
+    assert queue.stats()["succeeded"] == 1
+    # Once the job has finished, the same content can be queued again.
+    _, queued = queue.find_or_submit("document", {"document_id": "doc-9", "content_hash": "abc"}, "content_hash")
+    assert queued
+    run_to_completion(queue)
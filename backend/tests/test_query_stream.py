@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+import httpx
+
+from app.cache_utils import SemanticAnswerCache
+from app.config import components
+from app.main import app
+
+
+class StubChunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class StreamingStubLLM:
+    """Yields `tokens` from astream(); raises after `fail_after` tokens if set."""
+
+    def __init__(self, tokens, fail_after=None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+
+    async def astream(self, messages):
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise RuntimeError("LLM connection dropped")
+            await asyncio.sleep(0)
+            yield StubChunk(token)
+
+
+def parse_events(body):
+    events = []
+    for block in body.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def post_stream(payload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/query/stream", json=payload)
+
+
+def test_stream_sends_sources_then_tokens_then_done(knowledge_base):
+    components.override("llm", StreamingStubLLM(["To reset ", "your ", "password..."]))
+
+    response = asyncio.run(post_stream({"query": "How do I reset my password?"}))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names == ["sources", "token", "token", "token", "done"]
+    sources = events[0][1]
+    assert sources and sources[0]["metadata"]["source_id"] == "password"
+    assert "".join(data for name, data in events if name == "token") == "To reset your password..."
+    done = events[-1][1]
+    assert done["cached"] is False
+    assert done["timings"]["first_token_ms"] <= done["timings"]["generate_ms"]
+
+
+def test_stream_reports_llm_failure_as_error_event(knowledge_base):
+    components.override("llm", StreamingStubLLM(["partial ", "answer"], fail_after=1))
+
+    response = asyncio.run(post_stream({"query": "How do I reset my password?"}))
+
+    assert response.status_code == 200
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["sources", "token", "error"]
+    assert events[-1][1] == {"detail": "LLM connection dropped"}
+
+
+def test_empty_query_is_rejected_before_streaming():
+    response = asyncio.run(post_stream({"query": "   "}))
+
+    assert response.status_code == 400
+
+
+class CountingEmbeddings:
+    def __init__(self, inner):
+        self.inner = inner
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.inner.embed_query(text)
+
+    async def aembed_query(self, text):
+        self.queries.append(text)
+        return await self.inner.aembed_query(text)
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+
+def test_stream_embeds_the_query_once_for_cache_and_retrieval(knowledge_base):
+    # conftest disables the query embedding cache, so a second lookup would call the model again.
+    components.override("llm", StreamingStubLLM(["ok"]))
+    previous = components.get("embeddings")
+    counting = CountingEmbeddings(previous)
+    components.override("embeddings", counting)
+    try:
+        response = asyncio.run(post_stream({"query": "How do I reset my password?", "mode": "hybrid"}))
+    finally:
+        components.override("embeddings", previous)
+
+    assert [name for name, _ in parse_events(response.text)][-1] == "done"
+    assert counting.queries == ["How do I reset my password?"]
+
+
+def test_cached_stream_answer_comes_with_its_sources(knowledge_base):
+    components.override("llm", StreamingStubLLM(["To reset ", "your password..."]))
+    previous = components.get("answer_cache")
+    components.override("answer_cache", SemanticAnswerCache())
+    try:
+        first = parse_events(asyncio.run(post_stream({"query": "How do I reset my password?"})).text)
+        second = parse_events(asyncio.run(post_stream({"query": "How do I reset my password?"})).text)
+    finally:
+        components.override("answer_cache", previous)
+
+    assert second == [
+        ("sources", first[0][1]),
+        ("token", "To reset your password..."),
+        ("done", {"cached": True}),
+    ]
+    assert first[0][1][0]["metadata"]["source_id"] == "password"
+
+
+class InvokingStubLLM:
+    async def ainvoke(self, messages):
+        return StubChunk("Use the reset link.")
+
+
+def test_answer_cached_by_query_is_streamed_with_its_sources(knowledge_base):
+    components.override("llm", InvokingStubLLM())
+    previous = components.get("answer_cache")
+    components.override("answer_cache", SemanticAnswerCache())
+    try:
+        transport = httpx.ASGITransport(app=app)
+
+        async def query():
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/api/query", json={"query": "How do I reset my password?"})
+
+        assert asyncio.run(query()).json()["cached"] is False
+        events = parse_events(asyncio.run(post_stream({"query": "How do I reset my password?"})).text)
+    finally:
+        components.override("answer_cache", previous)
+
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[0][1][0]["metadata"]["source_id"] == "password"
+    assert events[1][1] == "Use the reset link."
@@ -0,0 +1,22 @@
+import asyncio
+
+from app import utils
+
+# Shares no word with the other KB entries, so BM25 matches the password chunk only.
+PASSWORD_QUERY = "Forgot Password login screen registered email"
+
+
+def sources(results):
+    return [doc.metadata["source_id"] for doc, _ in results]
+
+
+def test_hybrid_mode_drops_off_topic_vector_hits(knowledge_base):
+    # Every chunk is a vector hit for a 3-chunk KB; the similarity cutoff has to run before fusion.
+    assert sources(utils.get_context_results(PASSWORD_QUERY, mode="hybrid")) == ["password"]
+    assert sources(asyncio.run(utils.aget_context_results(PASSWORD_QUERY, mode="hybrid"))) == ["password"]
+
+
+def test_hybrid_mode_keeps_lexical_hits_the_cutoff_never_sees(knowledge_base, monkeypatch):
+    # With a cutoff that keeps only the best vector hit, BM25 still contributes its own matches.
+    monkeypatch.setattr(utils, "CONTEXT_SCORE_MARGIN", 0.0)
+    assert set(sources(utils.get_context_results("open the viewer", mode="hybrid"))) >= {"meetings", "annotations"}
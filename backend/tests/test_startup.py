@@ -0,0 +1,10 @@
+import subprocess
+import sys
+
+
+def test_importing_the_app_does_not_import_the_openai_sdk():
+    # A fresh interpreter, since this test session has long imported everything. The
+    # environment from conftest is inherited, so app.config reads the same settings.
+    code = "import sys, app.main; print('openai' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
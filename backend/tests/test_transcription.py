@@ -0,0 +1,181 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from openai import OpenAI
+
+from app import video_utils
+from app.audio_utils import map_to_source_time, plan_speech_segments
+from app.video_utils import add_source_times, transcribe_chunks
+
+
+class FakeWhisperServer:
+    """Local /v1/audio/transcriptions endpoint answering verbose JSON: two 1 s segments
+    "[<file name>]" and "(<file name>)" of a 2 s chunk.
+
+    `failures` maps a file name to the status codes its first attempts get; `latency`
+    maps a file name to its response delay, so chunks can finish out of order.
+    """
+
+    def __init__(self, failures=None, latency=None):
+        self.failures = {name: list(codes) for name, codes in (failures or {}).items()}
+        self.latency = latency or {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                name = re.search(rb'filename="([^"]+)"', body).group(1).decode()
+                with fake.lock:
+                    fake.requests.append((time.monotonic(), name))
+                    pending = fake.failures.get(name)
+                    status = pending.pop(0) if pending else 200
+                time.sleep(fake.latency.get(name, 0.0))
+                payload = json.dumps(
+                    {
+                        "text": f"[{name}] ({name})",
+                        "language": "english",
+                        "duration": 2.0,
+                        "segments": [
+                            {"id": 0, "start": 0.0, "end": 1.0, "text": f" [{name}]"},
+                            {"id": 1, "start": 1.0, "end": 2.0, "text": f" ({name})"},
+                        ],
+                    }
+                    if status == 200 else {"error": {"message": f"status {status}"}}
+                ).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self):
+        return OpenAI(api_key="test", base_url=f"http://127.0.0.1:{self.server.server_port}/v1", max_retries=0)
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"chunk_{i:03d}.mp3"
+        path.write_bytes(b"\0" * 1024)
+        paths.append(str(path))
+    return paths
+
+
+def expected_transcript(chunks):
+    return " ".join(f"[{Path(chunk).name}] ({Path(chunk).name})" for chunk in chunks)
+
+
+def new_timings():
+    return {"per_chunk_seconds": [], "chunk_retries": 0}
+
+
+def test_transcript_keeps_chunk_order_when_later_chunks_finish_first(chunks):
+    # The first chunk is the slowest, so completion order is the reverse of chunk order.
+    latency = {Path(chunk).name: 0.05 * (len(chunks) - i) for i, chunk in enumerate(chunks)}
+    with FakeWhisperServer(latency=latency) as server:
+        timings = new_timings()
+        transcript, segments = transcribe_chunks(chunks, server.client(), timings, concurrency=len(chunks), requests_per_minute=0)
+
+    assert transcript == expected_transcript(chunks)
+    assert timings["chunk_retries"] == 0
+    assert len(timings["per_chunk_seconds"]) == len(chunks)
+
+
+def test_rate_limited_and_server_errors_are_retried(chunks):
+    failures = {"chunk_001.mp3": [429], "chunk_003.mp3": [500, 503]}
+    with FakeWhisperServer(failures=failures) as server:
+        timings = new_timings()
+        transcript, segments = transcribe_chunks(chunks, server.client(), timings, concurrency=3, requests_per_minute=0)
+
+    assert transcript == expected_transcript(chunks)
+    assert timings["chunk_retries"] == 3
+    attempts = [name for _, name in server.requests]
+    assert attempts.count("chunk_001.mp3") == 2
+    assert attempts.count("chunk_003.mp3") == 3
+
+
+def test_requests_are_spaced_by_the_rate_limit(chunks):
+    requests_per_minute = 600
+    interval = 60.0 / requests_per_minute
+    with FakeWhisperServer() as server:
+        timings = new_timings()
+        transcript, segments = transcribe_chunks(
+            chunks, server.client(), timings, concurrency=len(chunks), requests_per_minute=requests_per_minute
+        )
+
+    assert transcript == expected_transcript(chunks)
+    arrivals = sorted(t for t, _ in server.requests)
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    # Slots are handed out `interval` apart; allow a little scheduling jitter on arrival.
+    assert min(gaps) >= interval * 0.7
+    assert arrivals[-1] - arrivals[0] >= interval * (len(chunks) - 1) * 0.9
+
+
+def test_segments_are_timed_on_the_audio_timeline_and_located_in_the_transcript(chunks):
+    latency = {Path(chunk).name: 0.05 * (len(chunks) - i) for i, chunk in enumerate(chunks)}
+    with FakeWhisperServer(latency=latency) as server:
+        transcript, segments = transcribe_chunks(chunks, server.client(), new_timings(), concurrency=3, requests_per_minute=0)
+
+    assert len(segments) == 2 * len(chunks)
+    # Each 2 s chunk starts where the previous one ended.
+    assert [(s["start"], s["end"]) for s in segments] == [(i * 1.0, i * 1.0 + 1.0) for i in range(2 * len(chunks))]
+    for segment, chunk in zip(segments[::2], chunks):
+        assert transcript[segment["char_start"]:segment["char_end"]] == f"[{Path(chunk).name}]"
+
+
+def test_chunks_get_video_times_of_the_segments_they_cover():
+    transcript = "First sentence. Second sentence. Third sentence."
+    segments = [
+        {"start": 0.0, "end": 4.0, "char_start": 0, "char_end": 15},
+        {"start": 30.0, "end": 33.5, "char_start": 16, "char_end": 32},
+        {"start": 34.0, "end": 38.0, "char_start": 33, "char_end": 48},
+    ]
+    documents = [
+        Document(page_content=transcript[0:32], metadata={"start": 0, "end": 32}),
+        Document(page_content=transcript[33:48], metadata={"start": 33, "end": 48}),
+    ]
+
+    add_source_times(documents, segments)
+
+    assert (documents[0].metadata["start_seconds"], documents[0].metadata["end_seconds"]) == (0.0, 33.5)
+    assert (documents[1].metadata["start_seconds"], documents[1].metadata["end_seconds"]) == (34.0, 38.0)
+
+
+def test_trimmed_times_map_back_to_the_video():
+    # 10 s of speech, 20 s of silence, 10 s of speech: the silence shrinks to 2 x 0.25 s of padding.
+    keep, cuts, offset_map = plan_speech_segments(40.0, [(10.0, 30.0)], max_segment_seconds=600)
+
+    assert keep == [(0.0, 10.25), (29.75, 40.0)]
+    assert map_to_source_time(5.0, offset_map) == 5.0
+    assert map_to_source_time(10.5, offset_map) == 30.0
+
+
+def test_silence_trim_is_skipped_when_there_is_no_audio_to_keep(monkeypatch):
+    monkeypatch.setattr(video_utils, "detect_silences", lambda *args, **kwargs: (0.0, []))
+
+    assert video_utils.plan_silence_trim("empty.mp4", {}, max_segment_seconds=600) is None
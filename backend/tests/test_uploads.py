@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import httpx
+
+from app import routes
+from app.config import ingest_queue
+from app.main import app
+
+
+async def post_upload(path, files):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(path, files=files)
+
+
+def test_duplicate_document_is_answered_with_200_and_no_job(monkeypatch):
+    monkeypatch.setattr(routes, "_find_existing_upload", lambda *args: "existing-document")
+    jobs_before = ingest_queue.stats()
+
+    response = asyncio.run(post_upload(
+        "/api/upload-documents", {"file": ("minutes.pdf", b"%PDF-1.4 minutes", "application/pdf")}
+    ))
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "message": "Document was already uploaded.", "document_id": "existing-document", "duplicate": True
+    }
+    assert ingest_queue.stats() == jobs_before
+
+
+def test_duplicate_video_is_answered_with_200(monkeypatch):
+    monkeypatch.setattr(routes, "_find_existing_upload", lambda *args: "existing-video")
+
+    response = asyncio.run(post_upload(
+        "/api/upload-videos", {"file": ("briefing.mp4", b"\x00\x00\x00\x18ftypmp42", "video/mp4")}
+    ))
+
+    assert response.status_code == 200
+    assert response.json()["video_id"] == "existing-video"
+    assert "job_id" not in response.json()
+
+
+def test_concurrent_uploads_of_the_same_content_queue_one_job(monkeypatch):
+    monkeypatch.setattr(routes, "_find_existing_upload", lambda *args: None)
+    release = threading.Event()
+    monkeypatch.setitem(ingest_queue.handlers, "document", lambda job: release.wait(5) and {})
+    files = {"file": ("minutes.pdf", b"%PDF-1.4 the same minutes", "application/pdf")}
+
+    async def upload_twice():
+        return await asyncio.gather(post_upload("/api/upload-documents", files), post_upload("/api/upload-documents", files))
+
+    try:
+        responses = asyncio.run(upload_twice())
+    finally:
+        release.set()
+
+    assert sorted(response.status_code for response in responses) == [200, 202]
+    assert len({response.json()["document_id"] for response in responses}) == 1
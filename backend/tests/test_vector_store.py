@@ -0,0 +1,178 @@
+import gc
+
+import pytest
+from langchain_core.documents import Document
+
+from app import utils
+from app.docstore_utils import SqliteDocstore, SqliteIndexMap
+from app.index_utils import get_index_type
+from app.lexical_utils import BM25Index
+from app.persistence_utils import WRITER_LOCK_FILE, read_manifest
+from app.snapshot_utils import VectorStoreHolder
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty vector store in tmp_path, replacing the module-level one for one test."""
+    docstore = SqliteDocstore(tmp_path / "docstore.sqlite")
+    monkeypatch.setattr(utils, "VECTOR_DIR", tmp_path)
+    monkeypatch.setattr(utils, "docstore", docstore)
+    monkeypatch.setattr(utils, "index_to_docstore_id", SqliteIndexMap(docstore))
+    monkeypatch.setattr(utils, "lexical_index", BM25Index())
+    monkeypatch.setattr(utils, "vector_holder", VectorStoreHolder())
+    # Compaction and rebuilds are run explicitly by the tests, not in background threads.
+    monkeypatch.setattr(utils, "COMPACT_AFTER_SEGMENTS", 10 ** 6)
+    monkeypatch.setattr(utils, "INDEX_TRAIN_MIN_VECTORS", 10 ** 6)
+    return tmp_path
+
+
+def upload(topic, n):
+    documents = [
+        Document(page_content=f"{topic} note {i}: the {topic} module handles case {i} of {topic} work",
+                 metadata={"source_id": topic})
+        for i in range(n)
+    ]
+    utils.upload_documents_to_vector_store(documents, utils.chunk_ids(documents))
+    return documents
+
+
+def top_hit(query):
+    db = utils.vector_holder.current().db
+    return db.similarity_search_with_score_by_vector(utils.get_query_embedding(query), k=1)[0][0]
+
+
+def test_uploads_copy_only_the_delta(store):
+    upload("agenda", 5)
+    utils.compact_vector_store(force=True)
+    base = utils.vector_holder.current().base
+    assert base.ntotal == 5
+
+    upload("minutes", 3)
+    upload("voting", 2)
+
+    snapshot = utils.vector_holder.current()
+    assert snapshot.base is base
+    assert snapshot.delta.ntotal == 5
+    assert snapshot.db.index.ntotal == 10
+    assert len(read_manifest(store)["segments"]) == 2
+    # Delta rows continue the base's numbering, so hits map to the right docstore rows.
+    assert top_hit("voting note 1: the voting module handles case 1 of voting work").metadata["source_id"] == "voting"
+    assert top_hit("agenda note 4: the agenda module handles case 4 of agenda work").metadata["source_id"] == "agenda"
+
+
+def test_superseded_snapshots_are_released_once_no_reader_holds_them(store):
+    upload("agenda", 2)
+    held = utils.vector_holder.current()
+    upload("minutes", 2)
+    upload("voting", 2)
+    gc.collect()
+
+    latest = utils.vector_holder.current().version
+    # The in-between snapshot had no readers; the held one stays alive for its request.
+    assert utils.vector_holder.live_versions() == [held.version, latest]
+
+    del held
+    gc.collect()
+    assert utils.vector_holder.live_versions() == [latest]
+
+
+def test_compaction_folds_the_delta_into_a_new_base(store):
+    upload("agenda", 4)
+    upload("minutes", 4)
+
+    utils.compact_vector_store(force=True)
+
+    snapshot = utils.vector_holder.current()
+    assert snapshot.base.ntotal == 8
+    assert snapshot.delta.ntotal == 0
+    manifest = read_manifest(store)
+    assert manifest["segments"] == []
+    assert snapshot.manifest_version == manifest["version"]
+    assert top_hit("minutes note 2: the minutes module handles case 2 of minutes work").metadata["source_id"] == "minutes"
+
+
+def test_restart_loads_the_base_and_the_segments(store, monkeypatch):
+    upload("agenda", 4)
+    utils.compact_vector_store(force=True)
+    upload("minutes", 3)
+
+    monkeypatch.setattr(utils, "vector_holder", VectorStoreHolder())
+    monkeypatch.setattr(utils, "lexical_index", BM25Index())
+    utils.load_vector_store()
+
+    snapshot = utils.vector_holder.current()
+    assert (snapshot.base.ntotal, snapshot.delta.ntotal) == (4, 3)
+    assert len(snapshot.lexical) == 7
+    assert top_hit("minutes note 0: the minutes module handles case 0 of minutes work").metadata["source_id"] == "minutes"
+
+
+def test_rebuild_retrains_the_base_from_base_and_delta(store, monkeypatch):
+    upload("agenda", 60)
+    utils.compact_vector_store(force=True)
+    upload("minutes", 60)
+    monkeypatch.setattr(utils, "FAISS_INDEX_TYPE", "ivf_flat")
+    monkeypatch.setattr(utils, "IVF_NLIST", 2)
+
+    utils.rebuild_running = True
+    utils.rebuild_vector_index()
+
+    snapshot = utils.vector_holder.current()
+    assert get_index_type(snapshot.base) == "ivf_flat"
+    assert (snapshot.base.ntotal, snapshot.delta.ntotal) == (120, 0)
+    assert read_manifest(store)["segments"] == []
+    assert top_hit("minutes note 7: the minutes module handles case 7 of minutes work").metadata["source_id"] == "minutes"
+
+
+def test_mmap_load_maps_the_base_and_keeps_segments_private(store, monkeypatch):
+    upload("agenda", 4)
+    utils.compact_vector_store(force=True)
+    upload("minutes", 3)
+    monkeypatch.setattr(utils, "VECTOR_STORE_MMAP", True)
+
+    monkeypatch.setattr(utils, "vector_holder", VectorStoreHolder())
+    utils.load_vector_store()
+
+    snapshot = utils.vector_holder.current()
+    assert snapshot.mapped
+    assert (snapshot.base.ntotal, snapshot.delta.ntotal) == (4, 3)
+    assert top_hit("minutes note 1: the minutes module handles case 1 of minutes work").metadata["source_id"] == "minutes"
+
+
+def test_upload_catches_up_with_segments_from_another_worker(store, monkeypatch):
+    upload("agenda", 3)
+    stale = utils.vector_holder
+    # A second worker process: its own holder, loaded from the same directory.
+    monkeypatch.setattr(utils, "vector_holder", VectorStoreHolder())
+    utils.load_vector_store()
+    upload("minutes", 2)
+
+    monkeypatch.setattr(utils, "vector_holder", stale)
+    upload("voting", 2)
+
+    snapshot = utils.vector_holder.current()
+    assert snapshot.db.index.ntotal == 7
+    assert snapshot.manifest_version == read_manifest(store)["version"]
+    assert top_hit("minutes note 1: the minutes module handles case 1 of minutes work").metadata["source_id"] == "minutes"
+    assert top_hit("voting note 0: the voting module handles case 0 of voting work").metadata["source_id"] == "voting"
+
+
+def test_compaction_is_skipped_while_another_process_holds_the_writer_lock(store):
+    upload("agenda", 4)
+    fcntl = pytest.importorskip("fcntl")
+    with open(store / WRITER_LOCK_FILE, "a+b") as other:
+        # flock locks belong to the open file, so this stands in for another worker.
+        fcntl.flock(other, fcntl.LOCK_EX)
+        utils.compact_vector_store(force=True)
+        assert utils.vector_holder.current().base is None
+        assert len(read_manifest(store)["segments"]) == 1
+
+    utils.compact_vector_store(force=True)
+    assert utils.vector_holder.current().base.ntotal == 4
+
+
+def test_chunk_ids_differ_per_source_for_the_same_text():
+    text = "Board papers open in the viewer."
+    same = [Document(page_content=text, metadata={"source_id": source}) for source in ("a", "a", "b")]
+    ids = utils.chunk_ids(same)
+    assert ids[0] == ids[1]
+    assert ids[0] != ids[2]
@@ -42,7 +42,8 @@ from embedding import embeddings
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
-index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
+# all-mpnet-base-v2 returns 768-dimensional vectors; no need to load the model to find out.
+index = faiss.IndexFlatL2(768)
 
 vector_store = FAISS(
     embedding_function=embeddings,
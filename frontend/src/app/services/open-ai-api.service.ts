@@ -65,5 +65,8 @@ export class OpenAiApiService {
     docDownloadUrl(id: string) {
       return `${this.apiUrl}/documents/${id}/download`;
     }
+    videoStreamUrl(id: string) {
+      return `${this.apiUrl}/videos/${id}/stream`;
+    }
 
 }
\ No newline at end of file